@@ -0,0 +1,182 @@
+"""
+変更検知モジュール
+
+URLごとに前回取得時の ETag / Last-Modified、HTTPレスポンス本文・抽出データのハッシュを
+SQLiteの索引に保持します。再スクレイピング時はまず条件付きリクエストで変更の有無を確認し、
+変更が無ければブラウザでのレンダリングとデータ抽出を省略できます。
+
+索引はURLを主キーとする WITHOUT ROWID テーブルのため、数百万件でも1回の検索は
+主キーの探索1回で済みます。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS url_state (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT,
+    data_hash TEXT,
+    html_hash TEXT,
+    checked_at REAL NOT NULL,
+    changed_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+_COLUMNS = ("url", "etag", "last_modified", "body_hash", "data_hash", "html_hash", "checked_at", "changed_at")
+
+
+def content_hash(value: Any) -> str:
+    """
+    内容のハッシュ値を返す
+
+    Args:
+        value: バイト列、文字列、またはJSONに変換できる値
+
+    Returns:
+        16進数のハッシュ値
+    """
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    elif not isinstance(value, bytes):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(value, digest_size=16).hexdigest()
+
+
+class ChangeIndex:
+    """URLごとの取得状態を保持する永続索引"""
+
+    def __init__(self, path: str):
+        """
+        索引の初期化
+
+        Args:
+            path: SQLiteデータベースのパス
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        # 接続はワーカースレッド間で共有するため直列化する
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def _get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM url_state WHERE url = ?", (url,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def _put(self, state: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO url_state ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(state.get(column) for column in _COLUMNS)
+            )
+            self._conn.commit()
+
+    def _touch(self, url: str, checked_at: float):
+        with self._lock:
+            self._conn.execute("UPDATE url_state SET checked_at = ? WHERE url = ?", (checked_at, url))
+            self._conn.commit()
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM url_state").fetchone()[0]
+
+    async def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """URLの前回の取得状態を返す（未取得の場合はNone）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._get, url)
+
+    async def mark_not_modified(self, url: str) -> float:
+        """
+        条件付きリクエストで変更が無かったことを記録する
+
+        Returns:
+            確認日時
+        """
+        self.not_modified += 1
+        checked_at = time.time()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._touch, url, checked_at)
+        return checked_at
+
+    async def record(
+        self,
+        url: str,
+        previous: Optional[Dict[str, Any]],
+        document: Dict[str, Any],
+        data_hash: str,
+        html_hash: Optional[str],
+        compare: str = "data"
+    ) -> Tuple[bool, float]:
+        """
+        スクレイピング結果を索引に記録する
+
+        Args:
+            url: URL
+            previous: 前回の取得状態
+            document: ドキュメントのレスポンス情報（etag, last_modified, body_hash）
+            data_hash: 抽出データのハッシュ
+            html_hash: レンダリング後のHTMLのハッシュ
+            compare: 変更の判定に使うハッシュ（"data" または "html"）
+
+        Returns:
+            前回から内容が変わった（または初回の）かどうかと、内容が最後に変わった日時
+        """
+        now = time.time()
+        if compare == "html" and html_hash is not None:
+            changed = previous is None or previous["html_hash"] != html_hash
+        else:
+            changed = previous is None or previous["data_hash"] != data_hash
+        if changed:
+            self.changed += 1
+        else:
+            self.unchanged += 1
+        state = {
+            "url": url,
+            "etag": document.get("etag"),
+            "last_modified": document.get("last_modified"),
+            "body_hash": document.get("body_hash"),
+            "data_hash": data_hash,
+            "html_hash": html_hash,
+            "checked_at": now,
+            "changed_at": now if changed else previous["changed_at"],
+        }
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._put, state)
+        return changed, state["changed_at"]
+
+    async def stats(self) -> Dict[str, Any]:
+        """索引の統計情報を返す"""
+        loop = asyncio.get_running_loop()
+        return {
+            "urls": await loop.run_in_executor(None, self._count),
+            "not_modified": self.not_modified,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
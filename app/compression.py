@@ -0,0 +1,327 @@
+"""
+圧縮モジュール
+
+取得したHTMLをタスク結果として保持する際や、ファイルとして保存する際の圧縮（zstd / gzip）と、
+クライアントの Accept-Encoding に応じてAPIのレスポンスを圧縮する（br / gzip）ミドルウェアを提供します。
+
+zstd には zstandard、br には brotli パッケージが必要です。インストールされていない場合、
+zstd は gzip で代用し、br はネゴシエーションの対象から外します。
+"""
+
+import base64
+import gzip
+import logging
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 任意の依存関係
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 任意の依存関係
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 圧縮方式ごとのファイル拡張子
+FILE_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def resolve_codec(codec: Optional[str]) -> Optional[str]:
+    """
+    使用する圧縮方式を決める
+
+    Args:
+        codec: 圧縮方式（"zstd", "gzip", "none" またはNone）
+
+    Returns:
+        使用する圧縮方式（圧縮しない場合はNone）
+
+    Raises:
+        ValueError: 不明な圧縮方式の場合
+    """
+    if not codec or codec == "none":
+        return None
+    if codec not in FILE_EXTENSIONS:
+        raise ValueError(f"不明な圧縮方式: {codec}")
+    if codec == "zstd" and zstandard is None:
+        logger.warning("zstandard がインストールされていないため gzip で圧縮します")
+        return "gzip"
+    return codec
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """バイト列を圧縮する"""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """圧縮されたバイト列を展開する"""
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class CompressedText:
+    """圧縮して保持する文字列"""
+
+    __slots__ = ("codec", "data", "size")
+
+    def __init__(self, codec: str, data: bytes, size: int):
+        self.codec = codec
+        self.data = data
+        # 展開後のバイト数
+        self.size = size
+
+    @classmethod
+    def from_text(cls, text: str, codec: str) -> "CompressedText":
+        raw = text.encode("utf-8")
+        return cls(codec, compress(raw, codec), len(raw))
+
+    def text(self) -> str:
+        return decompress(self.data, self.codec).decode("utf-8")
+
+
+def pack_html(result: Dict[str, Any], codec: str) -> Dict[str, Any]:
+    """タスク結果のHTMLを圧縮した結果を返す"""
+    html = result.get("html")
+    if not isinstance(html, str):
+        return result
+    return dict(result, html=CompressedText.from_text(html, codec))
+
+
+def unpack_html(result: Dict[str, Any]) -> Dict[str, Any]:
+    """タスク結果の圧縮されたHTMLを展開した結果を返す"""
+    html = result.get("html")
+    if not isinstance(html, CompressedText):
+        return result
+    return dict(result, html=html.text())
+
+
+def is_packed(result: Optional[Dict[str, Any]]) -> bool:
+    return bool(result) and isinstance(result.get("html"), CompressedText)
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps で CompressedText を保存できる形式に変換する"""
+    if isinstance(value, CompressedText):
+        return {"__compressed__": value.codec, "size": value.size, "data": base64.b64encode(value.data).decode("ascii")}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_object_hook(value: Dict[str, Any]) -> Any:
+    """json.loads で保存された CompressedText を復元する"""
+    if "__compressed__" in value:
+        return CompressedText(value["__compressed__"], base64.b64decode(value["data"]), value["size"])
+    return value
+
+
+def write_compressed_text(path: str, text: str, codec: str):
+    """テキストを圧縮してファイルに書き込む"""
+    with open(path, "wb") as f:
+        f.write(compress(text.encode("utf-8"), codec))
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding ヘッダを符号化方式 → q値の辞書に変換する"""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+# レスポンスの圧縮レベル
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# 既に圧縮されていて、再圧縮してもサイズが減らないレスポンスの Content-Type（前方一致）
+PRECOMPRESSED_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip", "application/zstd",
+    "application/x-7z-compressed", "application/x-rar-compressed",
+)
+# 圧縮しても小さくならない画像以外の形式（SVGはテキスト）
+_COMPRESSIBLE_IMAGE_TYPES = ("image/svg+xml",)
+
+
+def is_precompressed(content_type: str) -> bool:
+    """Content-Type が既に圧縮された形式かどうか"""
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    if content_type in _COMPRESSIBLE_IMAGE_TYPES:
+        return False
+    return content_type.startswith(PRECOMPRESSED_TYPES)
+
+
+def preferred_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding ヘッダから使用するレスポンスの圧縮方式（br / gzip）を選ぶ"""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    """レスポンスの本文全体を br または gzip で圧縮する（スレッド・プロセスプールで実行できる）"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class _GzipCompressor:
+    """brotli.Compressor と同じインターフェースのgzip圧縮器"""
+
+    def __init__(self, level: int):
+        # wbits=31 でgzip形式のヘッダ・フッタを付ける
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Accept-Encoding に応じてレスポンスを br または gzip で圧縮するミドルウェア"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        offload: Optional[Callable[..., Awaitable[Any]]] = None,
+        offload_min_size: int = 64 * 1024
+    ):
+        """
+        初期化
+
+        Args:
+            app: ASGIアプリケーション
+            minimum_size: 圧縮するレスポンスの最小バイト数
+            offload: 大きな本文の圧縮をイベントループの外で実行するコルーチン関数（func, *args を受け取る）。
+                ストリーミングでは圧縮器の状態を引き継ぐため、スレッドで実行するものを指定する
+            offload_min_size: この大きさ以上の本文・チャンクを offload で圧縮する
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload = offload
+        self.offload_min_size = offload_min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = preferred_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+            if encoding is not None:
+                responder = CompressingResponder(
+                    self.app, self.minimum_size, encoding, self.offload, self.offload_min_size
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressingResponder:
+    """
+    レスポンスの本文を圧縮して送信する
+
+    ストリーミングレスポンス（NDJSONなど）はチャンクごとにフラッシュし、
+    受け取った分をすぐにクライアントへ届けます。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        encoding: str,
+        offload: Optional[Callable[..., Awaitable[Any]]] = None,
+        offload_min_size: int = 64 * 1024
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.offload = offload
+        self.offload_min_size = offload_min_size
+        # ストリーミングレスポンスの場合だけ作成する
+        self.compressor: Any = None
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # ヘッダを書き換えるため、本文の最初の部分を受け取るまで送信を遅らせる
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            # 圧縮済みの本文や、スクリーンショットなど既に圧縮された形式はそのまま送る
+            self.passthrough = "content-encoding" in headers or is_precompressed(headers.get("content-type", ""))
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if self.passthrough or (len(body) < self.minimum_size and not more_body):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                compressed = await self._run(len(body), compress_body, self.encoding, body)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            del headers["Content-Length"]
+            await self.send(self.initial_message)
+        elif self.passthrough:
+            await self.send(message)
+            return
+
+        if self.compressor is None:
+            self.compressor = (
+                brotli.Compressor(quality=BROTLI_QUALITY) if self.encoding == "br" else _GzipCompressor(GZIP_LEVEL)
+            )
+        chunk = await self._run(len(body), self._compress_chunk, body, more_body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _compress_chunk(self, body: bytes, more_body: bool) -> bytes:
+        chunk = self.compressor.process(body)
+        return chunk + (self.compressor.flush() if more_body else self.compressor.finish())
+
+    async def _run(self, size: int, func: Callable[..., bytes], *args: Any) -> bytes:
+        """大きな本文の圧縮はイベントループを止めないよう offload で実行する"""
+        if self.offload is not None and size >= self.offload_min_size:
+            return await self.offload(func, *args)
+        return func(*args)
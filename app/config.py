@@ -0,0 +1,94 @@
+"""
+PlaywrightAPI サーバー設定
+
+環境変数からサーバーの設定値を読み込みます。
+"""
+
+import os
+
+
+def _get_int(name: str, default: int) -> int:
+    """環境変数を整数として読み込む"""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _get_float(name: str, default: float) -> float:
+    """環境変数を浮動小数点数として読み込む"""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+# ブラウザのリサイクル設定（0以下で無効）
+BROWSER_MAX_PAGES = _get_int("PLAYWRIGHT_API_BROWSER_MAX_PAGES", 500)
+BROWSER_MAX_RSS_MB = _get_int("PLAYWRIGHT_API_BROWSER_MAX_RSS_MB", 1536)
+BROWSER_CHECK_INTERVAL = _get_float("PLAYWRIGHT_API_BROWSER_CHECK_INTERVAL", 15.0)
+BROWSER_CRASH_RETRIES = _get_int("PLAYWRIGHT_API_BROWSER_CRASH_RETRIES", 1)
+
+# スケジューラ設定
+SCRAPER_WORKERS = _get_int("PLAYWRIGHT_API_WORKERS", 10)
+HOST_MAX_CONCURRENCY = _get_int("PLAYWRIGHT_API_HOST_MAX_CONCURRENCY", 2)
+HOST_MIN_DELAY = _get_float("PLAYWRIGHT_API_HOST_MIN_DELAY", 0.0)
+PRIORITY_MODE = os.getenv("PLAYWRIGHT_API_PRIORITY_MODE", "weighted")
+PRIORITY_WEIGHTS = {
+    "high": _get_int("PLAYWRIGHT_API_PRIORITY_WEIGHT_HIGH", 8),
+    "normal": _get_int("PLAYWRIGHT_API_PRIORITY_WEIGHT_NORMAL", 4),
+    "low": _get_int("PLAYWRIGHT_API_PRIORITY_WEIGHT_LOW", 1),
+}
+
+# セッションプロファイルを永続化するディレクトリ（未設定の場合はメモリのみ）
+PROFILE_DIR = os.getenv("PLAYWRIGHT_API_PROFILE_DIR") or None
+
+# HTTPレスポンスキャッシュ設定（サブリソースをコンテキスト間で共有する）
+HTTP_CACHE_ENABLED = os.getenv("PLAYWRIGHT_API_HTTP_CACHE", "1").lower() not in ("0", "false", "no")
+HTTP_CACHE_MEMORY_MB = _get_int("PLAYWRIGHT_API_HTTP_CACHE_MEMORY_MB", 128)
+HTTP_CACHE_DISK_DIR = os.getenv("PLAYWRIGHT_API_HTTP_CACHE_DIR") or None
+HTTP_CACHE_DISK_MB = _get_int("PLAYWRIGHT_API_HTTP_CACHE_DISK_MB", 1024)
+
+# HARアーカイブを保存するディレクトリ（分散モードでは全てのプロセスで共有するディレクトリを明示的に指定する）
+HAR_DIR_CONFIGURED = bool(os.getenv("PLAYWRIGHT_API_HAR_DIR"))
+HAR_DIR = os.getenv("PLAYWRIGHT_API_HAR_DIR") or "output/har"
+
+# クロールごとに保持する直近のページ結果の件数（古い結果はストリームで読み出せなくなる）
+CRAWL_RESULT_BUFFER = _get_int("PLAYWRIGHT_API_CRAWL_RESULT_BUFFER", 1000)
+# 終了したクロールの状態を保持する秒数と最大件数
+CRAWL_FINISHED_TTL = _get_float("PLAYWRIGHT_API_CRAWL_FINISHED_TTL", 3600.0)
+CRAWL_MAX_FINISHED = _get_int("PLAYWRIGHT_API_CRAWL_MAX_FINISHED", 100)
+
+# 変更検知用のURLごとの取得状態を保存するSQLiteデータベース
+CHANGE_INDEX_PATH = os.getenv("PLAYWRIGHT_API_CHANGE_INDEX", "output/change_index.sqlite3")
+
+# タスクストア設定（"memory" または "sqlite"）
+TASK_STORE = os.getenv("PLAYWRIGHT_API_TASK_STORE", "memory")
+TASK_STORE_PATH = os.getenv("PLAYWRIGHT_API_TASK_STORE_PATH", "output/tasks/tasks.sqlite3")
+TASK_RESULT_INLINE_KB = _get_int("PLAYWRIGHT_API_TASK_RESULT_INLINE_KB", 64)
+
+# 実行モード（"standalone": APIサーバー内でスクレイピングする / "api": キューに登録するだけでワーカーが実行する）
+MODE = os.getenv("PLAYWRIGHT_API_MODE", "standalone")
+# 分散モードのタスクキュー（"sqlite": 複数プロセスで共有 / "local": 同じプロセス内のワーカーで実行）
+QUEUE_BACKEND = os.getenv("PLAYWRIGHT_API_QUEUE", "sqlite")
+QUEUE_PATH = os.getenv("PLAYWRIGHT_API_QUEUE_PATH", "output/tasks/queue.sqlite3")
+WORKER_HEARTBEAT_INTERVAL = _get_float("PLAYWRIGHT_API_WORKER_HEARTBEAT_INTERVAL", 5.0)
+WORKER_STALE_TIMEOUT = _get_float("PLAYWRIGHT_API_WORKER_STALE_TIMEOUT", 30.0)
+TASK_MAX_ATTEMPTS = _get_int("PLAYWRIGHT_API_TASK_MAX_ATTEMPTS", 3)
+
+# 後処理（エンコード・ハッシュ計算・ファイル書き込み）をイベントループの外で実行するプール
+POSTPROCESS_THREADS = _get_int("PLAYWRIGHT_API_POSTPROCESS_THREADS", 4)
+POSTPROCESS_PROCESSES = _get_int("PLAYWRIGHT_API_POSTPROCESS_PROCESSES", 0)
+POSTPROCESS_MAX_PENDING = _get_int("PLAYWRIGHT_API_POSTPROCESS_MAX_PENDING", 64)
+# イベントループの遅延を計測する間隔（秒）
+LOOP_LAG_INTERVAL = _get_float("PLAYWRIGHT_API_LOOP_LAG_INTERVAL", 0.5)
+
+# HTMLの圧縮設定（"none", "gzip", "zstd"。zstd には zstandard パッケージが必要）
+# タスク結果として保持するHTML
+HTML_STORAGE_COMPRESSION = os.getenv("PLAYWRIGHT_API_HTML_STORAGE_COMPRESSION", "none")
+# save_html_file で保存するHTMLファイル
+HTML_FILE_COMPRESSION = os.getenv("PLAYWRIGHT_API_HTML_FILE_COMPRESSION", "none")
+# Accept-Encoding に応じたレスポンスの圧縮（br には brotli パッケージが必要）
+RESPONSE_COMPRESSION = os.getenv("PLAYWRIGHT_API_RESPONSE_COMPRESSION", "1").lower() not in ("0", "false", "no")
+RESPONSE_COMPRESSION_MIN_BYTES = _get_int("PLAYWRIGHT_API_RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+# この大きさ以上の本文はイベントループの外（スレッドプール）で圧縮する
+RESPONSE_COMPRESSION_OFFLOAD_BYTES = _get_int("PLAYWRIGHT_API_RESPONSE_COMPRESSION_OFFLOAD_BYTES", 64 * 1024)
+
+# 終了したタスクのシリアライズ済みステータスを保持するメモリ（MB）
+STATUS_CACHE_MB = _get_int("PLAYWRIGHT_API_STATUS_CACHE_MB", 64)
@@ -0,0 +1,385 @@
+"""
+サイトクローラーモジュール
+
+シードURLから開始し、各ページで抽出したリンクを include / exclude パターンと
+深さ・ページ数の上限で絞り込んでフロンティアに追加します。
+フロンティアのURLは通常のスクレイピングタスクとしてスケジューラに投入され、
+完了した結果は順次ストリームとして読み出せます。結果は直近の一定件数だけを保持し、
+それより古い結果は破棄して件数だけを数えます。終了したクロールは一定時間・一定件数を超えると破棄します。
+
+訪問済みURLは正規化したURLの64ビットハッシュだけを保持するため、
+数百万件規模でも1件あたり16バイト程度のメモリで重複を判定できます。
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import uuid
+from array import array
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .schemas import CrawlRequest, ScrapingRequest
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """
+    重複判定用にURLを正規化する
+
+    スキームとホストの小文字化、デフォルトポート・フラグメントの除去、
+    空パスの補完、クエリパラメータの並べ替えを行います。
+
+    Args:
+        url: URL
+
+    Returns:
+        正規化されたURL（http/https以外の場合はNone）
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class SeenSet:
+    """
+    URLの64ビットハッシュを保持するオープンアドレス法のハッシュ集合
+
+    文字列を保持する set と比べてメモリ使用量が1桁以上小さく、
+    数百万件のURLでも数十MBに収まります。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        size = 1
+        while size < capacity * 2:
+            size *= 2
+        self._table = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @staticmethod
+    def _hash(url: str) -> int:
+        value = int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+        # 0 は空きスロットを表すため使わない
+        return value or 1
+
+    def add(self, url: str) -> bool:
+        """
+        URLを追加する
+
+        Returns:
+            新しく追加された場合はTrue、既に存在した場合はFalse
+        """
+        value = self._hash(url)
+        table = self._table
+        mask = self._mask
+        index = value & mask
+        while True:
+            current = table[index]
+            if current == 0:
+                break
+            if current == value:
+                return False
+            index = (index + 1) & mask
+
+        table[index] = value
+        self._count += 1
+        # 負荷率を1/2以下に保つ
+        if self._count * 2 > len(table):
+            self._grow()
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        value = self._hash(url)
+        table = self._table
+        index = value & self._mask
+        while table[index] != 0:
+            if table[index] == value:
+                return True
+            index = (index + 1) & self._mask
+        return False
+
+    def _grow(self):
+        old = self._table
+        size = len(old) * 2
+        self._table = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        table = self._table
+        mask = self._mask
+        for value in old:
+            if value:
+                index = value & mask
+                while table[index] != 0:
+                    index = (index + 1) & mask
+                table[index] = value
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._table) * self._table.itemsize
+
+
+class CrawlJob:
+    """1回分のクロールの状態"""
+
+    def __init__(self, crawl_id: str, request: CrawlRequest, result_buffer: int = 1000):
+        self.crawl_id = crawl_id
+        self.request = request
+        self.include = [re.compile(p) for p in request.include or []]
+        self.exclude = [re.compile(p) for p in request.exclude or []]
+        self.hosts = {urlsplit(str(seed)).hostname for seed in request.seeds}
+        self.seen = SeenSet()
+        self.frontier: Deque[Tuple[str, int]] = deque()
+        # 実行中のタスクID → 深さ
+        self.in_flight: Dict[str, int] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        # 完了したページの直近の結果（ストリームで順に読み出す）
+        self.results: Deque[Dict[str, Any]] = deque(maxlen=max(1, result_buffer))
+        # 上限を超えて破棄した結果の件数（results[0] の通し番号）
+        self.results_dropped = 0
+        self.updated = asyncio.Event()
+
+    def allowed(self, url: str) -> bool:
+        """URLがクロール対象かどうかを判定する"""
+        if self.request.same_host and urlsplit(url).hostname not in self.hosts:
+            return False
+        if self.include and not any(p.search(url) for p in self.include):
+            return False
+        if any(p.search(url) for p in self.exclude):
+            return False
+        return True
+
+    def discover(self, url: str, depth: int) -> bool:
+        """URLを正規化・重複除去してフロンティアに追加する"""
+        normalized = normalize_url(url)
+        if normalized is None or not self.allowed(normalized):
+            return False
+        if not self.seen.add(normalized):
+            return False
+        self.frontier.append((normalized, depth))
+        return True
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+    def add_result(self, item: Dict[str, Any]):
+        """ページの結果を追加する（上限を超えた古い結果は破棄する）"""
+        if len(self.results) == self.results.maxlen:
+            self.results_dropped += 1
+        self.results.append(item)
+
+    def notify(self):
+        """ストリームの読み手を起こす"""
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    def summary(self) -> Dict[str, Any]:
+        """クロールの状態を辞書で返す"""
+        return {
+            "crawl_id": self.crawl_id,
+            "status": self.status,
+            "discovered": len(self.seen),
+            "frontier": len(self.frontier),
+            "in_flight": len(self.in_flight),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "results_buffered": len(self.results),
+            "results_dropped": self.results_dropped,
+            "seen_memory_bytes": self.seen.memory_bytes,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class CrawlManager:
+    """クロールジョブの管理クラス"""
+
+    def __init__(
+        self,
+        submit: Callable[[ScrapingRequest, str], Awaitable[str]],
+        cancel: Callable[[str], Awaitable[Any]],
+        result_buffer: int = 1000,
+        finished_ttl: float = 3600.0,
+        max_finished: int = 100
+    ):
+        """
+        マネージャの初期化
+
+        Args:
+            submit: ページのスクレイピングタスクを登録してタスクIDを返すコルーチン関数
+            cancel: タスクをキャンセルするコルーチン関数
+            result_buffer: クロールごとに保持する直近の結果の件数
+            finished_ttl: 終了したクロールを保持する秒数
+            max_finished: 保持する終了したクロールの最大数（古いものから破棄する）
+        """
+        self.submit = submit
+        self.cancel_task = cancel
+        self.result_buffer = result_buffer
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.crawls: Dict[str, CrawlJob] = {}
+
+    def _evict(self):
+        """保持期間を過ぎた、または上限を超えた終了済みのクロールを破棄する"""
+        finished = sorted(
+            (crawl for crawl in self.crawls.values() if crawl.finished),
+            key=lambda crawl: crawl.finished_at
+        )
+        expires = time.time() - self.finished_ttl
+        excess = len(finished) - self.max_finished
+        for index, crawl in enumerate(finished):
+            if index < excess or crawl.finished_at < expires:
+                del self.crawls[crawl.crawl_id]
+
+    async def start(self, request: CrawlRequest) -> CrawlJob:
+        """クロールを開始する"""
+        self._evict()
+        # 複数のAPIプロセスや再起動をまたいでもタスクストアの crawl_id が重複しないようにする
+        crawl_id = f"crawl_{uuid.uuid4().hex[:16]}"
+        crawl = CrawlJob(crawl_id, request, self.result_buffer)
+        self.crawls[crawl_id] = crawl
+        for seed in request.seeds:
+            crawl.discover(str(seed), 0)
+        logger.info(f"クロール開始: {crawl_id} (シード: {len(request.seeds)}件)")
+        await self._fill(crawl)
+        return crawl
+
+    def get(self, crawl_id: str) -> Optional[CrawlJob]:
+        self._evict()
+        return self.crawls.get(crawl_id)
+
+    async def cancel(self, crawl: CrawlJob):
+        """クロールを中止し、実行中のタスクをキャンセルする"""
+        if crawl.finished:
+            return
+        self._finish(crawl, "cancelled")
+        crawl.frontier.clear()
+        for task_id in list(crawl.in_flight):
+            await self.cancel_task(task_id)
+
+    def _options(self, crawl: CrawlJob) -> Dict[str, Any]:
+        """ページのスクレイピングタスクに渡すオプション"""
+        options = dict(crawl.request.options or {})
+        options["extract_links"] = True
+        return options
+
+    async def _fill(self, crawl: CrawlJob):
+        """同時実行数の上限までフロンティアからタスクを投入する"""
+        request = crawl.request
+        while (
+            not crawl.finished
+            and crawl.frontier
+            and len(crawl.in_flight) < request.max_in_flight
+            and crawl.submitted < request.max_pages
+        ):
+            url, depth = crawl.frontier.popleft()
+            page_request = ScrapingRequest(
+                url=url,
+                selectors=request.selectors,
+                actions=request.actions,
+                options=self._options(crawl),
+                priority=request.priority
+            )
+            task_id = await self.submit(page_request, crawl.crawl_id)
+            crawl.in_flight[task_id] = depth
+            crawl.submitted += 1
+
+        if not crawl.finished and not crawl.in_flight:
+            self._finish(crawl, "completed")
+
+    def _finish(self, crawl: CrawlJob, status: str):
+        crawl.status = status
+        crawl.finished_at = time.time()
+        logger.info(f"クロール終了: {crawl.crawl_id} ({status}, 完了: {crawl.completed}件, 失敗: {crawl.failed}件)")
+        crawl.notify()
+
+    async def task_done(self, crawl_id: str, task_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]):
+        """
+        ページのスクレイピングタスクの完了を受け取る
+
+        Args:
+            crawl_id: クロールID
+            task_id: タスクID
+            status: タスクの最終ステータス
+            result: スクレイピング結果
+            error: エラーメッセージ
+        """
+        crawl = self.crawls.get(crawl_id)
+        if crawl is None or task_id not in crawl.in_flight:
+            return
+        depth = crawl.in_flight.pop(task_id)
+
+        item: Dict[str, Any] = {"task_id": task_id, "depth": depth, "status": status}
+        if status == "completed" and result:
+            crawl.completed += 1
+            item["url"] = result.get("url")
+            item["data"] = result.get("data")
+            links = result.get("links") or []
+            item["links"] = len(links)
+            if depth < crawl.request.max_depth:
+                for link in links:
+                    crawl.discover(link, depth + 1)
+        else:
+            crawl.failed += 1
+            item["error"] = error
+        crawl.add_result(item)
+        crawl.notify()
+
+        await self._fill(crawl)
+
+    async def stream(self, crawl: CrawlJob, offset: int = 0):
+        """
+        完了したページの結果を順に返す非同期イテレータ
+
+        クロールが終了するまで新しい結果を待ち続けます。読み出す前に破棄された結果は
+        {"skipped": 件数, "offset": 次の位置} の1件にまとめて返します。
+
+        Args:
+            crawl: クロールジョブ
+            offset: 読み出しを開始する位置（ページの結果の通し番号）
+        """
+        position = offset
+        while True:
+            updated = crawl.updated
+            while position < crawl.results_dropped + len(crawl.results):
+                if position < crawl.results_dropped:
+                    skipped = crawl.results_dropped - position
+                    position = crawl.results_dropped
+                    yield {"skipped": skipped, "offset": position}
+                    continue
+                yield crawl.results[position - crawl.results_dropped]
+                position += 1
+            if crawl.finished:
+                return
+            await updated.wait()
@@ -0,0 +1,130 @@
+"""
+HARアーカイブ管理モジュール
+
+タスクごとにPlaywrightでHARを記録し、URLからHARファイルを引ける索引を
+アーカイブ単位で管理します。記録済みのHARは route_from_har で再生でき、
+ネットワークを使わずに同じページ内容に対してセレクタを再実行できます。
+
+索引は追記専用のJSON Linesファイルで、起動時にメモリへ読み込みます。
+同じディレクトリを共有する他のプロセスが追記した分は、URLが見つからない場合や
+一覧の取得時に読み込んだ位置から続けて読み込みます。
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class HarArchiveStore:
+    """HARアーカイブのストア"""
+
+    def __init__(self, base_dir: str = "output/har"):
+        """
+        ストアの初期化
+
+        Args:
+            base_dir: HARアーカイブを保存するディレクトリ
+        """
+        self.base_dir = base_dir
+        # アーカイブ名 → (URL → 最新のHARファイルパス)
+        self.archives: Dict[str, Dict[str, str]] = {}
+        # アーカイブ名 → 索引ファイルを読み込んだバイト位置
+        self._offsets: Dict[str, int] = {}
+        self._load()
+
+    def _archive_dir(self, archive: str) -> str:
+        if not ARCHIVE_NAME_PATTERN.match(archive):
+            raise ValueError(f"無効なHARアーカイブ名: {archive}")
+        return os.path.join(self.base_dir, archive)
+
+    def _index_path(self, archive: str) -> str:
+        return os.path.join(self._archive_dir(archive), "index.jsonl")
+
+    def _load(self):
+        """全アーカイブの索引を読み込む"""
+        self._refresh_all()
+        logger.info(f"HARアーカイブを読み込みました: {len(self.archives)}件")
+
+    def _refresh_all(self):
+        """ディレクトリにある全アーカイブの索引の追記分を読み込む"""
+        if not os.path.isdir(self.base_dir):
+            return
+        for archive in os.listdir(self.base_dir):
+            if ARCHIVE_NAME_PATTERN.match(archive):
+                self._refresh(archive)
+
+    def _refresh(self, archive: str):
+        """アーカイブの索引のうち、前回読み込んだ位置以降の追記分を読み込む"""
+        if not ARCHIVE_NAME_PATTERN.match(archive):
+            return
+        try:
+            f = open(self._index_path(archive), "rb")
+        except OSError:
+            return
+        with f:
+            f.seek(self._offsets.get(archive, 0))
+            data = f.read()
+        # 他のプロセスが書き込み途中の最後の行は次回に読む
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+        index = self.archives.setdefault(archive, {})
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            # 後から記録したものが優先される
+            index[entry["url"]] = entry["har"]
+        self._offsets[archive] = self._offsets.get(archive, 0) + end
+
+    def record_path(self, archive: str) -> str:
+        """
+        新しく記録するHARファイルのパスを返す
+
+        Args:
+            archive: アーカイブ名
+
+        Returns:
+            HARファイルのパス（.zip のため本文は別ファイルとしてまとめて保存される）
+        """
+        archive_dir = self._archive_dir(archive)
+        os.makedirs(archive_dir, exist_ok=True)
+        return os.path.join(archive_dir, f"{uuid.uuid4().hex}.zip")
+
+    def add(self, archive: str, url: str, har_path: str):
+        """記録したHARファイルを索引に追加する"""
+        entry = {"url": url, "har": har_path, "recorded_at": time.time()}
+        with open(self._index_path(archive), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.archives.setdefault(archive, {})[url] = har_path
+        logger.info(f"HARを記録しました: {url} -> {har_path}")
+
+    def lookup(self, archive: str, url: str) -> Optional[str]:
+        """URLに対応するHARファイルのパスを返す（存在しない場合はNone）"""
+        har_path = self.archives.get(archive, {}).get(url)
+        if not har_path:
+            # 他のプロセスが記録したHARを探す
+            self._refresh(archive)
+            har_path = self.archives.get(archive, {}).get(url)
+        if har_path and os.path.exists(har_path):
+            return har_path
+        return None
+
+    def urls(self, archive: str) -> List[str]:
+        """アーカイブに記録されているURLのリストを返す"""
+        self._refresh(archive)
+        return list(self.archives.get(archive, {}))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """アーカイブの一覧を返す"""
+        self._refresh_all()
+        return [{"name": name, "urls": len(index)} for name, index in self.archives.items()]
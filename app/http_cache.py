@@ -0,0 +1,360 @@
+"""
+HTTPレスポンスキャッシュモジュール
+
+Playwrightのリクエストルーティングを使って、JS・CSS・フォント・画像などの
+サブリソースをサーバー側でキャッシュします。キャッシュは全てのブラウザコンテキスト
+（リサイクル後のブラウザを含む）で共有され、Cache-Control / ETag / Last-Modified に従って
+鮮度の判定と条件付きリクエストによる再検証を行います。
+キャッシュのキーはURLのみのため、認証情報（Authorization・Cookie）付きのリクエストと
+Cache-Control: private や Accept-Encoding 以外の Vary を持つレスポンスはキャッシュしません。
+
+メモリ層はバイト数上限のLRUで、溢れたエントリはディスク層（設定時）に移されます。
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from playwright.async_api import BrowserContext, Request, Route
+
+logger = logging.getLogger(__name__)
+
+# キャッシュ対象のリソースタイプ（ドキュメント本体は常に最新を取得する）
+CACHEABLE_RESOURCE_TYPES = frozenset({"script", "stylesheet", "font", "image"})
+
+# route.fetch の本文はデコード済みのため、応答時に取り除くヘッダ
+_ENCODING_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+# キャッシュに保存しないヘッダ
+_STRIPPED_HEADERS = _ENCODING_HEADERS | {"connection", "set-cookie"}
+# キーに含めなくても同じ本文を返せる Vary の値（本文はデコード済みで保存する）
+_IGNORED_VARY = frozenset({"accept-encoding"})
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Cache-Control ヘッダを辞書に変換する"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> Optional[float]:
+    """
+    レスポンスヘッダからキャッシュの有効期間を求める
+
+    Args:
+        headers: レスポンスヘッダ（キーは小文字）
+
+    Returns:
+        有効期間（秒）。キャッシュしてはいけない場合はNone
+    """
+    directives = _parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "set-cookie" in headers:
+        return None
+    # キーはURLのみのため、他のリクエストヘッダで内容が変わるレスポンスは保存しない
+    vary = {name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()}
+    if vary - _IGNORED_VARY:
+        return None
+
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name):
+            try:
+                return max(0.0, float(directives[name]) - float(headers.get("age", 0) or 0))
+            except ValueError:
+                return 0.0
+    if "expires" in headers:
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["expires"]).timestamp()
+            return max(0.0, expires - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+    # 明示的な有効期間が無くても検証子があれば再検証前提で保存する
+    if "etag" in headers or "last-modified" in headers:
+        return 0.0
+    return None
+
+
+class CacheEntry:
+    """キャッシュされたレスポンス"""
+
+    __slots__ = ("status", "headers", "body", "stored_at", "lifetime")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, stored_at: float, lifetime: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.lifetime = lifetime
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.stored_at < self.lifetime
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def validators(self) -> Dict[str, str]:
+        """条件付きリクエスト用のヘッダを返す"""
+        headers = {}
+        if "etag" in self.headers:
+            headers["if-none-match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["if-modified-since"] = self.headers["last-modified"]
+        return headers
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "headers": self.headers,
+            "stored_at": self.stored_at,
+            "lifetime": self.lifetime,
+        }
+
+
+class ResponseCache:
+    """ブラウザコンテキスト間で共有するHTTPレスポンスキャッシュ"""
+
+    def __init__(
+        self,
+        memory_bytes: int = 128 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_bytes: int = 1024 * 1024 * 1024,
+        max_entry_bytes: int = 16 * 1024 * 1024
+    ):
+        """
+        キャッシュの初期化
+
+        Args:
+            memory_bytes: メモリ層の最大バイト数
+            disk_dir: ディスク層のディレクトリ（Noneの場合はメモリ層のみ）
+            disk_bytes: ディスク層の最大バイト数
+            max_entry_bytes: キャッシュする1レスポンスの最大バイト数
+        """
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._memory_size = 0
+        # ディスク層の索引（キー → 本文のバイト数）
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.bypassed = 0
+        self.bytes_served = 0
+        if disk_dir:
+            self._load_disk_index()
+
+    async def attach(self, context: BrowserContext):
+        """ブラウザコンテキストのリクエストをキャッシュ経由にする"""
+        async def handle(route: Route, request: Request):
+            await self._handle(route, request, context)
+
+        await context.route("**/*", handle)
+
+    async def _has_credentials(self, request: Request, context: BrowserContext) -> bool:
+        """リクエストに認証情報（Authorization ヘッダ・Cookie）が付くかどうか"""
+        if "authorization" in request.headers or "cookie" in request.headers:
+            return True
+        # Cookie はブラウザが送信時に付けるため、コンテキストに保存されているかで判定する
+        return bool(await context.cookies(request.url))
+
+    async def _handle(self, route: Route, request: Request, context: BrowserContext):
+        """ルーティングされたリクエストを処理する"""
+        if request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            await route.fallback()
+            return
+        # ログイン中のプロファイルなど、利用者ごとに内容が変わり得るリクエストは共有キャッシュを使わない
+        try:
+            credentialed = await self._has_credentials(request, context)
+        except Exception as e:
+            logger.debug(f"Cookieの確認に失敗: {request.url}: {str(e)}")
+            credentialed = True
+        if credentialed:
+            self.bypassed += 1
+            await route.fallback()
+            return
+
+        key = request.url
+        entry = await self._get(key)
+        if entry is not None and entry.fresh:
+            self.hits += 1
+            self.bytes_served += entry.size
+            await route.fulfill(status=entry.status, headers=entry.headers, body=entry.body)
+            return
+
+        headers = dict(request.headers)
+        if entry is not None:
+            headers.update(entry.validators())
+        try:
+            response = await route.fetch(headers=headers)
+        except Exception as e:
+            logger.debug(f"キャッシュ経由のリクエストに失敗: {key}: {str(e)}")
+            await route.fallback()
+            return
+
+        response_headers = {name.lower(): value for name, value in response.headers.items()}
+        if response.status == 304 and entry is not None:
+            # 再検証に成功したので有効期間だけ更新する
+            lifetime = freshness_lifetime({**entry.headers, **response_headers})
+            entry.stored_at = time.time()
+            entry.lifetime = lifetime or 0.0
+            self.revalidated += 1
+            self.bytes_served += entry.size
+            await route.fulfill(status=entry.status, headers=entry.headers, body=entry.body)
+            return
+
+        self.misses += 1
+        body = await response.body()
+        lifetime = freshness_lifetime(response_headers)
+        if response.status == 200 and lifetime is not None and len(body) <= self.max_entry_bytes:
+            stored_headers = {k: v for k, v in response_headers.items() if k not in _STRIPPED_HEADERS}
+            await self._put(key, CacheEntry(response.status, stored_headers, body, time.time(), lifetime))
+        headers = {k: v for k, v in response_headers.items() if k not in _ENCODING_HEADERS}
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+    async def _get(self, key: str) -> Optional[CacheEntry]:
+        """メモリ層、ディスク層の順にエントリを探す"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+
+        if key not in self._disk:
+            return None
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._read_disk, key)
+        if entry is None:
+            await self._drop_disk(key)
+            return None
+        await self._put(key, entry, promoted=True)
+        return entry
+
+    async def _put(self, key: str, entry: CacheEntry, promoted: bool = False):
+        """エントリをメモリ層に保存し、溢れた分をディスク層に移す"""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= old.size
+        self._memory[key] = entry
+        self._memory_size += entry.size
+        if not promoted:
+            self.stored += 1
+
+        evicted = []
+        while self._memory_size > self.memory_bytes and self._memory:
+            evicted_key, evicted_entry = self._memory.popitem(last=False)
+            self._memory_size -= evicted_entry.size
+            evicted.append((evicted_key, evicted_entry))
+
+        if self.disk_dir and evicted:
+            loop = asyncio.get_running_loop()
+            for evicted_key, evicted_entry in evicted:
+                if not await loop.run_in_executor(None, self._write_disk, evicted_key, evicted_entry):
+                    continue
+                # 索引の更新はイベントループ側で行う
+                if evicted_key in self._disk:
+                    self._disk_size -= self._disk.pop(evicted_key)
+                self._disk[evicted_key] = evicted_entry.size
+                self._disk_size += evicted_entry.size
+            while self._disk_size > self.disk_bytes and self._disk:
+                await self._drop_disk(next(iter(self._disk)))
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _load_disk_index(self):
+        """ディスク層の索引を再構築する（古いものから順に並べる）"""
+        os.makedirs(self.disk_dir, exist_ok=True)
+        found = []
+        for filename in os.listdir(self.disk_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.disk_dir, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                found.append((os.path.getmtime(path), meta["key"], meta["size"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        for _, key, size in sorted(found):
+            self._disk[key] = size
+            self._disk_size += size
+        logger.info(f"HTTPキャッシュのディスク層を読み込みました: {len(self._disk)}件")
+
+    def _write_disk(self, key: str, entry: CacheEntry) -> bool:
+        """エントリをディスク層に書き込む（ワーカースレッドで実行）"""
+        path = self._disk_path(key)
+        try:
+            with open(path + ".body", "wb") as f:
+                f.write(entry.body)
+            with open(path + ".json", "w", encoding="utf-8") as f:
+                json.dump(dict(entry.meta(), key=key, size=entry.size), f)
+        except OSError as e:
+            logger.warning(f"HTTPキャッシュのディスク書き込みに失敗: {str(e)}")
+            return False
+        return True
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        """ディスク層からエントリを読み込む（ワーカースレッドで実行）"""
+        path = self._disk_path(key)
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(path + ".body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(meta["status"], meta["headers"], body, meta["stored_at"], meta["lifetime"])
+
+    async def _drop_disk(self, key: str):
+        """ディスク層からエントリを削除する"""
+        size = self._disk.pop(key, None)
+        if size is None:
+            return
+        self._disk_size -= size
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._remove_disk_files, key)
+
+    def _remove_disk_files(self, key: str):
+        """ディスク層のファイルを削除する（ワーカースレッドで実行）"""
+        path = self._disk_path(key)
+        for suffix in (".json", ".body"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報を返す"""
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.revalidated) / lookups, 3) if lookups else 0.0,
+            "stored": self.stored,
+            "bypassed": self.bypassed,
+            "bytes_served": self.bytes_served,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+        }
@@ -1,16 +1,41 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+import re
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Any, Tuple
 
-from .schemas import ScrapingRequest, ScrapingResponse, ScraperStatus
+from .schemas import (
+    ScrapingRequest, BatchScrapingRequest, CancelTasksRequest, SessionProfileDefinition, HarReplayRequest,
+    CrawlRequest, StatusBatchRequest,
+    ScrapingResponse, ScraperStatus, StatusBatchResponse
+)
 from .scraper import PlaywrightScraper
+from .scheduler import ScrapeScheduler, ScrapeJob
+from .profiles import SessionProfileStore, SessionProfile, SessionExpiredError
+from .http_cache import ResponseCache
+from .har import HarArchiveStore
+from .crawler import CrawlManager
+from .changes import ChangeIndex, content_hash
+from .task_store import create_task_store, FINAL_STATUSES, TaskRecord
+from .task_queue import create_task_queue
+from .worker import QueueWorker
+from .offload import PostProcessor, LoopLagMonitor
+from .compression import (
+    CompressionMiddleware, CompressedText, resolve_codec, pack_html, unpack_html, is_packed, accepted_encodings,
+    preferred_encoding, compress_body
+)
+from .serialization import SerializedCache, dumps, serialize_status
+from . import config
 
 app = FastAPI(
     title="PlaywrightAPI",
     description="Playwright を使用したウェブスクレイピング API",
-    version="1.0.0"
+    version="1.0.0",
+    # 全てのエンドポイントのレスポンスをorjsonでシリアライズする
+    default_response_class=ORJSONResponse
 )
 
 # CORS設定
@@ -27,86 +52,709 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # スクレイパーインスタンス
-scraper = PlaywrightScraper()
-scraping_tasks: Dict[str, Dict[str, Any]] = {}
+response_cache = ResponseCache(
+    memory_bytes=config.HTTP_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_dir=config.HTTP_CACHE_DISK_DIR,
+    disk_bytes=config.HTTP_CACHE_DISK_MB * 1024 * 1024
+) if config.HTTP_CACHE_ENABLED else None
+post_processor = PostProcessor(
+    threads=config.POSTPROCESS_THREADS,
+    processes=config.POSTPROCESS_PROCESSES,
+    max_pending=config.POSTPROCESS_MAX_PENDING
+)
+scraper = PlaywrightScraper(response_cache=response_cache, post_processor=post_processor)
+
+# Accept-Encoding に応じたレスポンスの圧縮（br / gzip）
+# 大きな本文はイベントループを止めないよう後処理のスレッドプールで圧縮する
+if config.RESPONSE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=config.RESPONSE_COMPRESSION_MIN_BYTES,
+        offload=post_processor.run_io,
+        offload_min_size=config.RESPONSE_COMPRESSION_OFFLOAD_BYTES
+    )
+
+loop_monitor = LoopLagMonitor(interval=config.LOOP_LAG_INTERVAL)
+task_store = create_task_store(config.TASK_STORE, config.TASK_STORE_PATH, config.TASK_RESULT_INLINE_KB)
+# 分散モードではタスクをキューに登録し、ワーカーがスクレイピングする
+DISTRIBUTED = config.MODE == "api"
+task_queue = create_task_queue(config.QUEUE_BACKEND, config.QUEUE_PATH)
+session_profiles = SessionProfileStore(config.PROFILE_DIR)
+har_archives = HarArchiveStore(config.HAR_DIR)
+change_index = ChangeIndex(config.CHANGE_INDEX_PATH)
+# タスク結果として保持するHTMLの圧縮方式
+html_storage_codec = resolve_codec(config.HTML_STORAGE_COMPRESSION)
+# 終了したタスクのシリアライズ済みステータス
+status_cache = SerializedCache(config.STATUS_CACHE_MB * 1024 * 1024)
+
+
+async def login_profile(profile: SessionProfile) -> Dict[str, Any]:
+    """セッションプロファイルのログインアクションを実行してstorage_stateを取得する"""
+    definition = profile.definition
+    return await scraper.capture_storage_state(str(definition.login_url), definition.actions)
+
+
+async def scrape_with_profile(request: ScrapingRequest, **kwargs) -> Dict[str, Any]:
+    """セッションプロファイルが指定されていればログイン状態を適用してスクレイピングする"""
+    if not request.session_profile:
+        return await scraper.scrape(str(request.url), request.selectors, request.actions, **kwargs)
+    profile = session_profiles.get(request.session_profile)
+    if profile is None:
+        # ログインしていない状態でスクレイピングすると誤った結果になるため、タスクを失敗にする
+        raise ValueError(f"セッションプロファイルが見つかりません: {request.session_profile}")
+    
+    state = await session_profiles.get_storage_state(profile, login_profile)
+    try:
+        return await scraper.scrape(
+            str(request.url), request.selectors, request.actions,
+            storage_state=state, session_check=profile.definition.check_selector, **kwargs
+        )
+    except SessionExpiredError as e:
+        # ログイン状態が切れているため、ログインし直して1回だけ再試行する
+        # （タイムアウトなど他の例外では共有のログイン状態を捨てずにそのまま失敗にする）
+        logger.warning(f"セッションプロファイルを更新して再試行します: {profile.name}: {str(e)}")
+        state = await session_profiles.get_storage_state(profile, login_profile, refresh=True)
+        return await scraper.scrape(
+            str(request.url), request.selectors, request.actions,
+            storage_state=state, session_check=profile.definition.check_selector, **kwargs
+        )
+
+
+async def check_not_modified(request: ScrapingRequest, previous: Dict[str, Any]) -> bool:
+    """前回の取得状態を使って条件付きリクエストで変更の有無を確認する"""
+    storage_state = None
+    if request.session_profile:
+        profile = session_profiles.get(request.session_profile)
+        # ログイン状態が無いと正しく比較できないため、通常のスクレイピングに任せる
+        if profile is None or not profile.fresh:
+            return False
+        storage_state = profile.storage_state
+    return await scraper.check_not_modified(str(request.url), previous, storage_state)
+
+
+async def run_scrape(request: ScrapingRequest) -> Dict[str, Any]:
+    """リクエストの内容でスクレイピングを実行する"""
+    options = request.options or {}
+    url = str(request.url)
+    kwargs = {
+        "save_html_file": request.save_html_file,
+        "html_output_dir": request.html_output_dir,
+        "http_cache": options.get("http_cache", True),
+        "take_screenshot": options.get("screenshot", True),
+        "get_html": options.get("html", True),
+        "extract_links": options.get("extract_links", False),
+        "html_compression": resolve_codec(options.get("html_compression", config.HTML_FILE_COMPRESSION)),
+    }
+    
+    # HARの記録・再生
+    archive = options.get("har_archive", "default")
+    har_record_path = None
+    if options.get("har_replay"):
+        har_path = har_archives.lookup(archive, url)
+        if not har_path:
+            raise ValueError(f"HARアーカイブ {archive} にURLが記録されていません: {url}")
+        kwargs["har_replay_path"] = har_path
+    elif options.get("har_record"):
+        har_record_path = har_archives.record_path(archive)
+        kwargs["har_record_path"] = har_record_path
+    
+    # 変更検知（前回から変更が無ければレンダリングと抽出を省略する）
+    incremental = options.get("incremental", False) and not options.get("har_replay")
+    previous = None
+    if incremental:
+        previous = await change_index.get(url)
+        if previous and await check_not_modified(request, previous):
+            await change_index.mark_not_modified(url)
+            logger.info(f"前回から変更がないためスキップしました: {url}")
+            return {"url": url, "data": {}, "not_modified": True, "changed": False, "changed_at": previous["changed_at"]}
+        kwargs["capture_document"] = True
+    
+    result = await scrape_with_profile(request, **kwargs)
+    
+    if har_record_path:
+        har_archives.add(archive, url, har_record_path)
+    if incremental:
+        document = result.pop("_document", None) or {}
+        # 数MBになるHTMLのハッシュ計算はイベントループの外で行う
+        html_hash = await post_processor.run_cpu(content_hash, result["html"]) if result.get("html") else None
+        data_hash = await post_processor.run_cpu(content_hash, result["data"])
+        result["changed"], result["changed_at"] = await change_index.record(
+            url, previous, document, data_hash, html_hash,
+            compare=options.get("change_key", "data")
+        )
+        result["not_modified"] = False
+    return result
+
+
+async def scrape_task(job: ScrapeJob):
+    """バックグラウンドでスクレイピングを実行するタスク"""
+    task_id = job.task_id
+    request = job.request
+    try:
+        await task_store.update(task_id, status="running")
+        result = await run_scrape(request)
+        if html_storage_codec:
+            # 取得してから参照されるまでの間、HTMLを圧縮して保持する
+            result = await post_processor.run_cpu(pack_html, result, html_storage_codec)
+        await task_store.update(task_id, status="completed", result=result)
+    except asyncio.CancelledError:
+        if job.cancelled:
+            logger.info(f"スクレイピングがキャンセルされました: {task_id}")
+            await task_store.update(task_id, status="cancelled")
+        else:
+            # サーバー・ワーカーの停止による中断は、再起動後や他のワーカーで再実行する
+            logger.info(f"停止によりスクレイピングを中断しました: {task_id}")
+        raise
+    except Exception as e:
+        logger.error(f"スクレイピングエラー: {str(e)}")
+        await task_store.update(task_id, status="failed", error=str(e))
+    await notify_task_done(task_id)
+
+
+async def notify_task_done(task_id: str):
+    """クロールのページだった場合はクローラーに完了を通知する"""
+    task_info = await task_store.get(task_id)
+    if task_info.crawl_id is not None:
+        await crawler.task_done(task_info.crawl_id, task_id, task_info.status, task_info.result, task_info.error)
+
+
+# ホスト単位の同時実行制限を行うスケジューラ
+scheduler = ScrapeScheduler(
+    scrape_task,
+    workers=config.SCRAPER_WORKERS,
+    max_per_host=config.HOST_MAX_CONCURRENCY,
+    min_delay=config.HOST_MIN_DELAY,
+    priority_mode=config.PRIORITY_MODE,
+    priority_weights=config.PRIORITY_WEIGHTS
+)
+
+
+async def resume_tasks(claimed: List[Tuple[str, TaskRecord]]):
+    """再起動前や停止した他のプロセスで完了しなかったタスクをスケジューラに投入し直す"""
+    for task_id, record in claimed:
+        if record.crawl_id is not None:
+            # クロールの状態はメモリ上にしか無いため、クロールのページは再開できない
+            await task_store.update(task_id, status="failed", error="サーバーの再起動によりクロールが中断されました")
+            continue
+        await submit_task(task_id, ScrapingRequest(**record.request))
+
+
+async def fail_dropped_task(task_id: str):
+    """ワーカーの停止で再試行回数の上限を超えたタスクを失敗にする"""
+    await task_store.update(task_id, status="failed", error="ワーカーの停止が繰り返されたため実行を中止しました")
+
+
+def create_worker() -> QueueWorker:
+    """タスクキューからタスクを取り出して実行するワーカーを作成する"""
+    return QueueWorker(task_queue, scrape_task, on_dropped=fail_dropped_task, persist=task_store.flush)
+
+
+async def poll_crawl_tasks():
+    """分散モードでワーカーが完了したクロールのページをクローラーに通知する"""
+    for crawl in list(crawler.crawls.values()):
+        if crawl.finished:
+            continue
+        for task_id in list(crawl.in_flight):
+            task_info = await task_store.get(task_id)
+            if task_info and task_info.status in FINAL_STATUSES:
+                await crawler.task_done(
+                    crawl.crawl_id, task_id, task_info.status, task_info.result, task_info.error
+                )
+
+
+async def maintain_queue():
+    """分散モードでハートビートが途絶えたタスクの再投入とクロールの進行を行う"""
+    while True:
+        await asyncio.sleep(1.0)
+        try:
+            for task_id in await task_queue.requeue_stale(config.WORKER_STALE_TIMEOUT, config.TASK_MAX_ATTEMPTS):
+                await fail_dropped_task(task_id)
+            await poll_crawl_tasks()
+        except Exception as e:
+            logger.error(f"タスクキューの保守に失敗: {str(e)}")
+
+
+# 分散モードで同じプロセス内に起動するワーカー（local キューの場合のみ）
+local_worker: Optional[QueueWorker] = None
+maintenance_task: Optional[asyncio.Task] = None
+
+
+def check_shared_storage():
+    """複数プロセスで動かす分散モードに必要な共有ディレクトリが設定されているか確認する"""
+    # プロファイルとHARはファイルを介してAPIサーバーとワーカーの間で共有する
+    if not config.PROFILE_DIR:
+        raise RuntimeError("分散モードでは全てのプロセスで共有する PLAYWRIGHT_API_PROFILE_DIR が必要です")
+    if not config.HAR_DIR_CONFIGURED:
+        raise RuntimeError("分散モードでは全てのプロセスで共有する PLAYWRIGHT_API_HAR_DIR が必要です")
 
 
 @app.on_event("startup")
 async def startup_event():
+    global local_worker, maintenance_task
+    if DISTRIBUTED and config.QUEUE_BACKEND == "sqlite":
+        if config.TASK_STORE != "sqlite":
+            raise RuntimeError("分散モードで sqlite キューを使う場合は PLAYWRIGHT_API_TASK_STORE=sqlite が必要です")
+        check_shared_storage()
+    loop_monitor.start()
+    await task_store.start()
+    if DISTRIBUTED:
+        await task_queue.start()
+        if config.QUEUE_BACKEND == "local":
+            await scraper.initialize()
+            local_worker = create_worker()
+            await local_worker.start()
+            await resume_tasks(await task_store.claim_unfinished())
+            task_store.watch_unfinished(resume_tasks)
+        maintenance_task = asyncio.create_task(maintain_queue())
+        logger.info(f"分散モードで起動しました（キュー: {config.QUEUE_BACKEND}）")
+        return
+    
     await scraper.initialize()
+    await scheduler.start()
+    await resume_tasks(await task_store.claim_unfinished())
+    task_store.watch_unfinished(resume_tasks)
     logger.info("Playwrightスクレイパーが初期化されました")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if DISTRIBUTED:
+        if maintenance_task:
+            maintenance_task.cancel()
+        if local_worker:
+            await local_worker.stop()
+        await task_queue.close()
+    else:
+        await scheduler.stop()
     await scraper.close()
+    await task_store.close()
+    await loop_monitor.stop()
+    post_processor.close()
+    change_index.close()
     logger.info("Playwrightスクレイパーが終了しました")
 
 
-async def scrape_task(task_id: str, request: ScrapingRequest):
-    """バックグラウンドでスクレイピングを実行するタスク"""
-    try:
-        scraping_tasks[task_id]["status"] = "running"
-        result = await scraper.scrape(
-            str(request.url), 
-            request.selectors, 
-            request.actions,
-            save_html_file=request.save_html_file,
-            html_output_dir=request.html_output_dir
-        )
-        scraping_tasks[task_id]["status"] = "completed"
-        scraping_tasks[task_id]["result"] = result
-    except Exception as e:
-        logger.error(f"スクレイピングエラー: {str(e)}")
-        scraping_tasks[task_id]["status"] = "failed"
-        scraping_tasks[task_id]["error"] = str(e)
+async def enqueue_task(
+    request: ScrapingRequest,
+    batch_id: Optional[str] = None,
+    crawl_id: Optional[str] = None
+) -> str:
+    """タスクを登録してスケジューラのキューに追加する"""
+    task_id = task_store.new_task_id()
+    
+    # リクエストは既定値の項目を除いたJSONで保持する（ScrapingRequest(**record.request) で復元できる）
+    request_json = dumps(request.model_dump(mode="json", exclude_defaults=True))
+    record = TaskRecord("pending", request_json, batch_id=batch_id or None, crawl_id=crawl_id or None)
+    await task_store.create(task_id, record)
+    
+    await submit_task(task_id, request)
+    return task_id
+
+
+async def submit_task(task_id: str, request: ScrapingRequest):
+    """タスクをスケジューラ、または分散モードではタスクキューに投入する"""
+    if not DISTRIBUTED:
+        await scheduler.submit(task_id, request)
+        return
+    # 状態はワーカーが書き込むため、このプロセスでは書き込み後にタスクストアから読み出す
+    task_store.release(task_id)
+    # ワーカーがタスクを読み込めるよう、キューに入れる前にタスクストアへ書き込む
+    await task_store.flush()
+    request_dict = request.model_dump(mode="json")
+    await task_queue.put(task_id, request_dict, request.priority)
 
 
 @app.post("/scrape", response_model=Dict[str, str])
-async def scrape(request: ScrapingRequest, background_tasks: BackgroundTasks):
+async def scrape(request: ScrapingRequest):
     """スクレイピングタスクを開始する"""
-    task_id = f"task_{len(scraping_tasks) + 1}"
-    
     # リクエストの内容をログに出力
     logger.info(f"スクレイピングリクエスト受信: {request.url}")
     logger.info(f"save_html_file: {request.save_html_file}")
     logger.info(f"html_output_dir: {request.html_output_dir}")
     
-    # request.dictの代わりにモデルを手動で辞書に変換し、URLを文字列に変換
-    request_dict = {
-        "url": str(request.url),
-        "selectors": request.selectors,
-        "actions": [action.dict() for action in request.actions] if request.actions else None,
-        "options": request.options,
-        "save_html_file": request.save_html_file,
-        "html_output_dir": request.html_output_dir
-    }
-    
-    scraping_tasks[task_id] = {"status": "pending", "request": request_dict}
+    if request.session_profile and not session_profiles.get(request.session_profile):
+        raise HTTPException(status_code=404, detail="セッションプロファイルが見つかりません")
     
-    background_tasks.add_task(scrape_task, task_id, request)
+    task_id = await enqueue_task(request)
     
     return {"task_id": task_id, "status": "pending"}
 
 
+@app.post("/scrape/batch", response_model=Dict[str, Any])
+async def scrape_batch(batch: BatchScrapingRequest):
+    """複数のスクレイピングタスクをまとめて開始する"""
+    for request in batch.requests:
+        if request.session_profile and not session_profiles.get(request.session_profile):
+            raise HTTPException(status_code=404, detail="セッションプロファイルが見つかりません")
+    
+    batch_id = task_store.new_batch_id()
+    logger.info(f"バッチスクレイピングリクエスト受信: {batch_id} ({len(batch.requests)}件, 優先度: {batch.priority})")
+    
+    task_ids = []
+    for request in batch.requests:
+        # 個別に優先度が指定されていないリクエストにはバッチの優先度を適用する
+        if "priority" not in request.model_fields_set:
+            request.priority = batch.priority
+        task_ids.append(await enqueue_task(request, batch_id))
+    
+    return {"batch_id": batch_id, "status": "pending", "task_ids": task_ids}
+
+
+# fields で選択できる結果の項目
+RESULT_FIELDS = frozenset(ScrapingResponse.model_fields)
+
+
+def parse_fields(fields: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """
+    返す結果の項目の指定を解釈する
+
+    Args:
+        fields: 項目名（Noneの場合は全ての項目を返す）
+
+    Returns:
+        返す項目の集合（url は常に含む）
+    """
+    if fields is None:
+        return None
+    names = frozenset(name.strip() for name in fields if name.strip())
+    unknown = names - RESULT_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不明な項目: {', '.join(sorted(unknown))}")
+    return names | {"url"}
+
+
+def project_result(result: Dict[str, Any], fields: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    """結果から指定した項目だけを取り出す（除いたHTMLは展開しない）"""
+    if fields is None:
+        return result
+    return {key: value for key, value in result.items() if key in fields}
+
+
+async def cached_status_response(cache_key: str, body: bytes, encoding: Optional[str]) -> Response:
+    """
+    シリアライズ済みのステータスを返す
+
+    圧縮した本文も圧縮方式ごとにキャッシュし、ポーリングのたびに圧縮し直さない
+    （Content-Encoding を付けるため、CompressionMiddleware はそのまま送る）。
+    """
+    if encoding is None or len(body) < config.RESPONSE_COMPRESSION_MIN_BYTES:
+        return Response(content=body, media_type="application/json")
+    compressed = status_cache.get(cache_key, encoding)
+    if compressed is None:
+        compressed = await post_processor.run_cpu(compress_body, encoding, body)
+        status_cache.put(cache_key, compressed, encoding)
+    headers = {"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+    return Response(content=compressed, media_type="application/json", headers=headers)
+
+
 @app.get("/status/{task_id}", response_model=ScraperStatus)
-async def get_status(task_id: str):
-    """スクレイピングタスクのステータスを取得する"""
-    if task_id not in scraping_tasks:
+async def get_status(task_id: str, request: Request, fields: Optional[str] = None):
+    """
+    スクレイピングタスクのステータスを取得する
+    
+    fields にカンマ区切りで項目名（例: data,errors）を指定すると、結果のうちその項目だけを返す
+    """
+    projection = parse_fields(fields.split(",") if fields is not None else None)
+    cache_key = task_id if projection is None else f"{task_id}?fields={','.join(sorted(projection))}"
+    encoding = None
+    if config.RESPONSE_COMPRESSION:
+        encoding = preferred_encoding(request.headers.get("accept-encoding", ""))
+    body = status_cache.get(cache_key)
+    if body is not None:
+        return await cached_status_response(cache_key, body, encoding)
+    
+    task_info = await task_store.get(task_id)
+    if task_info is None:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
-    task_info = scraping_tasks[task_id]
     response = {
         "task_id": task_id,
-        "status": task_info["status"],
+        "status": task_info.status,
     }
     
-    if "result" in task_info:
-        response["result"] = task_info["result"]
-    if "error" in task_info:
-        response["error"] = task_info["error"]
+    if task_info.result is not None:
+        result = project_result(task_info.result, projection)
+        if is_packed(result):
+            result = await post_processor.run_cpu(unpack_html, result)
+        response["result"] = result
+    if task_info.error is not None:
+        response["error"] = task_info.error
+    
+    if task_info.status not in FINAL_STATUSES:
+        return response
+    
+    # 終了したタスクのステータスは変わらないため、一度だけシリアライズして以後のポーリングに使う
+    body = await post_processor.run_cpu(serialize_status, response)
+    status_cache.put(cache_key, body)
+    return await cached_status_response(cache_key, body, encoding)
+
+
+async def get_result(task_id: str) -> Dict[str, Any]:
+    """完了したタスクの結果を返す"""
+    task_info = await task_store.get(task_id)
+    if task_info is None:
+        raise HTTPException(status_code=404, detail="タスクが見つかりません")
+    if task_info.result is None:
+        raise HTTPException(status_code=404, detail="タスクの結果がありません")
+    return task_info.result
+
+
+@app.get("/tasks/{task_id}/screenshot")
+async def get_screenshot(task_id: str):
+    """完了したタスクのスクリーンショットを、Base64ではなく画像のまま返す"""
+    screenshot = (await get_result(task_id)).get("screenshot")
+    if not screenshot:
+        raise HTTPException(status_code=404, detail="スクリーンショットがありません")
+    image = await post_processor.decode_base64(screenshot)
+    media_type = "image/png" if image.startswith(b"\x89PNG") else "image/jpeg"
+    return Response(content=image, media_type=media_type)
+
+
+@app.get("/tasks/{task_id}/html")
+async def get_html(task_id: str, request: Request):
+    """完了したタスクのHTMLを、JSONに埋め込まずにそのまま返す"""
+    html = (await get_result(task_id)).get("html")
+    if not html:
+        raise HTTPException(status_code=404, detail="HTMLがありません")
+    media_type = "text/html; charset=utf-8"
+    if isinstance(html, CompressedText):
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        if html.codec == "gzip" and accepted.get("gzip", 0) > 0:
+            # gzipで保持しているHTMLは展開せずにそのまま送る
+            return Response(content=html.data, media_type=media_type, headers={"Content-Encoding": "gzip"})
+        html = await post_processor.run_cpu(html.text)
+    return Response(content=html, media_type=media_type)
+
+
+# 書き込みの遅れやノード間の時刻のずれで更新を取りこぼさないよう、cursor を戻す秒数
+STATUS_CURSOR_SLACK = 2.0
+
+
+@app.post("/status/batch", response_model=StatusBatchResponse)
+async def get_statuses(request: StatusBatchRequest):
+    """複数のスクレイピングタスクのステータスをまとめて取得する"""
+    if request.task_ids is None and not request.batch_id:
+        raise HTTPException(status_code=400, detail="task_ids または batch_id を指定してください")
+    
+    # 読み込みの前の時刻を cursor にする（次回は重複して返ることはあっても取りこぼしは無い）
+    cursor = time.time() - STATUS_CURSOR_SLACK
+    summaries = await task_store.summaries(request.task_ids, request.batch_id)
+    if summaries is None:
+        raise HTTPException(status_code=404, detail="バッチが見つかりません")
+    
+    counts: Dict[str, int] = {}
+    for summary in summaries:
+        counts[summary["status"]] = counts.get(summary["status"], 0) + 1
+    missing = []
+    if request.task_ids is not None:
+        found = {summary["task_id"] for summary in summaries}
+        missing = [task_id for task_id in request.task_ids if task_id not in found]
+    
+    tasks = summaries
+    if request.since is not None:
+        tasks = [summary for summary in summaries if (summary["updated_at"] or 0) > request.since]
+    if request.include_results:
+        projection = parse_fields(request.fields)
+        for summary in tasks:
+            if summary["status"] != "completed":
+                continue
+            task_info = await task_store.get(summary["task_id"])
+            result = project_result(task_info.result, projection) if task_info and task_info.result else None
+            if is_packed(result):
+                result = await post_processor.run_cpu(unpack_html, result)
+            summary["result"] = result
+    
+    return {"tasks": tasks, "counts": counts, "total": len(summaries), "missing": missing, "cursor": cursor}
+
+
+async def cancel_task(task_id: str) -> str:
+    """タスクをキャンセルし、キャンセル後のステータスを返す"""
+    task_info = await task_store.get(task_id)
+    if task_info.status in ("pending", "running"):
+        if DISTRIBUTED:
+            # 実行中のワーカーはハートビートでキャンセルに気付いて実行をやめる
+            await task_queue.cancel(task_id)
+            if local_worker:
+                await local_worker.scheduler.cancel(task_id)
+        else:
+            await scheduler.cancel(task_id)
+        await task_store.update(task_id, status="cancelled")
+        await notify_task_done(task_id)
+        return "cancelled"
+    return task_info.status
+
+
+@app.delete("/tasks/{task_id}", response_model=Dict[str, str])
+async def delete_task(task_id: str):
+    """スクレイピングタスクをキャンセルする"""
+    if await task_store.get(task_id) is None:
+        raise HTTPException(status_code=404, detail="タスクが見つかりません")
+    
+    status = await cancel_task(task_id)
+    return {"task_id": task_id, "status": status}
+
+
+@app.post("/tasks/cancel", response_model=Dict[str, Any])
+async def cancel_tasks(request: CancelTasksRequest):
+    """複数のスクレイピングタスクをまとめてキャンセルする"""
+    task_ids = list(request.task_ids or [])
+    if request.batch_id:
+        batch_task_ids = await task_store.batch_task_ids(request.batch_id)
+        if batch_task_ids is None:
+            raise HTTPException(status_code=404, detail="バッチが見つかりません")
+        task_ids.extend(batch_task_ids)
+    
+    cancelled = []
+    not_cancelled = []
+    for task_id in task_ids:
+        task_info = await task_store.get(task_id)
+        if task_info is None:
+            not_cancelled.append(task_id)
+            continue
+        previous = task_info.status
+        status = await cancel_task(task_id)
+        if status == "cancelled" and previous != "cancelled":
+            cancelled.append(task_id)
+        else:
+            not_cancelled.append(task_id)
     
-    return response
+    logger.info(f"タスクを一括キャンセルしました: {len(cancelled)}件")
+    return {"cancelled": cancelled, "not_cancelled": not_cancelled}
+
+
+@app.post("/profiles", response_model=Dict[str, Any])
+async def create_profile(definition: SessionProfileDefinition):
+    """セッションプロファイルを登録する（同名のプロファイルは置き換える）"""
+    profile = session_profiles.upsert(definition)
+    return profile.summary()
+
+
+@app.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles():
+    """セッションプロファイルの一覧を取得する"""
+    return session_profiles.list()
+
+
+@app.post("/profiles/{name}/refresh", response_model=Dict[str, Any])
+async def refresh_profile(name: str):
+    """セッションプロファイルのログインをやり直す"""
+    profile = session_profiles.get(name)
+    if not profile:
+        raise HTTPException(status_code=404, detail="セッションプロファイルが見つかりません")
+    
+    try:
+        await session_profiles.get_storage_state(profile, login_profile, refresh=True)
+    except Exception as e:
+        logger.error(f"ログインエラー: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"ログインに失敗しました: {str(e)}")
+    return profile.summary()
+
+
+@app.delete("/profiles/{name}", response_model=Dict[str, str])
+async def delete_profile(name: str):
+    """セッションプロファイルを削除する"""
+    if not session_profiles.delete(name):
+        raise HTTPException(status_code=404, detail="セッションプロファイルが見つかりません")
+    return {"name": name, "status": "deleted"}
+
+
+@app.get("/har/archives", response_model=List[Dict[str, Any]])
+async def list_har_archives():
+    """HARアーカイブの一覧を取得する"""
+    return har_archives.list()
+
+
+@app.post("/har/archives/{name}/replay", response_model=Dict[str, Any])
+async def replay_har_archive(name: str, replay: HarReplayRequest):
+    """HARアーカイブに記録された全URLをネットワークを使わずに再スクレイピングする"""
+    urls = har_archives.urls(name)
+    if not urls:
+        raise HTTPException(status_code=404, detail="HARアーカイブが見つかりません")
+    
+    options = dict(replay.options or {}, har_replay=True, har_archive=name)
+    batch = BatchScrapingRequest(
+        requests=[
+            ScrapingRequest(url=url, selectors=replay.selectors, actions=replay.actions, options=options)
+            for url in urls
+        ],
+        priority=replay.priority
+    )
+    return await scrape_batch(batch)
+
+
+async def enqueue_crawl_page(request: ScrapingRequest, crawl_id: str) -> str:
+    """クロール対象のページをタスクとして登録する"""
+    return await enqueue_task(request, crawl_id=crawl_id)
+
+
+# リンクをたどってページをタスクとして投入するクローラー
+crawler = CrawlManager(
+    submit=enqueue_crawl_page,
+    cancel=cancel_task,
+    result_buffer=config.CRAWL_RESULT_BUFFER,
+    finished_ttl=config.CRAWL_FINISHED_TTL,
+    max_finished=config.CRAWL_MAX_FINISHED
+)
+
+
+@app.post("/crawl", response_model=Dict[str, Any])
+async def start_crawl(request: CrawlRequest):
+    """クロールを開始する"""
+    try:
+        crawl = await crawler.start(request)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"無効な正規表現です: {str(e)}")
+    return crawl.summary()
+
+
+@app.get("/crawl/{crawl_id}", response_model=Dict[str, Any])
+async def get_crawl(crawl_id: str):
+    """クロールの状態を取得する"""
+    crawl = crawler.get(crawl_id)
+    if not crawl:
+        raise HTTPException(status_code=404, detail="クロールが見つかりません")
+    return crawl.summary()
+
+
+@app.get("/crawl/{crawl_id}/results")
+async def stream_crawl_results(crawl_id: str, offset: int = 0):
+    """クロール結果をJSON Lines形式でストリーミングする（クロール終了まで新しい結果を待ち続ける）"""
+    crawl = crawler.get(crawl_id)
+    if not crawl:
+        raise HTTPException(status_code=404, detail="クロールが見つかりません")
+    
+    async def generate():
+        async for item in crawler.stream(crawl, offset):
+            yield dumps(item) + b"\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.delete("/crawl/{crawl_id}", response_model=Dict[str, Any])
+async def cancel_crawl(crawl_id: str):
+    """クロールを中止する"""
+    crawl = crawler.get(crawl_id)
+    if not crawl:
+        raise HTTPException(status_code=404, detail="クロールが見つかりません")
+    await crawler.cancel(crawl)
+    return crawl.summary()
+
+
+@app.get("/metrics", response_model=Dict[str, Any])
+async def metrics():
+    """サーバーの稼働統計を取得する"""
+    return {
+        "browser": scraper.stats(),
+        "scheduler": scheduler.stats(),
+        "http_cache": scraper.cache_stats(),
+        "changes": await change_index.stats(),
+        "tasks": await task_store.stats(),
+        "queue": await task_queue.stats() if DISTRIBUTED else None,
+        "worker": local_worker.stats() if local_worker else None,
+        "event_loop": loop_monitor.stats(),
+        "postprocess": post_processor.stats(),
+        "status_cache": status_cache.stats(),
+    }
 
 
 @app.get("/", response_model=Dict[str, str])
@@ -0,0 +1,183 @@
+"""
+後処理のオフロードモジュール
+
+スクリーンショットのBase64エンコード、ハッシュ計算、HTMLファイルの書き込みなどの後処理を
+イベントループの外（スレッドプール・プロセスプール）で実行します。
+同時に投入できる処理の数には上限があり、溢れた場合は空きが出るまで待機します。
+
+イベントループの遅延（スケジュールした時刻から実際に実行されるまでの遅れ）を計測し、
+ループが詰まっていないかを確認できるようにします。
+"""
+
+import asyncio
+import base64
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def encode_base64(data: bytes) -> str:
+    """バイト列をBase64文字列に変換する"""
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_base64(data: str) -> bytes:
+    """Base64文字列をバイト列に変換する"""
+    return base64.b64decode(data)
+
+
+def write_text(path: str, text: str):
+    """テキストをファイルに書き込む（ディレクトリがなければ作成する）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class PostProcessor:
+    """後処理をスレッドプール・プロセスプールで実行するクラス"""
+
+    def __init__(self, threads: int = 4, processes: int = 0, max_pending: int = 64):
+        """
+        初期化
+
+        Args:
+            threads: I/Oと軽いCPU処理に使うスレッド数
+            processes: 重いCPU処理に使うプロセス数（0の場合はスレッドプールで実行する）
+            max_pending: 同時に投入できる処理の最大数
+        """
+        self.threads = threads
+        self.processes = processes
+        self.max_pending = max_pending
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.completed = 0
+        self.waited = 0
+
+    def _executor(self, cpu: bool) -> Executor:
+        if cpu and self.processes > 0:
+            if self._process_pool is None:
+                # Playwrightのスレッドを引き継がないよう fork ではなく spawn で起動する
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="postprocess")
+        return self._thread_pool
+
+    async def _submit(self, cpu: bool, func: Callable[..., Any], *args: Any) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if self._slots.locked():
+            self.waited += 1
+        async with self._slots:
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor(cpu), func, *args)
+            finally:
+                self.pending -= 1
+                self.completed += 1
+
+    async def run_io(self, func: Callable[..., Any], *args: Any) -> Any:
+        """ファイル書き込みなどのI/O処理をスレッドプールで実行する"""
+        return await self._submit(False, func, *args)
+
+    async def run_cpu(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        エンコードやハッシュ計算などのCPU処理を実行する
+
+        プロセスプールを使う場合、func と引数はpickleできる必要があります。
+        """
+        return await self._submit(True, func, *args)
+
+    async def encode_base64(self, data: bytes) -> str:
+        return await self.run_cpu(encode_base64, data)
+
+    async def decode_base64(self, data: str) -> bytes:
+        return await self.run_cpu(decode_base64, data)
+
+    async def write_text(self, path: str, text: str):
+        await self.run_io(write_text, path, text)
+
+    def close(self):
+        """プールを終了する"""
+        if self._thread_pool:
+            self._thread_pool.shutdown(wait=True)
+            self._thread_pool = None
+        if self._process_pool:
+            self._process_pool.shutdown(wait=True)
+            self._process_pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threads": self.threads,
+            "processes": self.processes,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "waited": self.waited,
+        }
+
+
+class LoopLagMonitor:
+    """イベントループの遅延を計測するクラス"""
+
+    def __init__(self, interval: float = 0.5, window: int = 120, warn_threshold: float = 0.5):
+        """
+        初期化
+
+        Args:
+            interval: 計測間隔（秒）
+            window: 統計に使う直近の計測数
+            warn_threshold: この秒数を超える遅延を警告ログに出す
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_threshold:
+                logger.warning(f"イベントループの遅延を検出しました: {lag * 1000:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        """直近の遅延の統計（ミリ秒）を返す"""
+        samples = sorted(self.samples)
+        if not samples:
+            return {"samples": 0}
+        return {
+            "samples": len(samples),
+            "last_ms": round(self.samples[-1] * 1000, 2),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2),
+            "max_ms": round(self.max_lag * 1000, 2),
+        }
@@ -0,0 +1,216 @@
+"""
+セッションプロファイル管理モジュール
+
+ログイン用のアクションを実行した後のPlaywright storage_state（Cookie・localStorage）を
+名前付きプロファイルとして保持し、以降のスクレイピングのブラウザコンテキストで再利用します。
+storage_stateはTTLを過ぎるか、ログイン状態の確認に失敗した時点で取り直します。
+
+ディレクトリに永続化している場合は、参照のたびにファイルの更新を確認して読み込み直すため、
+同じディレクトリを共有する他のプロセス（分散モードのワーカーなど）の登録・ログインも反映されます。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .schemas import SessionProfileDefinition
+
+logger = logging.getLogger(__name__)
+
+# プロファイル名（SessionProfileDefinition.name と同じ制約。ファイル名に使う）
+PROFILE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class SessionExpiredError(Exception):
+    """保存済みのセッションでログイン状態が確認できなかった場合の例外"""
+
+
+class SessionProfile:
+    """名前付きセッションプロファイル"""
+
+    def __init__(self, definition: SessionProfileDefinition):
+        self.definition = definition
+        self.storage_state: Optional[Dict[str, Any]] = None
+        self.captured_at: Optional[float] = None
+        self.logins = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    @property
+    def fresh(self) -> bool:
+        """保存済みのstorage_stateが有効期限内かどうか"""
+        if self.storage_state is None or self.captured_at is None:
+            return False
+        ttl = self.definition.ttl
+        return not ttl or time.time() - self.captured_at < ttl
+
+    def invalidate(self):
+        """保存済みのstorage_stateを破棄する"""
+        self.storage_state = None
+        self.captured_at = None
+
+    def summary(self) -> Dict[str, Any]:
+        """storage_stateの中身を含まない概要を返す"""
+        ttl = self.definition.ttl
+        return {
+            "name": self.name,
+            "login_url": str(self.definition.login_url),
+            "ttl": ttl,
+            "check_selector": self.definition.check_selector,
+            "captured_at": self.captured_at,
+            "expires_at": self.captured_at + ttl if self.captured_at and ttl else None,
+            "fresh": self.fresh,
+            "logins": self.logins,
+        }
+
+
+class SessionProfileStore:
+    """セッションプロファイルのストア"""
+
+    def __init__(self, storage_dir: Optional[str] = None):
+        """
+        ストアの初期化
+
+        Args:
+            storage_dir: プロファイルを永続化するディレクトリ（Noneの場合はメモリのみ）
+        """
+        self.storage_dir = storage_dir
+        self.profiles: Dict[str, SessionProfile] = {}
+        # 読み込んだ・書き込んだファイルの更新時刻（他のプロセスによる更新の検出に使う）
+        self._mtimes: Dict[str, float] = {}
+        if storage_dir:
+            self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.storage_dir, f"{name}.json")
+
+    def _load(self):
+        """永続化されたプロファイルを読み込む"""
+        if not os.path.isdir(self.storage_dir):
+            return
+        for filename in os.listdir(self.storage_dir):
+            if filename.endswith(".json"):
+                self._sync(filename[:-len(".json")])
+        logger.info(f"セッションプロファイルを読み込みました: {len(self.profiles)}件")
+
+    def _sync(self, name: str) -> Optional[SessionProfile]:
+        """ファイルが更新・削除されていればメモリ上のプロファイルに反映する"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = self._path(name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            # 他のプロセスで削除された
+            self.profiles.pop(name, None)
+            self._mtimes.pop(name, None)
+            return None
+        if name in self.profiles and self._mtimes.get(name) == mtime:
+            return self.profiles[name]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            profile = SessionProfile(SessionProfileDefinition(**saved["definition"]))
+        except Exception as e:
+            logger.warning(f"セッションプロファイルの読み込みに失敗: {name}: {str(e)}")
+            return self.profiles.get(name)
+        profile.storage_state = saved.get("storage_state")
+        profile.captured_at = saved.get("captured_at")
+        current = self.profiles.get(name)
+        if current is not None:
+            # 同時ログインをまとめるロックと統計は引き継ぐ
+            profile.lock = current.lock
+            profile.logins = current.logins
+        self.profiles[name] = profile
+        self._mtimes[name] = mtime
+        return profile
+
+    def _save(self, profile: SessionProfile):
+        """プロファイルを永続化する"""
+        if not self.storage_dir:
+            return
+        os.makedirs(self.storage_dir, exist_ok=True)
+        saved = {
+            "definition": profile.definition.model_dump(mode="json"),
+            "storage_state": profile.storage_state,
+            "captured_at": profile.captured_at,
+        }
+        with open(self._path(profile.name), "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False)
+        self._mtimes[profile.name] = os.path.getmtime(self._path(profile.name))
+
+    def upsert(self, definition: SessionProfileDefinition) -> SessionProfile:
+        """プロファイルを作成または更新する（更新時は保存済みのstorage_stateを破棄する）"""
+        profile = SessionProfile(definition)
+        self.profiles[profile.name] = profile
+        self._save(profile)
+        logger.info(f"セッションプロファイルを登録しました: {profile.name}")
+        return profile
+
+    def get(self, name: str) -> Optional[SessionProfile]:
+        if self.storage_dir:
+            return self._sync(name)
+        return self.profiles.get(name)
+
+    def delete(self, name: str) -> bool:
+        """プロファイルを削除する"""
+        if self.get(name) is None:
+            return False
+        del self.profiles[name]
+        self._mtimes.pop(name, None)
+        if self.storage_dir and os.path.exists(self._path(name)):
+            os.remove(self._path(name))
+        logger.info(f"セッションプロファイルを削除しました: {name}")
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        if self.storage_dir:
+            names = set(self.profiles)
+            if os.path.isdir(self.storage_dir):
+                names.update(f[:-len(".json")] for f in os.listdir(self.storage_dir) if f.endswith(".json"))
+            for name in sorted(names):
+                self._sync(name)
+        return [profile.summary() for profile in self.profiles.values()]
+
+    async def get_storage_state(
+        self,
+        profile: SessionProfile,
+        login: Callable[[SessionProfile], Awaitable[Dict[str, Any]]],
+        refresh: bool = False
+    ) -> Dict[str, Any]:
+        """
+        プロファイルのstorage_stateを取得する
+
+        有効期限切れや refresh 指定の場合はログインし直します。
+        同じプロファイルへの同時ログインは1回にまとめられます。
+
+        Args:
+            profile: セッションプロファイル
+            login: ログインを実行してstorage_stateを返すコルーチン関数
+            refresh: 保存済みのstorage_stateを使わずにログインし直すかどうか
+
+        Returns:
+            Playwrightのstorage_state
+        """
+        if profile.fresh and not refresh:
+            return profile.storage_state
+
+        stale_state = profile.storage_state
+        async with profile.lock:
+            # 待機中に他のタスクがログインし直していればそれを使う
+            if profile.fresh and (not refresh or profile.storage_state is not stale_state):
+                return profile.storage_state
+
+            logger.info(f"セッションプロファイルでログインします: {profile.name}")
+            profile.storage_state = await login(profile)
+            profile.captured_at = time.time()
+            profile.logins += 1
+            self._save(profile)
+            return profile.storage_state
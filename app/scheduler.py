@@ -0,0 +1,361 @@
+"""
+スクレイピングタスクのスケジューラ
+
+ホストごとの同時実行数と最小リクエスト間隔を守りながら、
+固定数のワーカーにタスクを割り当てます。
+制限に達したホストのタスクは待機させ、その間ワーカーは他のホストのタスクを処理します。
+タスクは優先度クラスごとにキューイングされ、ワーカーが空いた時点（ディスパッチ時）に
+重み付き公平（weighted）または厳密優先（strict）でクラスが選ばれます。
+キューにあるジョブや実行中のジョブはタスクIDを指定してキャンセルできます。
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .schemas import ScrapingRequest
+
+logger = logging.getLogger(__name__)
+
+# 優先度クラス（高い順）
+PRIORITY_CLASSES = ("high", "normal", "low")
+DEFAULT_PRIORITY_WEIGHTS = {"high": 8, "normal": 4, "low": 1}
+
+
+class ScrapeJob:
+    """スケジューラのキューに入るタスク"""
+
+    def __init__(self, task_id: str, request: ScrapingRequest):
+        self.task_id = task_id
+        self.request = request
+        self.host = urlparse(str(request.url)).hostname or ""
+        self.priority = request.priority or "normal"
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+        self.dispatched = False
+        # 実行中のコルーチン（キャンセル用）
+        self.task: Optional[asyncio.Task] = None
+
+        # options によるホスト制限の上書き
+        options = request.options or {}
+        self.max_concurrency: Optional[int] = options.get("host_max_concurrency")
+        self.min_delay: Optional[float] = options.get("host_min_delay")
+        if options.get("har_replay"):
+            # HARの再生はネットワークを使わないのでホスト制限をかけない
+            self.max_concurrency = 0 if self.max_concurrency is None else self.max_concurrency
+            self.min_delay = 0.0 if self.min_delay is None else self.min_delay
+
+
+class HostState:
+    """ホストごとのキューと実行状態"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.jobs: Dict[str, Deque[ScrapeJob]] = {priority: deque() for priority in PRIORITY_CLASSES}
+        self.active = 0
+        self.next_start = 0.0
+        self.dispatched = 0
+
+    @property
+    def has_jobs(self) -> bool:
+        return any(self.jobs.values())
+
+
+class PriorityClass:
+    """優先度クラスごとのキュー状態と統計"""
+
+    def __init__(self, name: str, weight: int):
+        self.name = name
+        self.weight = weight
+        # 待機中のジョブを持つホスト（ラウンドロビンで走査する）
+        self.pending_hosts: Deque[str] = deque()
+        # 重み付き公平スケジューリング用の仮想時刻
+        self.pass_value = 0.0
+        self.queued = 0
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """統計情報を辞書で返す"""
+        return {
+            "weight": self.weight,
+            "queued": self.queued,
+            "dispatched": self.dispatched,
+            "avg_wait": round(self.total_wait / self.dispatched, 3) if self.dispatched else 0.0,
+            "max_wait": round(self.max_wait, 3),
+        }
+
+
+class ScrapeScheduler:
+    """ホスト単位の礼儀正しさ（politeness）を守るスケジューラ"""
+
+    def __init__(
+        self,
+        runner: Callable[[ScrapeJob], Awaitable[None]],
+        workers: int = 10,
+        max_per_host: int = 2,
+        min_delay: float = 0.0,
+        priority_mode: str = "weighted",
+        priority_weights: Optional[Dict[str, int]] = None
+    ):
+        """
+        スケジューラの初期化
+
+        Args:
+            runner: ジョブを実行するコルーチン関数
+            workers: ワーカー数（全体の同時実行数）
+            max_per_host: ホストごとの最大同時実行数（0以下で無制限）
+            min_delay: 同一ホストへのリクエスト開始間隔の最小値（秒）
+            priority_mode: 優先度クラスの選び方 (weighted, strict)
+            priority_weights: weightedモードでの優先度クラスごとの重み
+        """
+        self.runner = runner
+        self.workers = workers
+        self.max_per_host = max_per_host
+        self.min_delay = min_delay
+        self.priority_mode = priority_mode
+        weights = dict(DEFAULT_PRIORITY_WEIGHTS, **(priority_weights or {}))
+        self.classes: Dict[str, PriorityClass] = {
+            name: PriorityClass(name, max(1, weights[name])) for name in PRIORITY_CLASSES
+        }
+        self.hosts: Dict[str, HostState] = {}
+        # 待機も実行もしていないが、最小間隔の経過待ちで状態を残しているホスト（(next_start, ホスト) のヒープ）
+        self._expiring_hosts: List[Tuple[float, str]] = []
+        # キューにある、または実行中のジョブ（タスクIDで検索する）
+        self.jobs: Dict[str, ScrapeJob] = {}
+        self._condition = asyncio.Condition()
+        self._worker_tasks: List[asyncio.Task] = []
+        self.queued = 0
+        self.running = 0
+
+    async def start(self):
+        """ワーカーを起動する"""
+        for i in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(i)))
+        logger.info(f"スケジューラを開始しました（ワーカー数: {self.workers}）")
+
+    async def stop(self):
+        """ワーカーを停止する"""
+        for task in self._worker_tasks:
+            task.cancel()
+        for job in self.jobs.values():
+            if job.task:
+                job.task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info("スケジューラを停止しました")
+
+    async def submit(self, task_id: str, request: ScrapingRequest) -> ScrapeJob:
+        """
+        ジョブをキューに追加する
+
+        Args:
+            task_id: タスクID
+            request: スクレイピングリクエスト
+
+        Returns:
+            追加されたジョブ
+        """
+        job = ScrapeJob(task_id, request)
+        async with self._condition:
+            state = self.hosts.get(job.host)
+            if state is None:
+                state = self.hosts[job.host] = HostState(job.host)
+            queue = state.jobs[job.priority]
+            priority_class = self.classes[job.priority]
+            if not queue:
+                priority_class.pending_hosts.append(job.host)
+            if not priority_class.queued:
+                # 待機していたクラスが溜め込んだ分だけ優先されないように仮想時刻を揃える
+                priority_class.pass_value = max(priority_class.pass_value, self._min_pass_value())
+            queue.append(job)
+            self.jobs[task_id] = job
+            priority_class.queued += 1
+            self.queued += 1
+            self._condition.notify()
+        return job
+
+    async def cancel(self, task_id: str) -> Optional[str]:
+        """
+        ジョブをキャンセルする
+
+        キューにあるジョブは取り除かれ、実行中のジョブはコルーチンがキャンセルされます。
+
+        Args:
+            task_id: タスクID
+
+        Returns:
+            キャンセル時のジョブの状態 (queued, running)。ジョブが存在しない場合はNone
+        """
+        async with self._condition:
+            job = self.jobs.pop(task_id, None)
+            if job is None:
+                return None
+            job.cancelled = True
+
+            if not job.dispatched:
+                # キューからは取り出し時に読み飛ばす（途中の要素の削除はO(n)になるため）
+                self.queued -= 1
+                self.classes[job.priority].queued -= 1
+                self._condition.notify()
+                logger.info(f"キュー内のジョブをキャンセルしました: {task_id}")
+                return "queued"
+
+            if job.task:
+                job.task.cancel()
+            logger.info(f"実行中のジョブをキャンセルしました: {task_id}")
+            return "running"
+
+    def _limits(self, job: ScrapeJob):
+        """ジョブに適用されるホスト制限を返す"""
+        max_concurrency = job.max_concurrency if job.max_concurrency is not None else self.max_per_host
+        min_delay = job.min_delay if job.min_delay is not None else self.min_delay
+        return max_concurrency, min_delay
+
+    def _min_pass_value(self) -> float:
+        """待機中のジョブを持つクラスの最小仮想時刻"""
+        values = [c.pass_value for c in self.classes.values() if c.queued]
+        return min(values) if values else 0.0
+
+    def _class_order(self) -> List[PriorityClass]:
+        """ジョブを取り出すクラスの順序を返す"""
+        # キャンセル済みのジョブだけが残っているクラスも走査して取り除く
+        classes = [c for c in self.classes.values() if c.pending_hosts]
+        if self.priority_mode == "strict":
+            return classes
+        return sorted(classes, key=lambda c: (c.pass_value, PRIORITY_CLASSES.index(c.name)))
+
+    def _retire_host(self, state: HostState, now: float):
+        """待機中のジョブも実行中のジョブも無くなったホストの状態を削除する"""
+        if state.has_jobs or state.active:
+            return
+        if state.next_start <= now:
+            del self.hosts[state.host]
+        else:
+            # 最小間隔が経過するまでは状態を残し、経過後に _purge_hosts で削除する
+            heapq.heappush(self._expiring_hosts, (state.next_start, state.host))
+
+    def _purge_hosts(self, now: float):
+        """最小間隔が経過した、使われていないホストの状態を削除する"""
+        expiring = self._expiring_hosts
+        while expiring and expiring[0][0] <= now:
+            _, host = heapq.heappop(expiring)
+            state = self.hosts.get(host)
+            # 再びジョブが投入されたホストは残す（次に使われなくなった時点で改めて登録される）
+            if state is not None and not state.has_jobs and not state.active and state.next_start <= now:
+                del self.hosts[host]
+
+    def _take_job(self):
+        """
+        実行可能なジョブを取り出す
+
+        Returns:
+            (ジョブ, 次に実行可能になるまでの秒数)。
+            ジョブが無い場合は (None, 待機秒数またはNone)
+        """
+        now = time.monotonic()
+        self._purge_hosts(now)
+        wait: Optional[float] = None
+        for priority_class in self._class_order():
+            pending_hosts = priority_class.pending_hosts
+            for _ in range(len(pending_hosts)):
+                host = pending_hosts[0]
+                pending_hosts.rotate(-1)
+                state = self.hosts[host]
+                queue = state.jobs[priority_class.name]
+                while queue and queue[0].cancelled:
+                    queue.popleft()
+                if not queue:
+                    pending_hosts.pop()
+                    # キャンセル済みのジョブしか無かったホスト
+                    self._retire_host(state, now)
+                    continue
+                max_concurrency, _ = self._limits(queue[0])
+
+                if max_concurrency > 0 and state.active >= max_concurrency:
+                    continue
+                if state.next_start > now:
+                    delay = state.next_start - now
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+
+                job = queue.popleft()
+                _, min_delay = self._limits(job)
+                state.active += 1
+                state.dispatched += 1
+                state.next_start = now + min_delay
+                if not queue:
+                    # rotate 済みなので取り出したホストは末尾にある
+                    pending_hosts.pop()
+                job.dispatched = True
+
+                waited = now - job.enqueued_at
+                priority_class.queued -= 1
+                priority_class.dispatched += 1
+                priority_class.total_wait += waited
+                priority_class.max_wait = max(priority_class.max_wait, waited)
+                priority_class.pass_value += 1.0 / priority_class.weight
+                return job, None
+        return None, wait
+
+    async def _next_job(self) -> ScrapeJob:
+        """実行可能なジョブが現れるまで待機する"""
+        async with self._condition:
+            while True:
+                job, wait = self._take_job()
+                if job:
+                    self.queued -= 1
+                    self.running += 1
+                    return job
+                if self._expiring_hosts:
+                    # ジョブが無い間も、使われなくなったホストの状態を期限に削除できるよう起きる
+                    expires = max(0.0, self._expiring_hosts[0][0] - time.monotonic())
+                    wait = expires if wait is None else min(wait, expires)
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, job: ScrapeJob):
+        """ジョブ完了後にホストの枠を解放する"""
+        async with self._condition:
+            self.running -= 1
+            self.jobs.pop(job.task_id, None)
+            state = self.hosts[job.host]
+            state.active -= 1
+            self._retire_host(state, time.monotonic())
+            self._condition.notify_all()
+
+    async def _worker(self, worker_id: int):
+        """キューからジョブを取り出して実行するワーカー"""
+        while True:
+            job = await self._next_job()
+            try:
+                if job.cancelled:
+                    continue
+                # キャンセルできるようにジョブごとに別のタスクで実行する
+                job.task = asyncio.create_task(self.runner(job))
+                await asyncio.wait({job.task})
+                if not job.task.cancelled() and job.task.exception():
+                    e = job.task.exception()
+                    logger.error(f"ワーカー {worker_id} でジョブの実行に失敗: {job.task_id}: {str(e)}")
+            finally:
+                await self._release(job)
+
+    def stats(self) -> Dict[str, Any]:
+        """スケジューラの統計情報を返す"""
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": self.running,
+            "hosts": len(self.hosts),
+            "max_per_host": self.max_per_host,
+            "min_delay": self.min_delay,
+            "priority_mode": self.priority_mode,
+            "priorities": {name: c.stats() for name, c in self.classes.items()},
+        }
@@ -1,5 +1,22 @@
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Dict, List, Optional, Any, Union
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from typing import Dict, List, Optional, Any, Union, Literal
+
+
+def validate_host_limits(options: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """options によるホスト制限の上書き（host_max_concurrency, host_min_delay）を検証する"""
+    if not options:
+        return options
+    max_concurrency = options.get("host_max_concurrency")
+    if max_concurrency is not None and (
+        isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or max_concurrency < 1
+    ):
+        raise ValueError("host_max_concurrency は1以上の整数を指定してください")
+    min_delay = options.get("host_min_delay")
+    if min_delay is not None and (
+        isinstance(min_delay, bool) or not isinstance(min_delay, (int, float)) or min_delay < 0
+    ):
+        raise ValueError("host_min_delay は0以上の数値を指定してください")
+    return options
 
 
 class ScrapingAction(BaseModel):
@@ -43,21 +60,106 @@ class ScrapingRequest(BaseModel):
     options: Optional[Dict[str, Any]] = Field(None, description="スクレイピングオプション")
     save_html_file: Optional[bool] = Field(False, description="HTMLをファイルとして保存するかどうか")
     html_output_dir: Optional[str] = Field("output/html", description="HTMLファイルを保存するディレクトリ")
+    priority: Optional[Literal["high", "normal", "low"]] = Field("normal", description="タスクの優先度 (high, normal, low)")
+    session_profile: Optional[str] = Field(None, description="ログイン状態を再利用するセッションプロファイル名")
+
+    _check_host_limits = field_validator("options")(validate_host_limits)
+
+
+class SessionProfileDefinition(BaseModel):
+    """セッションプロファイル定義"""
+    name: str = Field(..., pattern=r"^[A-Za-z0-9_-]+$", description="プロファイル名")
+    login_url: HttpUrl = Field(..., description="ログインページのURL")
+    actions: List[ScrapingAction] = Field(..., description="ログインのために実行するアクション")
+    ttl: Optional[int] = Field(3600, description="storage_stateの有効期間（秒、0またはNoneで無期限）")
+    check_selector: Optional[str] = Field(None, description="ログイン済みの場合にのみ存在する要素のセレクタ")
+
+
+class BatchScrapingRequest(BaseModel):
+    """バッチスクレイピングリクエスト"""
+    requests: List[ScrapingRequest] = Field(..., description="スクレイピングリクエストのリスト")
+    priority: Optional[Literal["high", "normal", "low"]] = Field("low", description="個別に優先度が指定されていないリクエストに適用する優先度")
+
+
+class CancelTasksRequest(BaseModel):
+    """タスクの一括キャンセルリクエスト"""
+    task_ids: Optional[List[str]] = Field(None, description="キャンセルするタスクIDのリスト")
+    batch_id: Optional[str] = Field(None, description="キャンセルするバッチID（バッチ内の全タスクが対象）")
+
+
+class StatusBatchRequest(BaseModel):
+    """タスクのステータスの一括取得リクエスト"""
+    task_ids: Optional[List[str]] = Field(None, max_length=10000, description="ステータスを取得するタスクIDのリスト")
+    batch_id: Optional[str] = Field(None, description="ステータスを取得するバッチID（バッチ内の全タスクが対象）")
+    since: Optional[float] = Field(None, description="前回のレスポンスの cursor。指定するとそれ以降に更新されたタスクだけを返す")
+    include_results: bool = Field(False, description="完了したタスクのスクレイピング結果を含めるかどうか")
+    fields: Optional[List[str]] = Field(None, description="include_results で返す結果の項目（url は常に含む。省略時は全て）")
+
+
+class HarReplayRequest(BaseModel):
+    """HARアーカイブの再生リクエスト"""
+    selectors: Optional[Dict[str, Union[str, SelectorDefinition, CompoundSelector]]] = Field(None, description="抽出するデータのセレクタマップ")
+    actions: Optional[List[ScrapingAction]] = Field(None, description="スクレイピング前に実行するアクション")
+    options: Optional[Dict[str, Any]] = Field(None, description="スクレイピングオプション")
+    priority: Optional[Literal["high", "normal", "low"]] = Field("low", description="再生タスクの優先度")
+
+    _check_host_limits = field_validator("options")(validate_host_limits)
+
+
+class CrawlRequest(BaseModel):
+    """クロールリクエスト"""
+    seeds: List[HttpUrl] = Field(..., description="クロールを開始するURLのリスト")
+    include: Optional[List[str]] = Field(None, description="クロール対象とするURLの正規表現（いずれかに一致）")
+    exclude: Optional[List[str]] = Field(None, description="クロール対象から除外するURLの正規表現")
+    same_host: Optional[bool] = Field(True, description="シードと同じホストのURLだけをクロールするかどうか")
+    max_depth: Optional[int] = Field(2, description="シードからたどるリンクの最大深さ")
+    max_pages: Optional[int] = Field(100, description="クロールする最大ページ数")
+    max_in_flight: Optional[int] = Field(10, description="同時に投入するページ数の上限")
+    selectors: Optional[Dict[str, Union[str, SelectorDefinition, CompoundSelector]]] = Field(None, description="各ページで抽出するデータのセレクタマップ")
+    actions: Optional[List[ScrapingAction]] = Field(None, description="各ページで実行するアクション")
+    options: Optional[Dict[str, Any]] = Field(None, description="各ページのスクレイピングオプション")
+    priority: Optional[Literal["high", "normal", "low"]] = Field("low", description="ページのスクレイピングタスクの優先度")
+
+    _check_host_limits = field_validator("options")(validate_host_limits)
 
 
 class ScrapingResponse(BaseModel):
     """スクレイピング結果"""
     url: str = Field(..., description="スクレイピングしたURL")
-    data: Dict[str, Any] = Field(..., description="抽出されたデータ")
+    data: Optional[Dict[str, Any]] = Field(None, description="抽出されたデータ（fields で除いた場合はnull）")
     screenshot: Optional[str] = Field(None, description="スクリーンショット（Base64エンコード）")
     html: Optional[str] = Field(None, description="取得したHTMLコンテンツ")
     html_file: Optional[str] = Field(None, description="保存されたHTMLファイルのパス")
+    har_file: Optional[str] = Field(None, description="記録されたHARファイルのパス")
+    links: Optional[List[str]] = Field(None, description="ページ内のリンク（extract_links オプション指定時）")
+    pages: Optional[List[Dict[str, Any]]] = Field(None, description="paginate / scroll_until_stable アクションの各ステップの抽出結果")
+    not_modified: Optional[bool] = Field(None, description="変更検知で前回から変更が無く、レンダリングを省略した場合はTrue")
+    changed: Optional[bool] = Field(None, description="前回の取得時から内容が変わったかどうか（incremental オプション指定時）")
+    changed_at: Optional[float] = Field(None, description="内容が最後に変わった日時（incremental オプション指定時）")
     errors: Optional[Dict[str, SelectorError]] = Field(None, description="セレクタごとのエラー情報")
 
 
 class ScraperStatus(BaseModel):
     """スクレイピングタスクのステータス"""
     task_id: str
-    status: str = Field(..., description="タスクステータス (pending, running, completed, failed)")
+    status: str = Field(..., description="タスクステータス (pending, running, completed, failed, cancelled)")
     result: Optional[ScrapingResponse] = Field(None, description="完了した場合のスクレイピング結果")
     error: Optional[str] = Field(None, description="エラーが発生した場合のエラーメッセージ")
+
+
+class TaskStatusSummary(BaseModel):
+    """一括取得で返すタスクのステータス"""
+    task_id: str
+    status: str = Field(..., description="タスクステータス (pending, running, completed, failed, cancelled)")
+    updated_at: Optional[float] = Field(None, description="ステータスが最後に更新された日時")
+    error: Optional[str] = Field(None, description="エラーが発生した場合のエラーメッセージ")
+    result: Optional[ScrapingResponse] = Field(None, description="スクレイピング結果（include_results 指定時）")
+
+
+class StatusBatchResponse(BaseModel):
+    """タスクのステータスの一括取得結果"""
+    tasks: List[TaskStatusSummary] = Field(..., description="ステータス（since 指定時はそれ以降に更新されたタスクのみ）")
+    counts: Dict[str, int] = Field(..., description="対象の全タスクのステータスごとの件数")
+    total: int = Field(..., description="対象のタスク数")
+    missing: List[str] = Field(default_factory=list, description="見つからなかったタスクID")
+    cursor: float = Field(..., description="次回のリクエストの since に指定する値")
@@ -1,39 +1,121 @@
-from playwright.async_api import async_playwright, Page, Browser, Playwright
+from playwright.async_api import async_playwright, Page, Browser, Playwright, APIRequestContext, ElementHandle
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 import asyncio
 import logging
-import base64
 from typing import Dict, List, Optional, Any
 
+from . import config
+from .supervisor import BrowserSupervisor
+from .profiles import SessionExpiredError
+from .http_cache import ResponseCache
+from .changes import content_hash
+from .compression import FILE_EXTENSIONS, write_compressed_text
+from .offload import PostProcessor
+
 logger = logging.getLogger(__name__)
 
+# ブラウザコンテキストの共通設定
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 1280, "height": 800},
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+}
+
+# ページ送りの前後で内容が変わったかを判定するためのシグネチャ（対象要素の数とテキストのハッシュ）
+CONTENT_SIGNATURE_JS = """
+(selector) => {
+    const nodes = selector ? Array.from(document.querySelectorAll(selector)) : [document.body];
+    let hash = 0;
+    let length = 0;
+    for (const node of nodes) {
+        const text = (node && node.innerText) || "";
+        length += text.length;
+        for (let i = 0; i < text.length; i++) {
+            hash = (hash * 31 + text.charCodeAt(i)) | 0;
+        }
+    }
+    return `${nodes.length}:${length}:${hash}`;
+}
+"""
+
 
 class PlaywrightScraper:
     """Playwrightを使用したスクレイピングクラス"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_pages_per_browser: int = config.BROWSER_MAX_PAGES,
+        max_browser_rss_mb: int = config.BROWSER_MAX_RSS_MB,
+        crash_retries: int = config.BROWSER_CRASH_RETRIES,
+        response_cache: Optional[ResponseCache] = None,
+        post_processor: Optional[PostProcessor] = None
+    ):
         self.playwright: Optional[Playwright] = None
-        self.browser: Optional[Browser] = None
+        self.supervisor: Optional[BrowserSupervisor] = None
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_browser_rss_mb = max_browser_rss_mb
+        self.crash_retries = crash_retries
+        # 全てのブラウザコンテキストで共有するHTTPレスポンスキャッシュ
+        self.response_cache = response_cache
+        # エンコードやファイル書き込みをイベントループの外で実行する
+        self.post_processor = post_processor or PostProcessor()
+        # 条件付きリクエストに使うHTTPクライアント
+        self.request_context: Optional[APIRequestContext] = None
+    
+    @property
+    def browser(self) -> Optional[Browser]:
+        """現在リースに使われるブラウザ"""
+        if self.supervisor and self.supervisor.current:
+            return self.supervisor.current.browser
+        return None
     
     async def initialize(self):
         """Playwrightとブラウザを初期化する"""
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,  # ヘッドレスモードで実行
+        self.supervisor = BrowserSupervisor(
+            self.playwright,
+            max_pages=self.max_pages_per_browser,
+            max_rss_mb=self.max_browser_rss_mb,
+            check_interval=config.BROWSER_CHECK_INTERVAL
         )
+        await self.supervisor.start()
         logger.info("Playwrightとブラウザが初期化されました")
     
     async def close(self):
         """ブラウザとPlaywrightを終了する"""
-        if self.browser:
-            await self.browser.close()
+        if self.request_context:
+            await self.request_context.dispose()
+            self.request_context = None
+        if self.supervisor:
+            await self.supervisor.stop()
+            self.supervisor = None
         if self.playwright:
             await self.playwright.stop()
+            self.playwright = None
         logger.info("ブラウザとPlaywrightを終了しました")
     
-    async def execute_actions(self, page: Page, actions: List[Dict[str, Any]]):
-        """定義されたアクションをページ上で実行する"""
+    def stats(self) -> Dict[str, Any]:
+        """ブラウザの統計情報を返す"""
+        return self.supervisor.stats() if self.supervisor else {}
+    
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """HTTPレスポンスキャッシュの統計情報を返す（無効な場合はNone）"""
+        return self.response_cache.stats() if self.response_cache else None
+    
+    async def execute_actions(
+        self,
+        page: Page,
+        actions: List[Dict[str, Any]],
+        selectors: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        定義されたアクションをページ上で実行する
+        
+        paginate / scroll_until_stable アクションでは各ステップでセレクタマップを抽出し、
+        その結果のリストを返す（それ以外のアクションだけの場合は空リスト）
+        """
+        pages: List[Dict[str, Any]] = []
         if not actions:
-            return
+            return pages
         
         for action in actions:
             # ScrapingActionオブジェクトの場合と辞書の場合の両方に対応
@@ -75,12 +157,151 @@ class PlaywrightScraper:
                     await page.select_option(selector, value, **options)
                     logger.info(f"選択アクション実行: {selector}, 値: {value}")
                 
+                elif action_type == "paginate" and selector:
+                    await self.paginate(page, selector, int(value) if value else 10, options, selectors, pages)
+                
+                elif action_type == "scroll_until_stable":
+                    await self.scroll_until_stable(page, int(value) if value else 20, options, selectors, pages)
+                
                 else:
                     logger.warning(f"未対応のアクションタイプ: {action_type}")
             
             except Exception as e:
                 logger.error(f"アクション実行エラー {action_type}: {str(e)}")
                 raise
+        
+        return pages
+    
+    async def _collect_page(self, page: Page, selectors: Optional[Dict[str, Any]], pages: List[Dict[str, Any]]):
+        """現在のページからセレクタマップを抽出して結果リストに追加する"""
+        data = await self.extract_data(page, selectors or {})
+        entry = {"step": len(pages) + 1, "url": page.url, "data": data}
+        if "_errors" in data:
+            entry["errors"] = data.pop("_errors")
+        pages.append(entry)
+    
+    async def paginate(
+        self,
+        page: Page,
+        next_selector: str,
+        max_pages: int,
+        options: Dict[str, Any],
+        selectors: Optional[Dict[str, Any]],
+        pages: List[Dict[str, Any]]
+    ):
+        """
+        「次へ」ボタンが無くなるか最大ページ数に達するまで、抽出とクリックを繰り返す
+        
+        クリック後は前のページのDOMを抽出しないよう、ページ遷移（navigation: true）か、
+        クリック前の要素の切り離し・内容の変化を待ってから次の抽出を行う
+        """
+        wait_until = options.get("wait_until", "load")
+        wait_for = options.get("wait_for_selector")
+        delay = float(options.get("delay", 0))
+        item_selector = options.get("item_selector")
+        # True: クリックでページ遷移する / それ以外: 遷移とAJAXによる書き換えのどちらにも対応する
+        navigation = options.get("navigation")
+        timeout = float(options.get("timeout", 30000))
+        max_pages = max(1, max_pages)
+        
+        for index in range(max_pages):
+            await self._collect_page(page, selectors, pages)
+            if index == max_pages - 1:
+                break
+            
+            next_button = await page.query_selector(next_selector)
+            if next_button is None or not await next_button.is_visible() or await next_button.is_disabled():
+                break
+            
+            if navigation is True:
+                # ページ遷移するボタンはクリックと遷移の待機を同時に始めて取りこぼしを防ぐ
+                async with page.expect_navigation(wait_until=wait_until, timeout=timeout):
+                    await next_button.click()
+            else:
+                signature = await page.evaluate(CONTENT_SIGNATURE_JS, item_selector)
+                # 古い要素が外れたかで切り替わりを判定する（項目のセレクタが無ければボタン自体）
+                old_element = await page.query_selector(item_selector) if item_selector else None
+                await next_button.click()
+                if not await self._wait_for_page_change(page, old_element or next_button, signature, item_selector, timeout):
+                    logger.warning(f"ページ送り後に内容が変わらないため終了します: {next_selector}")
+                    break
+                # 通常のページ遷移だった場合は新しいページの読み込みを待つ（AJAXの場合はすぐに戻る）
+                await page.wait_for_load_state(wait_until)
+            if wait_for:
+                await page.wait_for_selector(wait_for)
+            if delay:
+                await asyncio.sleep(delay)
+        
+        logger.info(f"ページ送りアクション実行: {next_selector}, {index + 1}ページ")
+    
+    async def _wait_for_page_change(
+        self,
+        page: Page,
+        old_element: ElementHandle,
+        signature: str,
+        item_selector: Optional[str],
+        timeout: float
+    ) -> bool:
+        """
+        クリック前の要素が外れるか、内容のシグネチャが変わるまで待つ
+        
+        ページ遷移の途中は評価に失敗するため、新しいページで評価できるまで待ち続ける
+        
+        Returns:
+            内容が切り替わった場合はTrue、タイムアウトした場合はFalse
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout / 1000
+        while loop.time() < deadline:
+            try:
+                if not await old_element.evaluate("element => element.isConnected"):
+                    return True
+            except PlaywrightError:
+                # 遷移で要素が破棄された場合は、新しいページの内容を確認する
+                pass
+            try:
+                if await page.evaluate(CONTENT_SIGNATURE_JS, item_selector) != signature:
+                    return True
+            except PlaywrightError:
+                # 遷移中で実行コンテキストが無い
+                pass
+            await asyncio.sleep(0.1)
+        return False
+    
+    async def scroll_until_stable(
+        self,
+        page: Page,
+        max_scrolls: int,
+        options: Dict[str, Any],
+        selectors: Optional[Dict[str, Any]],
+        pages: List[Dict[str, Any]]
+    ):
+        """ページの高さが変わらなくなるか最大回数に達するまで、末尾へのスクロールと抽出を繰り返す"""
+        stable_rounds = int(options.get("stable_rounds", 2))
+        delay = float(options.get("delay", 1.0))
+        extract = options.get("extract", True)
+        
+        height = await page.evaluate("() => document.body.scrollHeight")
+        stable = 0
+        scrolls = 0
+        if extract:
+            await self._collect_page(page, selectors, pages)
+        
+        while scrolls < max_scrolls and stable < stable_rounds:
+            await page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
+            scrolls += 1
+            await asyncio.sleep(delay)
+            
+            new_height = await page.evaluate("() => document.body.scrollHeight")
+            if new_height == height:
+                stable += 1
+                continue
+            stable = 0
+            height = new_height
+            if extract:
+                await self._collect_page(page, selectors, pages)
+        
+        logger.info(f"スクロールアクション実行: {scrolls}回, 高さ: {height}px")
     
     async def process_compound_selector(self, page: Page, compound_selector):
         """複合セレクタを処理する"""
@@ -297,6 +518,92 @@ class PlaywrightScraper:
         
         return result
     
+    async def _document_info(self, response) -> Dict[str, Any]:
+        """ドキュメントのレスポンスから変更検知用の情報を取り出す"""
+        headers = await response.all_headers()
+        try:
+            body_hash = await self.post_processor.run_cpu(content_hash, await response.body())
+        except Exception:
+            # リダイレクト等で本文が取得できない場合はヘッダだけで判定する
+            body_hash = None
+        return {
+            "status": response.status,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body_hash": body_hash,
+        }
+    
+    async def check_not_modified(
+        self,
+        url: str,
+        state: Dict[str, Any],
+        storage_state: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        ブラウザを使わずに条件付きリクエストでページの変更の有無を確認する
+        
+        Args:
+            url: URL
+            state: 前回の取得状態（etag, last_modified, body_hash）
+            storage_state: リクエストに使うCookie等（セッションプロファイル使用時）
+        
+        Returns:
+            前回から変更が無い場合はTrue
+        """
+        if not self.playwright:
+            await self.initialize()
+        
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        
+        if storage_state is None:
+            # Cookieを使わない確認は共有のリクエストコンテキストで行う
+            if self.request_context is None:
+                self.request_context = await self.playwright.request.new_context(
+                    user_agent=CONTEXT_OPTIONS["user_agent"]
+                )
+            request_context = self.request_context
+        else:
+            request_context = await self.playwright.request.new_context(
+                user_agent=CONTEXT_OPTIONS["user_agent"], storage_state=storage_state
+            )
+        try:
+            response = await request_context.get(url, headers=headers, timeout=30000)
+            if response.status == 304:
+                return True
+            if not response.ok:
+                return False
+            # 検証子に対応していないサーバーでも本文が同じなら変更無しとみなす
+            if not state.get("body_hash"):
+                return False
+            return await self.post_processor.run_cpu(content_hash, await response.body()) == state["body_hash"]
+        except Exception as e:
+            logger.warning(f"条件付きリクエストに失敗しました: {url}: {str(e)}")
+            return False
+        finally:
+            if request_context is not self.request_context:
+                await request_context.dispose()
+    
+    async def capture_storage_state(self, login_url: str, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """ログインページでアクションを実行し、ログイン後のstorage_stateを取得する"""
+        if not self.supervisor:
+            await self.initialize()
+        
+        async with self.supervisor.lease() as handle:
+            context = await handle.browser.new_context(**CONTEXT_OPTIONS)
+            try:
+                page = await context.new_page()
+                await page.goto(login_url, wait_until="load", timeout=60000)
+                await self.execute_actions(page, actions)
+                logger.info(f"ログインアクションを実行しました: {login_url}")
+                return await context.storage_state()
+            finally:
+                if handle.browser.is_connected():
+                    await context.close()
+    
     async def scrape(
         self, 
         url: str, 
@@ -305,31 +612,124 @@ class PlaywrightScraper:
         take_screenshot: bool = True,
         get_html: bool = True,
         save_html_file: bool = False,
-        html_output_dir: str = "output/html"
+        html_output_dir: str = "output/html",
+        storage_state: Optional[Dict[str, Any]] = None,
+        session_check: Optional[str] = None,
+        http_cache: bool = True,
+        har_record_path: Optional[str] = None,
+        har_replay_path: Optional[str] = None,
+        extract_links: bool = False,
+        capture_document: bool = False,
+        html_compression: Optional[str] = None
     ) -> Dict[str, Any]:
-        """指定されたURLをスクレイピングし、データを抽出する"""
+        """
+        指定されたURLをスクレイピングし、データを抽出する
+        
+        storage_state を指定するとログイン済みのCookie・localStorageでコンテキストを作成し、
+        session_check のセレクタがページに無い場合（session_check が無ければ 401/403 の場合）は
+        SessionExpiredError を送出する。
+        http_cache が有効な場合、サブリソースは共有レスポンスキャッシュ経由で取得する。
+        har_record_path を指定すると通信をHARに記録し、har_replay_path を指定すると
+        ネットワークを使わずにHARから応答する。
+        extract_links を指定するとページ内のリンク（絶対URL）を結果に含める。
+        capture_document を指定すると変更検知用にドキュメントのレスポンス情報を
+        result["_document"] に含める。
+        html_compression（"gzip" / "zstd"）を指定すると保存するHTMLファイルを圧縮する
+        """
         # デバッグログを追加
         logger.info(f"スクレイピング開始: {url}")
         logger.info(f"save_html_file: {save_html_file}")
         logger.info(f"html_output_dir: {html_output_dir}")
         
-        if not self.browser:
+        if not self.supervisor:
             await self.initialize()
         
-        context = await self.browser.new_context(
-            viewport={"width": 1280, "height": 800},
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        )
+        attempt = 0
+        while True:
+            async with self.supervisor.lease() as handle:
+                try:
+                    return await self._scrape_with_browser(
+                        handle.browser,
+                        url,
+                        selectors,
+                        actions,
+                        take_screenshot=take_screenshot,
+                        get_html=get_html,
+                        save_html_file=save_html_file,
+                        html_output_dir=html_output_dir,
+                        storage_state=storage_state,
+                        session_check=session_check,
+                        http_cache=http_cache,
+                        har_record_path=har_record_path,
+                        har_replay_path=har_replay_path,
+                        extract_links=extract_links,
+                        capture_document=capture_document,
+                        html_compression=html_compression
+                    )
+                except Exception as e:
+                    # ブラウザがクラッシュした場合は新しいブラウザで再試行する
+                    # （タイムアウトやこのモジュールの例外はブラウザの状態と関係ないため待たずに送出する）
+                    if attempt >= self.crash_retries:
+                        raise
+                    if not isinstance(e, PlaywrightError) or isinstance(e, PlaywrightTimeoutError):
+                        raise
+                    if not await self.supervisor.crashed(handle):
+                        raise
+                    attempt += 1
+                    logger.warning(f"ブラウザのクラッシュを検出しました。再試行します ({attempt}/{self.crash_retries}): {url}")
+    
+    async def _scrape_with_browser(
+        self,
+        browser: Browser,
+        url: str,
+        selectors: Optional[Dict[str, Any]] = None,
+        actions: Optional[List[Dict[str, Any]]] = None,
+        take_screenshot: bool = True,
+        get_html: bool = True,
+        save_html_file: bool = False,
+        html_output_dir: str = "output/html",
+        storage_state: Optional[Dict[str, Any]] = None,
+        session_check: Optional[str] = None,
+        http_cache: bool = True,
+        har_record_path: Optional[str] = None,
+        har_replay_path: Optional[str] = None,
+        extract_links: bool = False,
+        capture_document: bool = False,
+        html_compression: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """借りたブラウザで1ページをスクレイピングする"""
+        context_options = dict(CONTEXT_OPTIONS)
+        if har_record_path:
+            context_options["record_har_path"] = har_record_path
+        context = await browser.new_context(storage_state=storage_state, **context_options)
         
         try:
+            if har_replay_path:
+                # HARに無いリクエストは外部に出さずに中断する
+                await context.route_from_har(har_replay_path, not_found="abort")
+            elif http_cache and self.response_cache and not har_record_path:
+                # HARの記録中は実際の通信内容を残すためキャッシュを使わない
+                await self.response_cache.attach(context)
             page = await context.new_page()
             # タイムアウトを延長し、load イベントを使用する（networkidleの代わりに）
-            await page.goto(url, wait_until="load", timeout=60000)
+            response = await page.goto(url, wait_until="load", timeout=60000)
             logger.info(f"ページにアクセスしました: {url}")
             
-            # アクションの実行
+            # 変更検知用のドキュメント情報（レンダリング前のレスポンス本文のハッシュを含む）
+            document = None
+            if capture_document and response is not None:
+                document = await self._document_info(response)
+            
+            # セッションのログイン状態を確認（確認用のセレクタが無い場合は認証エラーのステータスで判定する）
+            if session_check and await page.query_selector(session_check) is None:
+                raise SessionExpiredError(f"ログイン状態を確認できませんでした: {session_check}")
+            if storage_state and not session_check and response is not None and response.status in (401, 403):
+                raise SessionExpiredError(f"ログイン状態が無効です（HTTP {response.status}）: {url}")
+            
+            # アクションの実行（ページ送り・スクロールの各ステップの抽出結果を受け取る）
+            pages = []
             if actions:
-                await self.execute_actions(page, actions)
+                pages = await self.execute_actions(page, actions, selectors)
             
             # データの抽出
             data = await self.extract_data(page, selectors or {})
@@ -343,6 +743,19 @@ class PlaywrightScraper:
                 "url": url,
                 "data": data
             }
+            if pages:
+                result["pages"] = pages
+            if document is not None:
+                result["_document"] = document
+            if har_record_path:
+                # HARはコンテキストを閉じた時点で書き出される
+                result["har_file"] = har_record_path
+            
+            # リンクの抽出（ブラウザ側で絶対URLに解決済み）
+            if extract_links:
+                result["links"] = await page.eval_on_selector_all(
+                    "a[href]", "els => els.map(e => e.href)"
+                )
             
             # エラー情報を追加
             if errors:
@@ -351,7 +764,7 @@ class PlaywrightScraper:
             # スクリーンショットの取得
             if take_screenshot:
                 screenshot = await page.screenshot(type="jpeg", quality=80)
-                result["screenshot"] = base64.b64encode(screenshot).decode("utf-8")
+                result["screenshot"] = await self.post_processor.encode_base64(screenshot)
             
             # HTMLの取得
             if get_html:
@@ -371,13 +784,17 @@ class PlaywrightScraper:
                         path = "_index"
                     filename = f"{domain}{path}.html"
                     
-                    # 指定されたディレクトリがなければ作成
-                    os.makedirs(html_output_dir, exist_ok=True)
                     filepath = os.path.join(html_output_dir, filename)
                     
-                    # HTMLをファイルに書き込み
-                    with open(filepath, "w", encoding="utf-8") as f:
-                        f.write(html_content)
+                    # HTMLをファイルに書き込み（ディレクトリがなければ作成）
+                    if html_compression:
+                        filepath += FILE_EXTENSIONS[html_compression]
+                        os.makedirs(html_output_dir, exist_ok=True)
+                        await self.post_processor.run_cpu(
+                            write_compressed_text, filepath, html_content, html_compression
+                        )
+                    else:
+                        await self.post_processor.write_text(filepath, html_content)
                     
                     logger.info(f"HTMLをファイルに保存しました: {filepath}")
                     result["html_file"] = filepath
@@ -389,4 +806,5 @@ class PlaywrightScraper:
             raise
         
         finally:
-            await context.close()
+            if browser.is_connected():
+                await context.close()
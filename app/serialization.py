@@ -0,0 +1,85 @@
+"""
+JSONシリアライズモジュール
+
+orjsonによるJSONのシリアライズと、完了したタスクのステータスを
+シリアライズ済みのバイト列で保持するキャッシュを提供します。
+
+完了・失敗・キャンセルしたタスクのステータスは以後変わらないため、
+一度だけシリアライズしてポーリングのたびに同じバイト列を返します。
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+
+from .schemas import ScraperStatus
+
+
+def dumps(value: Any) -> bytes:
+    """値をUTF-8のJSONバイト列に変換する"""
+    return orjson.dumps(value)
+
+
+def serialize_status(response: Dict[str, Any]) -> bytes:
+    """
+    タスクのステータスを ScraperStatus の形式でシリアライズする
+
+    response_model=ScraperStatus を指定したエンドポイントと同じ内容（モデルに無い項目は除く）になります。
+    """
+    return orjson.dumps(ScraperStatus.model_validate(response).model_dump(mode="json"))
+
+
+class SerializedCache:
+    """シリアライズ済みのレスポンスを保持するバイト数上限のLRUキャッシュ"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        初期化
+
+        Args:
+            max_bytes: 保持する最大バイト数
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(key: str, encoding: Optional[str]) -> str:
+        # 圧縮した本文（br / gzip）は圧縮方式ごとに別のエントリとして保持する
+        return key if encoding is None else f"{key};encoding={encoding}"
+
+    def get(self, key: str, encoding: Optional[str] = None) -> Optional[bytes]:
+        key = self._key(key, encoding)
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: str, body: bytes, encoding: Optional[str] = None):
+        """バイト列を保存し、上限を超えた分を古い順に削除する"""
+        if len(body) > self.max_bytes:
+            return
+        key = self._key(key, encoding)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = body
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,342 @@
+"""
+ブラウザプロセス監視モジュール
+
+長時間稼働するChromiumのメモリ使用量と処理ページ数を監視し、
+閾値を超えたブラウザを処理中のページが終わるのを待ってから再起動します。
+クラッシュしたブラウザは自動的に破棄され、次のリースで新しいブラウザが起動されます。
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from playwright.async_api import Browser, Playwright
+
+logger = logging.getLogger(__name__)
+
+# ブラウザプロセスを識別するためのコマンドライン引数（Chromiumは未知の引数を無視する）
+# 値は「PID-スーパーバイザID-世代番号」で、同じホストの他のプロセスが起動したブラウザと区別する
+GENERATION_FLAG = "--playwright-api-generation"
+
+
+def _read_process_table() -> Dict[int, Dict[str, Any]]:
+    """/proc からプロセスの親子関係・RSS・コマンドラインを読み込む（Linux専用）"""
+    table: Dict[int, Dict[str, Any]] = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read().decode("utf-8", "replace")
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().decode("utf-8", "replace")
+        except OSError:
+            continue
+        # comm フィールドに空白や括弧が含まれる場合があるため、最後の ')' 以降を解析する
+        fields = stat[stat.rfind(")") + 2:].split()
+        table[int(entry)] = {
+            "ppid": int(fields[1]),
+            "rss": int(fields[21]) * page_size,
+            "cmdline": cmdline,
+        }
+    return table
+
+
+def browser_rss_bytes(tag: str) -> Optional[int]:
+    """
+    指定した世代のブラウザプロセスツリーのRSS合計を取得する
+
+    Args:
+        tag: 起動時に GENERATION_FLAG に指定したブラウザの識別子
+
+    Returns:
+        RSS合計（バイト）。取得できない環境ではNone
+    """
+    if not os.path.isdir("/proc"):
+        return None
+
+    table = _read_process_table()
+    marker = f"{GENERATION_FLAG}={tag}\0"
+    roots = [pid for pid, info in table.items() if marker in info["cmdline"]]
+    if not roots:
+        return None
+
+    children: Dict[int, List[int]] = {}
+    for pid, info in table.items():
+        children.setdefault(info["ppid"], []).append(pid)
+
+    # ルートプロセス（メインのブラウザプロセス）から子孫をたどって合計する
+    total = 0
+    seen = set()
+    stack = list(roots)
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += table[pid]["rss"]
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class BrowserHandle:
+    """起動済みブラウザ1世代分の状態"""
+
+    def __init__(self, browser: Browser, generation: int, tag: str):
+        self.browser = browser
+        self.generation = generation
+        # コマンドラインでこのブラウザのプロセスツリーを識別するための値
+        self.tag = tag
+        self.started_at = time.time()
+        self.pages_served = 0
+        self.active = 0
+        self.rss_bytes: Optional[int] = None
+        self.retired = False
+        self.crashed = False
+        self.idle = asyncio.Event()
+        self.idle.set()
+        # ブラウザの切断（disconnected イベント）を待つためのイベント
+        self.disconnected = asyncio.Event()
+        # 処理中のページが無くなるのを待って終了するタスク（1世代に1つだけ）
+        self.drain_task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        """ブラウザが利用可能かどうか"""
+        return not self.crashed and self.browser.is_connected()
+
+    def stats(self) -> Dict[str, Any]:
+        """統計情報を辞書で返す"""
+        return {
+            "generation": self.generation,
+            "uptime": round(time.time() - self.started_at, 1),
+            "pages_served": self.pages_served,
+            "active_pages": self.active,
+            "rss_mb": round(self.rss_bytes / (1024 * 1024), 1) if self.rss_bytes is not None else None,
+            "retired": self.retired,
+            "crashed": self.crashed,
+        }
+
+
+class BrowserSupervisor:
+    """ブラウザのリサイクルとクラッシュ復旧を行うスーパーバイザ"""
+
+    def __init__(
+        self,
+        playwright: Playwright,
+        max_pages: int = 500,
+        max_rss_mb: int = 1536,
+        check_interval: float = 15.0,
+        launch_options: Optional[Dict[str, Any]] = None
+    ):
+        """
+        スーパーバイザの初期化
+
+        Args:
+            playwright: 起動済みのPlaywrightインスタンス
+            max_pages: 1つのブラウザで処理する最大ページ数（0以下で無制限）
+            max_rss_mb: ブラウザプロセスツリーの最大RSS（MB、0以下で無制限）
+            check_interval: RSSを確認する間隔（秒）
+            launch_options: chromium.launch に渡す追加オプション
+        """
+        self.playwright = playwright
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.check_interval = check_interval
+        self.launch_options = launch_options or {}
+        self.current: Optional[BrowserHandle] = None
+        self.draining: List[BrowserHandle] = []
+        self.restarts = 0
+        self.crashes = 0
+        self._generations = itertools.count(1)
+        # uvicorn の複数ワーカーや同じホストの分散ワーカーが起動したブラウザと区別するための識別子
+        self._instance_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = asyncio.Lock()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """最初のブラウザを起動し、監視タスクを開始する"""
+        await self._get_handle()
+        if self.check_interval > 0:
+            self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        """監視を停止し、全てのブラウザを終了する"""
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+
+        handles = self.draining + ([self.current] if self.current else [])
+        self.current = None
+        self.draining = []
+        for handle in handles:
+            if handle.drain_task and not handle.drain_task.done():
+                handle.drain_task.cancel()
+            await self._close_handle(handle)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[BrowserHandle]:
+        """
+        ページ処理用にブラウザを借りる
+
+        リース中のブラウザはリサイクル対象になっても、
+        リースが全て返却されるまで終了されません。
+        """
+        handle = await self._get_handle()
+        handle.active += 1
+        handle.idle.clear()
+        try:
+            yield handle
+        finally:
+            handle.active -= 1
+            handle.pages_served += 1
+            if handle.active == 0:
+                handle.idle.set()
+            if handle is self.current and self._over_page_limit(handle):
+                logger.info(f"ブラウザ世代 {handle.generation} が最大ページ数に達しました: {handle.pages_served}")
+                self._retire(handle)
+            if handle.retired and handle.active == 0:
+                self._schedule_drain(handle)
+
+    async def _get_handle(self) -> BrowserHandle:
+        """現在のブラウザを返す。存在しないかクラッシュしている場合は起動する"""
+        handle = self.current
+        if handle and handle.alive and not handle.retired:
+            return handle
+
+        async with self._lock:
+            handle = self.current
+            if handle and handle.alive and not handle.retired:
+                return handle
+            if handle:
+                self._retire(handle)
+            self.current = await self._launch()
+            return self.current
+
+    async def _launch(self) -> BrowserHandle:
+        """新しい世代のブラウザを起動する"""
+        generation = next(self._generations)
+        options = dict(self.launch_options)
+        tag = f"{self._instance_id}-{generation}"
+        options["args"] = list(options.get("args", [])) + [f"{GENERATION_FLAG}={tag}"]
+        browser = await self.playwright.chromium.launch(headless=True, **options)
+
+        handle = BrowserHandle(browser, generation, tag)
+        browser.on("disconnected", lambda _: self._on_disconnected(handle))
+        if generation > 1:
+            self.restarts += 1
+        logger.info(f"ブラウザ世代 {generation} を起動しました")
+        return handle
+
+    async def crashed(self, handle: BrowserHandle, timeout: float = 1.0) -> bool:
+        """
+        ブラウザがクラッシュしたかどうかを判定する
+
+        ページの例外は disconnected イベントより先に届くことがあるため、
+        接続中に見える場合も timeout 秒だけ切断を待ってから判定する
+        """
+        if handle.crashed or not handle.browser.is_connected():
+            return True
+        try:
+            await asyncio.wait_for(handle.disconnected.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return handle.crashed or not handle.browser.is_connected()
+
+    def _on_disconnected(self, handle: BrowserHandle):
+        """ブラウザ切断時のコールバック"""
+        handle.disconnected.set()
+        if handle.retired:
+            return
+        handle.crashed = True
+        self.crashes += 1
+        logger.error(f"ブラウザ世代 {handle.generation} が予期せず切断されました（処理中ページ: {handle.active}）")
+        self._retire(handle)
+
+    def _retire(self, handle: BrowserHandle):
+        """ブラウザをリサイクル対象にする（新しいリースは次の世代に割り当てられる）"""
+        if handle.retired:
+            return
+        handle.retired = True
+        if handle is self.current:
+            self.current = None
+        self.draining.append(handle)
+        if handle.active == 0:
+            self._schedule_drain(handle)
+
+    def _schedule_drain(self, handle: BrowserHandle):
+        """終了タスクを開始する（参照を保持し、同じ世代に2回開始しない）"""
+        if handle.drain_task is None:
+            handle.drain_task = asyncio.create_task(self._drain(handle))
+
+    async def _drain(self, handle: BrowserHandle):
+        """処理中のページが無くなるのを待ってブラウザを終了する"""
+        await handle.idle.wait()
+        if handle in self.draining:
+            self.draining.remove(handle)
+            await self._close_handle(handle)
+
+    async def _close_handle(self, handle: BrowserHandle):
+        """ブラウザを終了する"""
+        handle.retired = True
+        try:
+            if handle.browser.is_connected():
+                await handle.browser.close()
+            logger.info(f"ブラウザ世代 {handle.generation} を終了しました（処理ページ数: {handle.pages_served}）")
+        except Exception as e:
+            logger.warning(f"ブラウザ世代 {handle.generation} の終了に失敗: {str(e)}")
+
+    def _over_page_limit(self, handle: BrowserHandle) -> bool:
+        return self.max_pages > 0 and handle.pages_served >= self.max_pages
+
+    def _over_rss_limit(self, handle: BrowserHandle) -> bool:
+        return (
+            self.max_rss_mb > 0
+            and handle.rss_bytes is not None
+            and handle.rss_bytes > self.max_rss_mb * 1024 * 1024
+        )
+
+    async def _monitor(self):
+        """定期的にRSSを計測し、閾値超過や切断を検出する"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            handle = self.current
+            if not handle:
+                continue
+            try:
+                # /proc の走査はブロッキングなのでスレッドで実行する
+                handle.rss_bytes = await loop.run_in_executor(None, browser_rss_bytes, handle.tag)
+            except Exception as e:
+                logger.warning(f"ブラウザRSSの取得に失敗: {str(e)}")
+                continue
+
+            if not handle.alive:
+                self._on_disconnected(handle)
+            elif self._over_rss_limit(handle):
+                logger.warning(
+                    f"ブラウザ世代 {handle.generation} のRSSが上限を超えました: "
+                    f"{handle.rss_bytes / (1024 * 1024):.0f}MB > {self.max_rss_mb}MB"
+                )
+                self._retire(handle)
+
+    def stats(self) -> Dict[str, Any]:
+        """スーパーバイザの統計情報を返す"""
+        return {
+            "restarts": self.restarts,
+            "crashes": self.crashes,
+            "max_pages": self.max_pages,
+            "max_rss_mb": self.max_rss_mb,
+            "current": self.current.stats() if self.current else None,
+            "draining": [handle.stats() for handle in self.draining],
+        }
@@ -0,0 +1,353 @@
+"""
+分散ワーカー用のタスクキューモジュール
+
+分散モードではAPIサーバーはタスクをキューに登録するだけで、ブラウザを持つワーカープロセスが
+キューからタスクを取り出して実行し、結果をタスクストアに書き戻します。
+
+キューには同じプロセス内で使う LocalTaskQueue（テスト用）と、
+複数のプロセス・ノードで共有できる SqliteTaskQueue があります。
+取り出されたタスクはワーカーのハートビートで保持され、ハートビートが途絶えたタスクは
+キューに戻されて他のワーカーが再実行します。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .scheduler import PRIORITY_CLASSES
+
+logger = logging.getLogger(__name__)
+
+_PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITY_CLASSES)}
+
+
+class TaskQueue:
+    """タスクキューの基底クラス"""
+
+    async def start(self):
+        """キューを開始する"""
+
+    async def close(self):
+        """キューを終了する"""
+
+    async def put(self, task_id: str, request: Dict[str, Any], priority: str = "normal"):
+        """
+        タスクをキューに登録する
+
+        Args:
+            task_id: タスクID
+            request: スクレイピングリクエスト（辞書）
+            priority: 優先度クラス
+        """
+        raise NotImplementedError
+
+    async def claim(self, worker_id: str, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        優先度の高い順にタスクを取り出す
+
+        Args:
+            worker_id: ワーカーID
+            limit: 取り出す最大件数
+
+        Returns:
+            タスクIDとリクエストのリスト
+        """
+        raise NotImplementedError
+
+    async def heartbeat(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        """
+        取り出し中のタスクの保持を延長する
+
+        Returns:
+            キャンセルや再投入によってこのワーカーの担当ではなくなったタスクIDのリスト
+        """
+        raise NotImplementedError
+
+    async def complete(self, worker_id: str, task_id: str):
+        """実行を終えたタスクをキューから削除する"""
+        raise NotImplementedError
+
+    async def cancel(self, task_id: str) -> bool:
+        """タスクをキューから削除する（削除した場合はTrue）"""
+        raise NotImplementedError
+
+    async def release(self, worker_id: str):
+        """停止するワーカーが取り出したタスクをすぐにキューに戻す"""
+        raise NotImplementedError
+
+    async def requeue_stale(self, timeout: float, max_attempts: int) -> List[str]:
+        """
+        ハートビートが途絶えたタスクをキューに戻す
+
+        Args:
+            timeout: この秒数以上ハートビートが無いタスクを対象にする
+            max_attempts: 取り出し回数の上限（超えたタスクはキューから削除する）
+
+        Returns:
+            上限を超えて削除したタスクIDのリスト
+        """
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, Any]:
+        """キューの統計情報を返す"""
+        raise NotImplementedError
+
+
+class _LocalEntry:
+    __slots__ = ("task_id", "request", "priority", "worker_id", "heartbeat", "attempts")
+
+    def __init__(self, task_id: str, request: Dict[str, Any], priority: str):
+        self.task_id = task_id
+        self.request = request
+        self.priority = priority
+        self.worker_id: Optional[str] = None
+        self.heartbeat = 0.0
+        self.attempts = 0
+
+
+class LocalTaskQueue(TaskQueue):
+    """同じプロセス内で使うタスクキュー（テスト・単一ノード用）"""
+
+    def __init__(self):
+        self.entries: Dict[str, _LocalEntry] = {}
+        self.ready: Dict[str, Deque[str]] = {priority: deque() for priority in PRIORITY_CLASSES}
+
+    async def put(self, task_id: str, request: Dict[str, Any], priority: str = "normal"):
+        entry = _LocalEntry(task_id, request, priority if priority in self.ready else "normal")
+        self.entries[task_id] = entry
+        self.ready[entry.priority].append(task_id)
+
+    async def claim(self, worker_id: str, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        claimed = []
+        now = time.time()
+        for priority in PRIORITY_CLASSES:
+            ready = self.ready[priority]
+            while ready and len(claimed) < limit:
+                entry = self.entries.get(ready.popleft())
+                # キャンセル済み・取り出し済みのものは読み飛ばす
+                if entry is None or entry.worker_id is not None:
+                    continue
+                entry.worker_id = worker_id
+                entry.heartbeat = now
+                entry.attempts += 1
+                claimed.append((entry.task_id, entry.request))
+        return claimed
+
+    async def heartbeat(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        now = time.time()
+        lost = []
+        for task_id in task_ids:
+            entry = self.entries.get(task_id)
+            if entry is None or entry.worker_id != worker_id:
+                lost.append(task_id)
+            else:
+                entry.heartbeat = now
+        return lost
+
+    async def complete(self, worker_id: str, task_id: str):
+        entry = self.entries.get(task_id)
+        if entry is not None and entry.worker_id == worker_id:
+            del self.entries[task_id]
+
+    async def cancel(self, task_id: str) -> bool:
+        return self.entries.pop(task_id, None) is not None
+
+    async def release(self, worker_id: str):
+        for entry in self.entries.values():
+            if entry.worker_id == worker_id:
+                entry.worker_id = None
+                self.ready[entry.priority].append(entry.task_id)
+
+    async def requeue_stale(self, timeout: float, max_attempts: int) -> List[str]:
+        deadline = time.time() - timeout
+        dropped = []
+        for entry in list(self.entries.values()):
+            if entry.worker_id is None or entry.heartbeat >= deadline:
+                continue
+            if entry.attempts >= max_attempts:
+                del self.entries[entry.task_id]
+                dropped.append(entry.task_id)
+                continue
+            entry.worker_id = None
+            self.ready[entry.priority].append(entry.task_id)
+        return dropped
+
+    async def stats(self) -> Dict[str, Any]:
+        claimed = sum(1 for entry in self.entries.values() if entry.worker_id is not None)
+        return {"backend": "local", "queued": len(self.entries) - claimed, "claimed": claimed}
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS queue (
+        task_id TEXT PRIMARY KEY,
+        rank INTEGER NOT NULL,
+        request TEXT NOT NULL,
+        worker_id TEXT,
+        heartbeat REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        enqueued_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS queue_ready ON queue (worker_id, rank)",
+)
+
+
+class SqliteTaskQueue(TaskQueue):
+    """SQLiteファイルを共有して複数のプロセス・ノードで使うタスクキュー"""
+
+    def __init__(self, path: str):
+        """
+        キューの初期化
+
+        Args:
+            path: SQLiteデータベースのパス（全てのAPIサーバー・ワーカーで共有する）
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # 接続はワーカースレッド間で共有するため直列化する
+        self._lock = threading.Lock()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._open)
+        logger.info(f"タスクキューを開きました: {self.path}")
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    async def close(self):
+        if self._conn:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def put(self, task_id: str, request: Dict[str, Any], priority: str = "normal"):
+        await self._run(self._put, task_id, json.dumps(request, ensure_ascii=False), _PRIORITY_RANK.get(priority, 1))
+
+    def _put(self, task_id: str, request: str, rank: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queue (task_id, rank, request, enqueued_at) VALUES (?, ?, ?, ?)",
+                (task_id, rank, request, time.time())
+            )
+
+    async def claim(self, worker_id: str, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        if limit <= 0:
+            return []
+        rows = await self._run(self._claim, worker_id, limit)
+        return [(task_id, json.loads(request)) for task_id, request in rows]
+
+    def _claim(self, worker_id: str, limit: int) -> List[Tuple[str, str]]:
+        with self._lock, self._conn:
+            # 書き込みロックを先に取り、他のワーカーと同じタスクを取り出さないようにする
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT task_id, request FROM queue WHERE worker_id IS NULL ORDER BY rank, rowid LIMIT ?",
+                (limit,)
+            ).fetchall()
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE queue SET worker_id = ?, heartbeat = ?, attempts = attempts + 1 WHERE task_id = ?",
+                [(worker_id, now, task_id) for task_id, _ in rows]
+            )
+        return rows
+
+    async def heartbeat(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        if not task_ids:
+            return []
+        return await self._run(self._heartbeat, worker_id, task_ids)
+
+    def _heartbeat(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE queue SET heartbeat = ? WHERE worker_id = ?", (time.time(), worker_id))
+            held = {
+                row[0] for row in self._conn.execute("SELECT task_id FROM queue WHERE worker_id = ?", (worker_id,))
+            }
+        return [task_id for task_id in task_ids if task_id not in held]
+
+    async def complete(self, worker_id: str, task_id: str):
+        await self._run(self._delete, "DELETE FROM queue WHERE task_id = ? AND worker_id = ?", (task_id, worker_id))
+
+    async def cancel(self, task_id: str) -> bool:
+        return await self._run(self._delete, "DELETE FROM queue WHERE task_id = ?", (task_id,))
+
+    async def release(self, worker_id: str):
+        await self._run(
+            self._delete, "UPDATE queue SET worker_id = NULL, heartbeat = NULL WHERE worker_id = ?", (worker_id,)
+        )
+
+    def _delete(self, statement: str, params: Tuple) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute(statement, params).rowcount > 0
+
+    async def requeue_stale(self, timeout: float, max_attempts: int) -> List[str]:
+        return await self._run(self._requeue_stale, timeout, max_attempts)
+
+    def _requeue_stale(self, timeout: float, max_attempts: int) -> List[str]:
+        deadline = time.time() - timeout
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            dropped = [
+                row[0] for row in self._conn.execute(
+                    "SELECT task_id FROM queue WHERE worker_id IS NOT NULL AND heartbeat < ? AND attempts >= ?",
+                    (deadline, max_attempts)
+                )
+            ]
+            self._conn.executemany("DELETE FROM queue WHERE task_id = ?", [(task_id,) for task_id in dropped])
+            requeued = self._conn.execute(
+                "UPDATE queue SET worker_id = NULL, heartbeat = NULL WHERE worker_id IS NOT NULL AND heartbeat < ?",
+                (deadline,)
+            ).rowcount
+        if requeued:
+            logger.warning(f"ハートビートが途絶えたタスクをキューに戻しました: {requeued}件")
+        return dropped
+
+    async def stats(self) -> Dict[str, Any]:
+        queued, claimed, workers = await self._run(self._counts)
+        return {"backend": "sqlite", "queued": queued, "claimed": claimed, "workers": workers}
+
+    def _counts(self) -> Tuple[int, int, int]:
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT
+                    COUNT(*) - COUNT(worker_id),
+                    COUNT(worker_id),
+                    COUNT(DISTINCT worker_id)
+                FROM queue
+                """
+            ).fetchone()
+
+
+def create_task_queue(backend: str, path: str) -> TaskQueue:
+    """
+    設定に応じたタスクキューを作成する
+
+    Args:
+        backend: "local" または "sqlite"
+        path: SQLiteデータベースのパス
+    """
+    if backend == "sqlite":
+        return SqliteTaskQueue(path)
+    if backend != "local":
+        raise ValueError(f"不明なタスクキュー: {backend}")
+    return LocalTaskQueue()
@@ -0,0 +1,656 @@
+"""
+タスクストアモジュール
+
+スクレイピングタスクの状態（ステータス・リクエスト・結果・エラー）を保持します。
+メモリ上に保持する MemoryTaskStore と、SQLite（WALモード）に永続化する SqliteTaskStore があり、
+SqliteTaskStore を使うとサーバーの再起動後も結果を参照でき、未完了のタスクを再開できます。
+同じデータベースを共有すれば `uvicorn --workers N` の複数ワーカーからも同じタスクを参照できます。
+
+SqliteTaskStore の書き込みはメモリ上にまとめてから一定間隔でまとめてコミットし、
+大きな結果は行に入れずにファイルとして保存します。
+
+タスクの状態は __slots__ を使った TaskRecord で保持し、リクエストは既定値の項目を除いた
+JSONのバイト列として1つだけ持つため、大量のタスクを保持してもメモリ使用量を抑えられます。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import orjson
+
+from .compression import json_default, json_object_hook
+
+logger = logging.getLogger(__name__)
+
+# 完了後に状態が変わらないステータス
+FINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+
+# ワーカーの生存を記録する間隔（秒）
+HEARTBEAT_INTERVAL = 2.0
+
+
+class TaskRecord:
+    """タスクの状態"""
+
+    __slots__ = ("status", "request_json", "batch_id", "crawl_id", "result", "error", "created_at", "updated_at")
+
+    def __init__(
+        self,
+        status: str,
+        request_json: bytes,
+        batch_id: Optional[str] = None,
+        crawl_id: Optional[str] = None,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        created_at: float = 0.0,
+        updated_at: Optional[float] = None
+    ):
+        # データベースから読み込んだステータスも全てのタスクで同じ文字列オブジェクトを共有する
+        self.status = sys.intern(status)
+        # 既定値の項目を除いたリクエストのJSON
+        self.request_json = request_json
+        self.batch_id = batch_id
+        self.crawl_id = crawl_id
+        self.result = result
+        self.error = error
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @property
+    def request(self) -> Dict[str, Any]:
+        """リクエスト（ScrapingRequest の引数）"""
+        return orjson.loads(self.request_json)
+
+    def update(self, **fields: Any):
+        for name, value in fields.items():
+            setattr(self, name, sys.intern(value) if name == "status" else value)
+
+    def copy(self) -> "TaskRecord":
+        return TaskRecord(
+            self.status, self.request_json, self.batch_id, self.crawl_id,
+            self.result, self.error, self.created_at, self.updated_at
+        )
+
+
+def _summary(task_id: str, record: TaskRecord) -> Dict[str, Any]:
+    summary = {"task_id": task_id, "status": record.status, "updated_at": record.updated_at}
+    if record.error is not None:
+        summary["error"] = record.error
+    return summary
+
+
+class TaskStore:
+    """タスクストアの基底クラス"""
+
+    async def start(self):
+        """ストアを開始する"""
+
+    async def close(self):
+        """ストアを終了する（未書き込みのデータは書き込まれる）"""
+
+    async def flush(self):
+        """未書き込みのデータを書き込む"""
+
+    def new_task_id(self) -> str:
+        raise NotImplementedError
+
+    def new_batch_id(self) -> str:
+        raise NotImplementedError
+
+    async def create(self, task_id: str, record: TaskRecord):
+        """
+        タスクを登録する
+
+        Args:
+            task_id: タスクID
+            record: タスクの状態（status, request_json, batch_id, crawl_id）
+        """
+        raise NotImplementedError
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        """タスクの状態を返す（存在しない場合はNone）"""
+        raise NotImplementedError
+
+    def release(self, task_id: str):
+        """このプロセスでは実行しないタスクを、書き込み後はストアから読み出すようにする"""
+
+    async def update(self, task_id: str, **fields: Any):
+        """タスクの状態を更新する"""
+        raise NotImplementedError
+
+    async def batch_task_ids(self, batch_id: str) -> Optional[List[str]]:
+        """バッチに含まれるタスクIDのリストを返す（存在しない場合はNone）"""
+        raise NotImplementedError
+
+    async def summaries(
+        self, task_ids: Optional[List[str]] = None, batch_id: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        複数のタスクのステータスを結果を読み込まずに返す
+
+        Args:
+            task_ids: タスクIDのリスト
+            batch_id: バッチID（task_ids が無い場合にバッチ内の全タスクを対象にする）
+
+        Returns:
+            task_id, status, updated_at, error の辞書のリスト（存在しないタスクは含まない）。
+            バッチが存在しない場合はNone
+        """
+        raise NotImplementedError
+
+    async def claim_unfinished(self) -> List[Tuple[str, TaskRecord]]:
+        """再起動前に完了しなかったタスクを引き取って返す"""
+        return []
+
+    def watch_unfinished(self, callback: Callable[[List[Tuple[str, TaskRecord]]], Awaitable[None]]):
+        """停止した他のプロセスのタスクを定期的に引き取り、callback に渡す"""
+
+    async def stats(self) -> Dict[str, Any]:
+        """ストアの統計情報を返す"""
+        raise NotImplementedError
+
+
+class MemoryTaskStore(TaskStore):
+    """プロセスのメモリ上にタスクを保持するストア"""
+
+    def __init__(self):
+        self.tasks: Dict[str, TaskRecord] = {}
+        self.batches: Dict[str, List[str]] = {}
+
+    def new_task_id(self) -> str:
+        return f"task_{len(self.tasks) + 1}"
+
+    def new_batch_id(self) -> str:
+        batch_id = f"batch_{len(self.batches) + 1}"
+        self.batches[batch_id] = []
+        return batch_id
+
+    async def create(self, task_id: str, record: TaskRecord):
+        record.created_at = record.updated_at = time.time()
+        self.tasks[task_id] = record
+        if record.batch_id:
+            self.batches.setdefault(record.batch_id, []).append(task_id)
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        return self.tasks.get(task_id)
+
+    async def update(self, task_id: str, **fields: Any):
+        record = self.tasks[task_id]
+        # キャンセル済みのタスクは実行中だったジョブの結果で上書きしない
+        if record.status == "cancelled":
+            return
+        record.update(updated_at=time.time(), **fields)
+
+    async def batch_task_ids(self, batch_id: str) -> Optional[List[str]]:
+        task_ids = self.batches.get(batch_id)
+        return list(task_ids) if task_ids is not None else None
+
+    async def summaries(
+        self, task_ids: Optional[List[str]] = None, batch_id: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        if task_ids is None:
+            task_ids = self.batches.get(batch_id)
+            if task_ids is None:
+                return None
+        summaries = []
+        for task_id in task_ids:
+            record = self.tasks.get(task_id)
+            if record is not None:
+                summaries.append(_summary(task_id, record))
+        return summaries
+
+    async def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for record in self.tasks.values():
+            counts[record.status] = counts.get(record.status, 0) + 1
+        return {"backend": "memory", "tasks": len(self.tasks), "statuses": counts}
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        task_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        request TEXT NOT NULL,
+        batch_id TEXT,
+        crawl_id TEXT,
+        result TEXT,
+        result_path TEXT,
+        error TEXT,
+        owner TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status)",
+    "CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch_id)",
+    """
+    CREATE TABLE IF NOT EXISTS workers (
+        worker_id TEXT PRIMARY KEY,
+        heartbeat REAL NOT NULL
+    )
+    """,
+)
+
+# キャンセル済みのタスクと、より新しい状態が書き込まれているタスクは上書きしない
+_UPSERT = """
+INSERT INTO tasks (task_id, status, request, batch_id, crawl_id, result, result_path, error, owner, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (task_id) DO UPDATE SET
+    status = excluded.status,
+    result = excluded.result,
+    result_path = excluded.result_path,
+    error = excluded.error,
+    owner = excluded.owner,
+    updated_at = excluded.updated_at
+WHERE tasks.status != 'cancelled' AND excluded.updated_at >= tasks.updated_at
+"""
+
+_SELECT = "SELECT status, request, batch_id, crawl_id, result, result_path, error, updated_at FROM tasks WHERE task_id = ?"
+
+
+class SqliteTaskStore(TaskStore):
+    """SQLiteにタスクを永続化するストア"""
+
+    def __init__(
+        self,
+        path: str,
+        result_inline_bytes: int = 64 * 1024,
+        flush_interval: float = 0.05,
+        flush_size: int = 200
+    ):
+        """
+        ストアの初期化
+
+        Args:
+            path: SQLiteデータベースのパス（結果ファイルは同じディレクトリの results/ に保存される）
+            result_inline_bytes: 行に直接保存する結果の最大バイト数
+            flush_interval: 書き込みをまとめてコミットする間隔（秒）
+            flush_size: この件数の書き込みが溜まったら間隔を待たずにコミットする
+        """
+        self.path = path
+        self.result_dir = os.path.join(os.path.dirname(path) or ".", "results")
+        self.result_inline_bytes = result_inline_bytes
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        # このワーカーの識別子（未完了タスクの引き取りに使う）
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # このワーカーが実行中のタスク（完了して書き込まれるまで読み出しはここから行う）
+        self._active: Dict[str, TaskRecord] = {}
+        # 他のワーカーに任せたタスク（書き込み後はメモリから外し、他のワーカーの更新をデータベースから読む）
+        self._released: Set[str] = set()
+        # 書き込み待ちのタスクID
+        self._dirty: Dict[str, None] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        # 定期的な書き込みと明示的な flush() が並行して古い状態で上書きしないよう直列化する
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        # 接続はワーカースレッド間で共有するため直列化する
+        self._lock = threading.Lock()
+        self._last_heartbeat = 0.0
+        # 停止したプロセスのタスクを引き取る間隔と、停止とみなすハートビートの途絶時間（秒）
+        self.claim_interval = 5.0
+        self.stale_after = 10.0
+        self._on_claimed: Optional[Callable[[List[Tuple[str, TaskRecord]]], Awaitable[None]]] = None
+        self._last_claim = 0.0
+        self.commits = 0
+        self.rows_written = 0
+
+    async def start(self):
+        """データベースを開いて書き込みループを開始する"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._open)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        logger.info(f"タスクストアを開きました: {self.path} (worker: {self.worker_id})")
+
+    def _open(self):
+        os.makedirs(self.result_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._heartbeat()
+        self._conn.commit()
+
+    async def close(self):
+        """未書き込みのデータを書き込んでデータベースを閉じる"""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+        if self._conn:
+            with self._lock:
+                self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+                self._conn.commit()
+                self._conn.close()
+            self._conn = None
+
+    def new_task_id(self) -> str:
+        # 複数ワーカーで重複しないようにランダムなIDを使う
+        return f"task_{uuid.uuid4().hex[:16]}"
+
+    def new_batch_id(self) -> str:
+        return f"batch_{uuid.uuid4().hex[:16]}"
+
+    def _mark_dirty(self, task_id: str):
+        self._dirty[task_id] = None
+        if len(self._dirty) >= self.flush_size and self._wakeup:
+            self._wakeup.set()
+
+    async def create(self, task_id: str, record: TaskRecord):
+        record.created_at = record.updated_at = time.time()
+        self._active[task_id] = record
+        self._mark_dirty(task_id)
+
+    def release(self, task_id: str):
+        if task_id not in self._active:
+            return
+        if task_id in self._dirty:
+            self._released.add(task_id)
+        else:
+            # 書き込み済み（引き取ったタスクなど）はすぐに外す
+            del self._active[task_id]
+
+    async def update(self, task_id: str, **fields: Any):
+        # 更新するのはこのプロセスで実行しているタスクなので、メモリに保持する
+        self._released.discard(task_id)
+        record = self._active.get(task_id)
+        if record is None:
+            # 他のワーカーのタスクはデータベースから読み込んで更新する
+            record = await self.get(task_id)
+            if record is None:
+                raise KeyError(task_id)
+            # キャンセル済みのタスクは読み込んだだけで保持しない
+            if record.status == "cancelled":
+                return
+            record.created_at = time.time()
+            self._active[task_id] = record
+        # キャンセル済みのタスクは実行中だったジョブの結果で上書きしない
+        if record.status == "cancelled":
+            return
+        record.update(updated_at=time.time(), **fields)
+        self._mark_dirty(task_id)
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        record = self._active.get(task_id)
+        if record is not None:
+            return record
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._select, task_id)
+
+    def _select(self, task_id: str) -> Optional[TaskRecord]:
+        """データベースからタスクを読み込む（ワーカースレッドで実行）"""
+        with self._lock:
+            row = self._conn.execute(_SELECT, (task_id,)).fetchone()
+        if row is None:
+            return None
+        status, request, batch_id, crawl_id, result, result_path, error, updated_at = row
+        record = TaskRecord(
+            status, request.encode("utf-8"), batch_id or None, crawl_id or None, error=error, updated_at=updated_at
+        )
+        if result is not None:
+            record.result = json.loads(result, object_hook=json_object_hook)
+        elif result_path:
+            try:
+                with open(result_path, "r", encoding="utf-8") as f:
+                    record.result = json.load(f, object_hook=json_object_hook)
+            except (OSError, ValueError) as e:
+                logger.warning(f"タスク結果の読み込みに失敗: {task_id}: {str(e)}")
+        return record
+
+    async def batch_task_ids(self, batch_id: str) -> Optional[List[str]]:
+        # 未書き込みのタスクも含めるため先に書き込む
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        task_ids = await loop.run_in_executor(None, self._select_batch, batch_id)
+        return task_ids or None
+
+    def _select_batch(self, batch_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id FROM tasks WHERE batch_id = ? ORDER BY rowid", (batch_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    async def summaries(
+        self, task_ids: Optional[List[str]] = None, batch_id: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        if task_ids is None:
+            # 未書き込みのタスクも含めるため先に書き込む
+            await self.flush()
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, self._select_summaries, task_ids, batch_id)
+        if task_ids is None and not rows:
+            return None
+        found = {row["task_id"]: row for row in rows}
+        # このワーカーが更新して未書き込みの状態を優先する
+        for task_id in (task_ids if task_ids is not None else list(found)):
+            record = self._active.get(task_id)
+            if record is not None:
+                found[task_id] = _summary(task_id, record)
+        order = task_ids if task_ids is not None else [row["task_id"] for row in rows]
+        return [found[task_id] for task_id in order if task_id in found]
+
+    def _select_summaries(self, task_ids: Optional[List[str]], batch_id: Optional[str]) -> List[Dict[str, Any]]:
+        """タスクのステータスを読み込む（ワーカースレッドで実行）"""
+        query = "SELECT task_id, status, updated_at, error FROM tasks WHERE "
+        rows = []
+        with self._lock:
+            if task_ids is None:
+                rows = self._conn.execute(query + "batch_id = ? ORDER BY rowid", (batch_id,)).fetchall()
+            else:
+                # SQLiteのパラメータ数の上限を超えないよう分割して問い合わせる
+                for start in range(0, len(task_ids), 500):
+                    chunk = task_ids[start:start + 500]
+                    rows.extend(self._conn.execute(
+                        query + f"task_id IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall())
+        summaries = []
+        for task_id, status, updated_at, error in rows:
+            summary = {"task_id": task_id, "status": status, "updated_at": updated_at}
+            if error is not None:
+                summary["error"] = error
+            summaries.append(summary)
+        return summaries
+
+    async def _flush_loop(self):
+        """一定間隔、または書き込みが溜まった時点でまとめてコミットする"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"タスクストアの書き込みに失敗: {str(e)}")
+            if self._on_claimed and loop.time() - self._last_claim >= self.claim_interval:
+                self._last_claim = loop.time()
+                try:
+                    claimed = await self.claim_unfinished(self.stale_after)
+                    if claimed:
+                        await self._on_claimed(claimed)
+                except Exception as e:
+                    logger.error(f"未完了のタスクの引き取りに失敗: {str(e)}")
+
+    def watch_unfinished(self, callback: Callable[[List[Tuple[str, TaskRecord]]], Awaitable[None]]):
+        # 起動直後は停止したプロセスのハートビートがまだ新しく見えるため、起動時の1回だけでは取りこぼす
+        self._on_claimed = callback
+        self._last_claim = asyncio.get_running_loop().time()
+
+    async def flush(self):
+        """書き込み待ちのタスクをデータベースに書き込む"""
+        if not self._conn:
+            return
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        dirty = list(self._dirty)
+        self._dirty.clear()
+        # ワーカースレッドで書き込む間にイベントループ側で変更されないようにコピーする
+        snapshot = [(task_id, self._active[task_id].copy()) for task_id in dirty if task_id in self._active]
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, snapshot)
+        except Exception:
+            # 次回の書き込みで再試行する
+            for task_id in dirty:
+                self._dirty[task_id] = None
+            raise
+
+        # 完了したタスクと他のワーカーに任せたタスクは、書き込んだらメモリから外す
+        for task_id, record in snapshot:
+            current = self._active.get(task_id)
+            if current is None or task_id in self._dirty:
+                continue
+            if current.status in FINAL_STATUSES or task_id in self._released:
+                del self._active[task_id]
+                self._released.discard(task_id)
+
+    def _write(self, snapshot: List[Tuple[str, TaskRecord]]):
+        """タスクをまとめて書き込む（ワーカースレッドで実行）"""
+        now = time.time()
+        if not snapshot and now - self._last_heartbeat < HEARTBEAT_INTERVAL:
+            return
+        rows = []
+        for task_id, record in snapshot:
+            result = None
+            result_path = None
+            if record.result is not None:
+                # 圧縮されたHTMLはBase64のまま保存する
+                result = json.dumps(record.result, ensure_ascii=False, default=json_default)
+                if len(result) > self.result_inline_bytes:
+                    # 大きな結果は行に入れずにファイルとして保存する
+                    result_path = os.path.join(self.result_dir, f"{task_id}.json")
+                    with open(result_path, "w", encoding="utf-8") as f:
+                        f.write(result)
+                    result = None
+            rows.append((
+                task_id,
+                record.status,
+                record.request_json.decode("utf-8"),
+                record.batch_id,
+                record.crawl_id,
+                result,
+                result_path,
+                record.error,
+                self.worker_id if record.status not in FINAL_STATUSES else None,
+                record.created_at,
+                # 書き込んだ時刻ではなく更新した時刻を使い、古い状態が後から書き込まれても上書きしない
+                record.updated_at or now,
+            ))
+
+        with self._lock:
+            with self._conn:
+                if rows:
+                    self._conn.executemany(_UPSERT, rows)
+                self._heartbeat()
+        if rows:
+            self.commits += 1
+            self.rows_written += len(rows)
+
+    def _heartbeat(self):
+        self._last_heartbeat = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO workers (worker_id, heartbeat) VALUES (?, ?)", (self.worker_id, time.time())
+        )
+
+    async def claim_unfinished(self, stale_after: Optional[float] = None) -> List[Tuple[str, TaskRecord]]:
+        """
+        停止したワーカーが完了できなかったタスクを引き取る
+
+        Args:
+            stale_after: この秒数以上ハートビートが無いワーカーを停止したとみなす（省略時は self.stale_after）
+
+        Returns:
+            引き取ったタスクIDと状態のリスト（登録順）
+        """
+        if stale_after is None:
+            stale_after = self.stale_after
+        loop = asyncio.get_running_loop()
+        claimed = await loop.run_in_executor(None, self._claim, stale_after)
+        for task_id, record in claimed:
+            record.created_at = time.time()
+            self._active[task_id] = record
+        if claimed:
+            logger.info(f"未完了のタスクを引き取りました: {len(claimed)}件")
+        return claimed
+
+    def _claim(self, stale_after: float) -> List[Tuple[str, TaskRecord]]:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM workers WHERE heartbeat < ?", (time.time() - stale_after,))
+                rows = self._conn.execute(
+                    """
+                    SELECT task_id FROM tasks
+                    WHERE status IN ('pending', 'running')
+                      AND (owner IS NULL OR owner NOT IN (SELECT worker_id FROM workers))
+                    ORDER BY rowid
+                    """
+                ).fetchall()
+                task_ids = [row[0] for row in rows]
+                self._conn.executemany(
+                    "UPDATE tasks SET status = 'pending', owner = ? WHERE task_id = ?",
+                    [(self.worker_id, task_id) for task_id in task_ids]
+                )
+        claimed = []
+        for task_id in task_ids:
+            record = self._select(task_id)
+            if record is not None:
+                record.status = "pending"
+                claimed.append((task_id, record))
+        return claimed
+
+    async def stats(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        counts = await loop.run_in_executor(None, self._count_statuses)
+        return {
+            "backend": "sqlite",
+            "worker_id": self.worker_id,
+            "statuses": counts,
+            "active": len(self._active),
+            "pending_writes": len(self._dirty),
+            "commits": self.commits,
+            "rows_written": self.rows_written,
+        }
+
+    def _count_statuses(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+
+def create_task_store(backend: str, path: str, result_inline_kb: int = 64) -> TaskStore:
+    """
+    設定に応じたタスクストアを作成する
+
+    Args:
+        backend: "memory" または "sqlite"
+        path: SQLiteデータベースのパス
+        result_inline_kb: 行に直接保存する結果の最大サイズ（KB）
+    """
+    if backend == "sqlite":
+        return SqliteTaskStore(path, result_inline_bytes=result_inline_kb * 1024)
+    if backend != "memory":
+        raise ValueError(f"不明なタスクストア: {backend}")
+    return MemoryTaskStore()
@@ -0,0 +1,214 @@
+"""
+スクレイピングワーカー
+
+分散モードでタスクキューからタスクを取り出し、PlaywrightScraperで実行して
+結果をタスクストアに書き戻すワーカーです。APIサーバーとは別のプロセス・ノードで実行できます。
+
+    python -m app.worker
+
+取り出したタスクはワーカー内のスケジューラでホストごとの同時実行制限を守って実行し、
+実行中はハートビートでキューの保持を延長します。
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Awaitable, Callable, List, Optional, Set
+
+from . import config
+from .scheduler import ScrapeJob, ScrapeScheduler
+from .schemas import ScrapingRequest
+from .task_queue import TaskQueue
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWorker:
+    """タスクキューからタスクを取り出して実行するワーカー"""
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        runner: Callable[[ScrapeJob], Awaitable[None]],
+        on_dropped: Callable[[str], Awaitable[None]],
+        persist: Optional[Callable[[], Awaitable[None]]] = None,
+        concurrency: int = config.SCRAPER_WORKERS,
+        heartbeat_interval: float = config.WORKER_HEARTBEAT_INTERVAL,
+        stale_timeout: float = config.WORKER_STALE_TIMEOUT,
+        max_attempts: int = config.TASK_MAX_ATTEMPTS,
+        poll_interval: float = 0.5
+    ):
+        """
+        ワーカーの初期化
+
+        Args:
+            queue: タスクキュー
+            runner: ジョブを実行するコルーチン関数
+            on_dropped: 再試行回数の上限を超えたタスクを失敗にするコルーチン関数
+            persist: キューから削除する前にタスクの結果を書き込むコルーチン関数
+            concurrency: 同時に実行するタスク数
+            heartbeat_interval: ハートビートの間隔（秒）
+            stale_timeout: この秒数以上ハートビートが無いタスクをキューに戻す
+            max_attempts: タスクの取り出し回数の上限
+            poll_interval: キューが空のときの確認間隔（秒）
+        """
+        self.queue = queue
+        self.runner = runner
+        self.on_dropped = on_dropped
+        self.persist = persist
+        self.concurrency = concurrency
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        # ホストの制限で待つ間も他のホストを処理できるよう、同時実行数の2倍まで取り出しておく
+        self.prefetch = concurrency * 2
+        self.scheduler = ScrapeScheduler(
+            self._run,
+            workers=concurrency,
+            max_per_host=config.HOST_MAX_CONCURRENCY,
+            min_delay=config.HOST_MIN_DELAY,
+            priority_mode=config.PRIORITY_MODE,
+            priority_weights=config.PRIORITY_WEIGHTS
+        )
+        # 取り出して未完了のタスク
+        self.claimed: Set[str] = set()
+        self.completed = 0
+        self._released: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """ワーカーを開始する"""
+        self._released = asyncio.Event()
+        await self.scheduler.start()
+        self._tasks = [
+            asyncio.create_task(self._fetch_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+        logger.info(f"ワーカーを開始しました: {self.worker_id} (同時実行数: {self.concurrency})")
+
+    async def stop(self):
+        """ワーカーを停止する（未完了のタスクはキューに戻し、他のワーカーが再実行する）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.scheduler.stop()
+        await self.queue.release(self.worker_id)
+        logger.info(f"ワーカーを停止しました: {self.worker_id}")
+
+    async def _run(self, job: ScrapeJob):
+        """ジョブを実行し、終わったらキューから削除する"""
+        finished = False
+        try:
+            await self.runner(job)
+            finished = True
+        finally:
+            self.claimed.discard(job.task_id)
+            # 停止による中断の場合はキューに残して再実行させる
+            if finished or job.cancelled:
+                await self._complete(job.task_id)
+            self._released.set()
+
+    async def _complete(self, task_id: str):
+        """結果を書き込んでからキューから削除する"""
+        if self.persist:
+            try:
+                # 書き込む前に停止すると、キューにもタスクストアにも完了が残らないため先に書き込む
+                await self.persist()
+            except Exception as e:
+                # キューに残し、ハートビートの途絶後に再実行させる
+                logger.error(f"タスク結果の書き込みに失敗したためキューに残します: {task_id}: {str(e)}")
+                return
+        self.completed += 1
+        await self.queue.complete(self.worker_id, task_id)
+
+    async def _fetch_loop(self):
+        """空きがある間キューからタスクを取り出してスケジューラに渡す"""
+        while True:
+            try:
+                tasks = await self.queue.claim(self.worker_id, self.prefetch - len(self.claimed))
+            except Exception as e:
+                logger.error(f"タスクの取り出しに失敗: {str(e)}")
+                tasks = []
+            for task_id, request in tasks:
+                self.claimed.add(task_id)
+                await self.scheduler.submit(task_id, ScrapingRequest(**request))
+            if tasks:
+                continue
+
+            # タスクの完了か一定時間の経過を待つ
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat_loop(self):
+        """取り出したタスクの保持を延長し、途絶えた他のワーカーのタスクをキューに戻す"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                lost = await self.queue.heartbeat(self.worker_id, list(self.claimed))
+                for task_id in lost:
+                    # キャンセルされたか、他のワーカーに移ったタスクは実行をやめる
+                    self.claimed.discard(task_id)
+                    await self.scheduler.cancel(task_id)
+                for task_id in await self.queue.requeue_stale(self.stale_timeout, self.max_attempts):
+                    await self.on_dropped(task_id)
+            except Exception as e:
+                logger.error(f"ハートビートに失敗: {str(e)}")
+
+    def stats(self):
+        """ワーカーの統計情報を返す"""
+        return {
+            "worker_id": self.worker_id,
+            "claimed": len(self.claimed),
+            "completed": self.completed,
+            "scheduler": self.scheduler.stats(),
+        }
+
+
+async def serve():
+    """ワーカープロセスとして実行する"""
+    # APIサーバーと同じスクレイピング処理（プロファイル・HAR・変更検知を含む）を使う
+    from . import main
+
+    if config.QUEUE_BACKEND != "sqlite" or config.TASK_STORE != "sqlite":
+        raise SystemExit(
+            "ワーカープロセスには PLAYWRIGHT_API_QUEUE=sqlite と PLAYWRIGHT_API_TASK_STORE=sqlite が必要です"
+        )
+    try:
+        main.check_shared_storage()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
+    main.loop_monitor.start()
+    await main.scraper.initialize()
+    await main.task_store.start()
+    await main.task_queue.start()
+    worker = main.create_worker()
+    await worker.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    await worker.stop()
+    await main.task_queue.close()
+    await main.task_store.close()
+    await main.scraper.close()
+    await main.loop_monitor.stop()
+    main.post_processor.close()
+    main.change_index.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
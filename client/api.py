@@ -5,29 +5,148 @@ PlaywrightAPIを簡単に利用するためのクライアント実装
 """
 
 import json
+import os
 import time
-from typing import Dict, Any, Optional, List, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait as wait_futures, FIRST_COMPLETED
+from typing import (
+    Dict, Any, Optional, List, Union, Iterable, Iterator, AsyncIterable, AsyncIterator, Set, Callable, Awaitable
+)
 
 import aiohttp
 import requests
 import asyncio
+from requests.adapters import HTTPAdapter
 
 from loguru import logger
 
+from .result import LazyResult
+from .retry import RetryPolicy, parse_retry_after, poll_intervals
+
+# ファイルへの書き込みの単位（バイト）
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def _iterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    """同期・非同期どちらのイテラブルも1件ずつ取り出す"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
 
 class PlayScraperClient:
     """PlaywrightAPIクライアントクラス"""
 
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8001",
+        connection_limit: int = 100,
+        connection_limit_per_host: int = 32,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        retry_policy: Optional[RetryPolicy] = None,
+        request_timeout: float = 30.0,
+        connect_timeout: Optional[float] = 5.0,
+        pool_maxsize: int = 32,
+        pool_block: bool = True
+    ):
         """
         クライアントの初期化
         
+        非同期APIは全てのユーザーで1つのセッション（コネクションプール）を共有します。
+        ユーザーIDはリクエストヘッダ（X-User-Id）とリクエスト数の集計にだけ使われます。
+        
+        同期APIは複数のスレッドから同時に呼び出すことができ、全てのスレッドで
+        pool_maxsize 本までの接続を持つ1つのコネクションプールを共有します。
+        
         Args:
             base_url: APIのベースURL
+            connection_limit: 非同期APIの同時接続数の上限（0の場合は無制限）
+            connection_limit_per_host: 非同期APIのホストごとの同時接続数の上限（0の場合は無制限）
+            keepalive_timeout: 使用していない接続を保持する秒数
+            dns_cache_ttl: DNSの解決結果をキャッシュする秒数
+            retry_policy: 一時的なエラーの再試行の方針（冪等な呼び出しのみ再試行する）
+            request_timeout: 1回のリクエストのタイムアウト（秒）
+            connect_timeout: 接続のタイムアウト（秒。Noneの場合は request_timeout のみ）
+            pool_maxsize: 同期APIのコネクションプールに保持する接続の数
+            pool_block: 同期APIの接続が全て使用中の場合に空くまで待つかどうか
+                （Falseの場合はプールに戻さない一時的な接続を作成する）
         """
         self.base_url = base_url.rstrip("/")
-        self.session = requests.Session()
-        self._asyncio_sessions = {}  # 非同期セッションを保持する辞書（ユーザーIDをキーにする）
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.connect_timeout = connect_timeout
+        self.session = self._create_session()
+        self._session_lock = threading.Lock()
+        self._last_request = time.monotonic()
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.request_timeout = request_timeout
+        # 再試行した回数
+        self.retries = 0
+        self._retries_lock = threading.Lock()
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+        # ユーザーIDごとの非同期リクエスト数
+        self.requests_by_user: Dict[str, int] = {}
+        # サーバーがバッチ投入（POST /scrape/batch）に対応しているか（未確認の場合はNone）
+        self._batch_supported: Optional[bool] = None
+    
+    def __enter__(self) -> "PlayScraperClient":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    async def __aenter__(self) -> "PlayScraperClient":
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close_async_sessions()
+    
+    def close(self):
+        """同期APIのセッションを閉じる"""
+        self.session.close()
+    
+    def _create_session(self) -> requests.Session:
+        """スレッド間で共有する同期APIのセッションを作成する"""
+        session = requests.Session()
+        # 再試行は _request で行うため、アダプタでは再試行しない
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def _sync_session(self) -> requests.Session:
+        """
+        同期APIのセッションを取得
+        
+        keepalive_timeout 秒以上リクエストしなかった場合は、サーバー側で閉じられている
+        可能性のある接続を使わないようプールを空にする
+        """
+        with self._session_lock:
+            now = time.monotonic()
+            if now - self._last_request > self.keepalive_timeout:
+                for adapter in self.session.adapters.values():
+                    adapter.poolmanager.clear()
+            self._last_request = now
+        return self.session
+    
+    def _request_timeout(self) -> Any:
+        """requests に渡すタイムアウト（接続, 読み込み）"""
+        if self.connect_timeout is None:
+            return self.request_timeout
+        return (self.connect_timeout, self.request_timeout)
+    
+    def _count_retry(self):
+        with self._retries_lock:
+            self.retries += 1
     
     def check_status(self) -> Dict[str, Any]:
         """
@@ -37,25 +156,53 @@ class PlayScraperClient:
             APIの状態情報
         """
         logger.info(f"APIの状態を確認中: {self.base_url}")
-        response = self.session.get(f"{self.base_url}/")
-        response.raise_for_status()
-        return response.json()
+        return self._request("GET", "/")
     
     async def check_status_async(self, user_id: str = "default") -> Dict[str, Any]:
         """
         APIの状態を非同期で確認
         
         Args:
-            user_id: ユーザーID（セッション管理用）
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
             
         Returns:
             APIの状態情報
         """
         logger.info(f"APIの状態を非同期で確認中: {self.base_url} (ユーザー: {user_id})")
-        session = await self._get_async_session(user_id)
-        async with session.get(f"{self.base_url}/") as response:
-            response.raise_for_status()
-            return await response.json()
+        return await self._request_async("GET", "/", user_id)
+    
+    @staticmethod
+    def _scrape_payload(
+        url: str,
+        selectors: Optional[Dict[str, Any]] = None,
+        actions: Optional[List[Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        save_html_file: bool = False,
+        html_output_dir: str = "output/html",
+        session_profile: Optional[str] = None,
+        priority: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """スクレイピングリクエストのペイロードを作成する"""
+        payload = {
+            "url": url,
+            "save_html_file": save_html_file,
+            "html_output_dir": html_output_dir
+        }
+        
+        if selectors:
+            logger.debug(f"セレクタ: {selectors}")
+            payload["selectors"] = selectors
+        if actions:
+            logger.debug(f"アクション: {len(actions)}個")
+            payload["actions"] = actions
+        if options:
+            logger.debug(f"オプション: {options}")
+            payload["options"] = options
+        if session_profile:
+            payload["session_profile"] = session_profile
+        if priority:
+            payload["priority"] = priority
+        return payload
     
     def start_scraping(
         self,
@@ -64,7 +211,9 @@ class PlayScraperClient:
         actions: Optional[List[Dict[str, Any]]] = None,
         options: Optional[Dict[str, Any]] = None,
         save_html_file: bool = False,
-        html_output_dir: str = "output/html"
+        html_output_dir: str = "output/html",
+        session_profile: Optional[str] = None,
+        priority: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         スクレイピングタスクを開始
@@ -76,36 +225,22 @@ class PlayScraperClient:
             options: スクレイピングオプション
             save_html_file: HTMLをファイルとして保存するかどうか
             html_output_dir: HTMLファイルを保存するディレクトリ
+            session_profile: ログイン状態を再利用するセッションプロファイル名
+            priority: タスクの優先度（high, normal, low。省略時はサーバーの既定値）
             
         Returns:
             タスクID情報
         """
         logger.info(f"スクレイピングリクエスト準備: {url}")
         
-        payload = {
-            "url": url,
-            "save_html_file": save_html_file,
-            "html_output_dir": html_output_dir
-        }
-        
-        if selectors:
-            logger.debug(f"セレクタ: {selectors}")
-            payload["selectors"] = selectors
-        if actions:
-            logger.debug(f"アクション: {len(actions)}個")
-            payload["actions"] = actions
-        if options:
-            logger.debug(f"オプション: {options}")
-            payload["options"] = options
+        payload = self._scrape_payload(
+            url, selectors, actions, options, save_html_file, html_output_dir, session_profile, priority
+        )
         
         logger.info("スクレイピングリクエスト送信中...")
         logger.debug(f"リクエストペイロード: {payload}")
-        response = self.session.post(
-            f"{self.base_url}/scrape",
-            json=payload
-        )
-        response.raise_for_status()
-        result = response.json()
+        # タスクが重複して作成されないよう再試行しない
+        result = self._request("POST", "/scrape", idempotent=False, json=payload)
         logger.success(f"タスク作成成功: {result['task_id']}")
         return result
     
@@ -117,7 +252,9 @@ class PlayScraperClient:
         options: Optional[Dict[str, Any]] = None,
         save_html_file: bool = False,
         html_output_dir: str = "output/html",
-        user_id: str = "default"
+        user_id: str = "default",
+        session_profile: Optional[str] = None,
+        priority: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         スクレイピングタスクを非同期で開始
@@ -129,102 +266,373 @@ class PlayScraperClient:
             options: スクレイピングオプション
             save_html_file: HTMLをファイルとして保存するかどうか
             html_output_dir: HTMLファイルを保存するディレクトリ
-            user_id: ユーザーID（セッション管理用）
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            session_profile: ログイン状態を再利用するセッションプロファイル名
+            priority: タスクの優先度（high, normal, low。省略時はサーバーの既定値）
             
         Returns:
             タスクID情報
         """
         logger.info(f"非同期スクレイピングリクエスト準備: {url} (ユーザー: {user_id})")
         
-        payload = {
-            "url": url,
-            "save_html_file": save_html_file,
-            "html_output_dir": html_output_dir
-        }
-        
-        if selectors:
-            logger.debug(f"セレクタ: {selectors}")
-            payload["selectors"] = selectors
-        if actions:
-            logger.debug(f"アクション: {len(actions)}個")
-            payload["actions"] = actions
-        if options:
-            logger.debug(f"オプション: {options}")
-            payload["options"] = options
+        payload = self._scrape_payload(
+            url, selectors, actions, options, save_html_file, html_output_dir, session_profile, priority
+        )
         
         logger.info(f"非同期スクレイピングリクエスト送信中... (ユーザー: {user_id})")
         logger.debug(f"リクエストペイロード: {payload}")
         
-        session = await self._get_async_session(user_id)
-        async with session.post(
-            f"{self.base_url}/scrape",
-            json=payload
-        ) as response:
-            response.raise_for_status()
-            result = await response.json()
-            logger.success(f"タスク作成成功: {result['task_id']} (ユーザー: {user_id})")
-            return result
+        # タスクが重複して作成されないよう再試行しない
+        result = await self._request_async("POST", "/scrape", user_id, idempotent=False, json=payload)
+        logger.success(f"タスク作成成功: {result['task_id']} (ユーザー: {user_id})")
+        return result
     
-    def get_task_status(self, task_id: str) -> Dict[str, Any]:
+    def get_task_status(self, task_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         タスクのステータスを取得
         
         Args:
             task_id: タスクID
+            fields: 取得する結果の項目（例: ["data", "errors"]）。Noneの場合は全ての項目
             
         Returns:
-            タスクのステータス情報
+            タスクのステータス情報（fields を指定した場合、result は LazyResult）
         """
         logger.debug(f"タスクステータス確認: {task_id}")
-        response = self.session.get(f"{self.base_url}/status/{task_id}")
-        response.raise_for_status()
-        return response.json()
+        status = self._request("GET", f"/status/{task_id}", params=self._fields_params(fields))
+        return self._wrap_result(task_id, status, fields)
     
-    async def get_task_status_async(self, task_id: str, user_id: str = "default") -> Dict[str, Any]:
+    async def get_task_status_async(
+        self, task_id: str, user_id: str = "default", fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         タスクのステータスを非同期で取得
         
         Args:
             task_id: タスクID
-            user_id: ユーザーID（セッション管理用）
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            fields: 取得する結果の項目（例: ["data", "errors"]）。Noneの場合は全ての項目
             
         Returns:
-            タスクのステータス情報
+            タスクのステータス情報（fields を指定した場合、result は LazyResult）
         """
         logger.debug(f"非同期タスクステータス確認: {task_id} (ユーザー: {user_id})")
-        session = await self._get_async_session(user_id)
-        async with session.get(f"{self.base_url}/status/{task_id}") as response:
-            response.raise_for_status()
-            return await response.json()
+        status = await self._request_async(
+            "GET", f"/status/{task_id}", user_id, params=self._fields_params(fields)
+        )
+        return self._wrap_result(task_id, status, fields)
+    
+    @staticmethod
+    def _fields_params(fields: Optional[List[str]]) -> Optional[Dict[str, str]]:
+        """結果の項目を指定するクエリパラメータ"""
+        return {"fields": ",".join(fields)} if fields is not None else None
+    
+    def _wrap_result(self, task_id: str, status: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+        """fields を指定して取得した結果を、除いた項目を後から取得できる LazyResult にする"""
+        if fields is not None and status.get("result") is not None:
+            status["result"] = LazyResult(self, task_id, status["result"], frozenset(fields))
+        return status
+    
+    def get_task_html(self, task_id: str) -> Optional[str]:
+        """
+        完了したタスクのHTMLを取得
+        
+        Args:
+            task_id: タスクID
+            
+        Returns:
+            HTML（取得していない場合はNone）
+        """
+        try:
+            return self._request("GET", f"/tasks/{task_id}/html", read=lambda response: response.text)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+    
+    async def get_task_html_async(self, task_id: str, user_id: str = "default") -> Optional[str]:
+        """
+        完了したタスクのHTMLを非同期で取得
+        
+        Args:
+            task_id: タスクID
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            
+        Returns:
+            HTML（取得していない場合はNone）
+        """
+        try:
+            return await self._request_async(
+                "GET", f"/tasks/{task_id}/html", user_id, read=lambda response: response.text()
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+    
+    def get_task_screenshot(self, task_id: str) -> Optional[bytes]:
+        """
+        完了したタスクのスクリーンショットを画像のバイト列で取得
+        
+        Args:
+            task_id: タスクID
+            
+        Returns:
+            画像（取得していない場合はNone）
+        """
+        try:
+            return self._request("GET", f"/tasks/{task_id}/screenshot", read=lambda response: response.content)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+    
+    async def get_task_screenshot_async(self, task_id: str, user_id: str = "default") -> Optional[bytes]:
+        """
+        完了したタスクのスクリーンショットを画像のバイト列で非同期に取得
+        
+        Args:
+            task_id: タスクID
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            
+        Returns:
+            画像（取得していない場合はNone）
+        """
+        try:
+            return await self._request_async(
+                "GET", f"/tasks/{task_id}/screenshot", user_id, read=lambda response: response.read()
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+    
+    def download_screenshot(self, task_id: str, filepath: str) -> Optional[str]:
+        """
+        完了したタスクのスクリーンショットを、受信しながらファイルに書き込む
+        
+        Args:
+            task_id: タスクID
+            filepath: 保存先のファイルパス
+            
+        Returns:
+            保存したファイルのパス（スクリーンショットが無い場合はNone）
+        """
+        def read(response: requests.Response) -> str:
+            os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+            with open(filepath, "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            return filepath
+        
+        try:
+            return self._request("GET", f"/tasks/{task_id}/screenshot", read=read, stream=True)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+    
+    async def download_screenshot_async(self, task_id: str, filepath: str, user_id: str = "default") -> Optional[str]:
+        """
+        完了したタスクのスクリーンショットを、受信しながら非同期でファイルに書き込む
+        
+        Args:
+            task_id: タスクID
+            filepath: 保存先のファイルパス
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            
+        Returns:
+            保存したファイルのパス（スクリーンショットが無い場合はNone）
+        """
+        async def read(response: aiohttp.ClientResponse) -> str:
+            loop = asyncio.get_running_loop()
+            os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+            with open(filepath, "wb") as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    # ディスクへの書き込みでイベントループを止めない
+                    await loop.run_in_executor(None, f.write, chunk)
+            return filepath
+        
+        try:
+            return await self._request_async("GET", f"/tasks/{task_id}/screenshot", user_id, read=read)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
     
-    def wait_for_completion(self, task_id: str, interval: float = 1.0, timeout: float = 60.0) -> Dict[str, Any]:
+    def get_task_statuses(
+        self,
+        task_ids: Optional[List[str]] = None,
+        batch_id: Optional[str] = None,
+        since: Optional[float] = None,
+        include_results: bool = False,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        複数のタスクのステータスをまとめて取得
+        
+        Args:
+            task_ids: タスクIDのリスト
+            batch_id: バッチID（バッチ内の全タスクが対象）
+            since: 前回のレスポンスの cursor（それ以降に更新されたタスクだけを取得する）
+            include_results: 完了したタスクのスクレイピング結果を含めるかどうか
+            fields: include_results で取得する結果の項目（result は LazyResult になる）
+            
+        Returns:
+            ステータスのリスト（tasks）、ステータスごとの件数（counts）、次回の since に指定する cursor
+        """
+        logger.debug(f"タスクステータス一括確認: {len(task_ids or [])}件" + (f" (バッチ: {batch_id})" if batch_id else ""))
+        response = self._request("POST", "/status/batch", json={
+            "task_ids": task_ids, "batch_id": batch_id, "since": since,
+            "include_results": include_results, "fields": fields
+        })
+        for task in response["tasks"]:
+            self._wrap_result(task["task_id"], task, fields)
+        return response
+    
+    async def get_task_statuses_async(
+        self,
+        task_ids: Optional[List[str]] = None,
+        batch_id: Optional[str] = None,
+        since: Optional[float] = None,
+        include_results: bool = False,
+        user_id: str = "default",
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        複数のタスクのステータスを非同期でまとめて取得
+        
+        Args:
+            task_ids: タスクIDのリスト
+            batch_id: バッチID（バッチ内の全タスクが対象）
+            since: 前回のレスポンスの cursor（それ以降に更新されたタスクだけを取得する）
+            include_results: 完了したタスクのスクレイピング結果を含めるかどうか
+            fields: include_results で取得する結果の項目（result は LazyResult になる）
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            
+        Returns:
+            ステータスのリスト（tasks）、ステータスごとの件数（counts）、次回の since に指定する cursor
+        """
+        logger.debug(f"非同期タスクステータス一括確認: {len(task_ids or [])}件 (ユーザー: {user_id})")
+        # 読み取りのみのため再試行できる
+        response = await self._request_async("POST", "/status/batch", user_id, json={
+            "task_ids": task_ids, "batch_id": batch_id, "since": since,
+            "include_results": include_results, "fields": fields
+        })
+        for task in response["tasks"]:
+            self._wrap_result(task["task_id"], task, fields)
+        return response
+    
+    def cancel_task(self, task_id: str) -> Dict[str, Any]:
+        """
+        タスクをキャンセル
+        
+        Args:
+            task_id: タスクID
+            
+        Returns:
+            キャンセル後のタスクのステータス情報
+        """
+        logger.info(f"タスクをキャンセル: {task_id}")
+        return self._request("DELETE", f"/tasks/{task_id}")
+    
+    async def cancel_task_async(self, task_id: str, user_id: str = "default") -> Dict[str, Any]:
+        """
+        タスクを非同期でキャンセル
+        
+        Args:
+            task_id: タスクID
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            
+        Returns:
+            キャンセル後のタスクのステータス情報
+        """
+        logger.info(f"非同期でタスクをキャンセル: {task_id} (ユーザー: {user_id})")
+        return await self._request_async("DELETE", f"/tasks/{task_id}", user_id)
+    
+    def cancel_tasks(
+        self,
+        task_ids: Optional[List[str]] = None,
+        batch_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        複数のタスクをまとめてキャンセル
+        
+        Args:
+            task_ids: キャンセルするタスクIDのリスト
+            batch_id: キャンセルするバッチID
+            
+        Returns:
+            キャンセルされたタスクIDとキャンセルされなかったタスクIDのリスト
+        """
+        logger.info(f"タスクを一括キャンセル: {len(task_ids or [])}件" + (f" (バッチ: {batch_id})" if batch_id else ""))
+        # キャンセルは繰り返しても結果が変わらないため再試行できる
+        return self._request("POST", "/tasks/cancel", json={"task_ids": task_ids, "batch_id": batch_id})
+    
+    async def cancel_tasks_async(
+        self,
+        task_ids: Optional[List[str]] = None,
+        batch_id: Optional[str] = None,
+        user_id: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        複数のタスクを非同期でまとめてキャンセル
+        
+        Args:
+            task_ids: キャンセルするタスクIDのリスト
+            batch_id: キャンセルするバッチID
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            
+        Returns:
+            キャンセルされたタスクIDとキャンセルされなかったタスクIDのリスト
+        """
+        logger.info(f"非同期でタスクを一括キャンセル: {len(task_ids or [])}件 (ユーザー: {user_id})")
+        return await self._request_async(
+            "POST", "/tasks/cancel", user_id, json={"task_ids": task_ids, "batch_id": batch_id}
+        )
+    
+    def wait_for_completion(
+        self,
+        task_id: str,
+        interval: float = 1.0,
+        timeout: float = 60.0,
+        cancel_on_timeout: bool = False,
+        max_interval: float = 10.0,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         タスクの完了を待機
         
         Args:
             task_id: タスクID
-            interval: ステータス確認の間隔（秒）
+            interval: 最初のステータス確認の間隔（秒）
             timeout: タイムアウト時間（秒）
+            cancel_on_timeout: タイムアウト時にサーバー側のタスクをキャンセルするかどうか
+            max_interval: ステータス確認の間隔の上限（秒）。確認のたびに間隔を広げ、この値で止める
+            fields: 取得する結果の項目（Noneの場合は全ての項目）
             
         Returns:
             完了したタスクの結果
             
         Raises:
             TimeoutError: タイムアウト時間を超えた場合
-            RuntimeError: タスクが失敗した場合
+            RuntimeError: タスクが失敗またはキャンセルされた場合
         """
         start_time = time.time()
         logger.info(f"タスク {task_id} の完了を待機中...")
         
         progress_chars = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
         progress_idx = 0
+        intervals = poll_intervals(interval, max_interval)
         
         while True:
             if time.time() - start_time > timeout:
                 logger.error(f"タイムアウト: {timeout}秒経過")
+                if cancel_on_timeout:
+                    self.cancel_task(task_id)
                 raise TimeoutError(f"タスク {task_id} がタイムアウトしました")
             
-            status = self.get_task_status(task_id)
+            status = self.get_task_status(task_id, fields)
             status_text = status["status"]
             
             # 進捗表示
@@ -241,41 +649,55 @@ class PlayScraperClient:
                 error_msg = status.get("error", "不明なエラー")
                 logger.error(f"タスク失敗: {error_msg}")
                 raise RuntimeError(f"タスク {task_id} が失敗しました: {error_msg}")
+            elif status_text == "cancelled":
+                print("\n")
+                logger.warning(f"タスクはキャンセルされました: {task_id}")
+                raise RuntimeError(f"タスク {task_id} はキャンセルされました")
             
-            time.sleep(interval)
+            # タイムアウトの時刻を越えて待たない
+            time.sleep(min(next(intervals), max(0.0, start_time + timeout - time.time())))
     
     async def wait_for_completion_async(
         self, 
         task_id: str, 
         interval: float = 1.0, 
         timeout: float = 60.0,
-        user_id: str = "default"
+        user_id: str = "default",
+        cancel_on_timeout: bool = False,
+        max_interval: float = 10.0,
+        fields: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         タスクの完了を非同期で待機
         
         Args:
             task_id: タスクID
-            interval: ステータス確認の間隔（秒）
+            interval: 最初のステータス確認の間隔（秒）
             timeout: タイムアウト時間（秒）
-            user_id: ユーザーID（セッション管理用）
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            cancel_on_timeout: タイムアウト時にサーバー側のタスクをキャンセルするかどうか
+            max_interval: ステータス確認の間隔の上限（秒）。確認のたびに間隔を広げ、この値で止める
+            fields: 取得する結果の項目（Noneの場合は全ての項目）
             
         Returns:
             完了したタスクの結果
             
         Raises:
             TimeoutError: タイムアウト時間を超えた場合
-            RuntimeError: タスクが失敗した場合
+            RuntimeError: タスクが失敗またはキャンセルされた場合
         """
         start_time = time.time()
         logger.info(f"非同期タスク {task_id} の完了を待機中... (ユーザー: {user_id})")
+        intervals = poll_intervals(interval, max_interval)
         
         while True:
             if time.time() - start_time > timeout:
                 logger.error(f"タイムアウト: {timeout}秒経過")
+                if cancel_on_timeout:
+                    await self.cancel_task_async(task_id, user_id)
                 raise TimeoutError(f"タスク {task_id} がタイムアウトしました")
             
-            status = await self.get_task_status_async(task_id, user_id)
+            status = await self.get_task_status_async(task_id, user_id, fields)
             status_text = status["status"]
             
             elapsed = time.time() - start_time
@@ -288,30 +710,492 @@ class PlayScraperClient:
                 error_msg = status.get("error", "不明なエラー")
                 logger.error(f"タスク失敗: {error_msg}")
                 raise RuntimeError(f"タスク {task_id} が失敗しました: {error_msg}")
+            elif status_text == "cancelled":
+                logger.warning(f"タスクはキャンセルされました: {task_id}")
+                raise RuntimeError(f"タスク {task_id} はキャンセルされました")
+            
+            # タイムアウトの時刻を越えて待たない
+            await asyncio.sleep(min(next(intervals), max(0.0, start_time + timeout - time.time())))
+    
+    async def start_batch_scraping_async(
+        self,
+        requests: List[Dict[str, Any]],
+        priority: Optional[str] = None,
+        user_id: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        複数のスクレイピングタスクを1回のリクエストでまとめて開始
+        
+        Args:
+            requests: スクレイピングリクエストのペイロードのリスト
+            priority: 個別に優先度が指定されていないリクエストに適用する優先度
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
             
-            await asyncio.sleep(interval)
+        Returns:
+            バッチIDとタスクIDのリスト
+        """
+        logger.info(f"非同期バッチスクレイピングリクエスト送信中: {len(requests)}件 (ユーザー: {user_id})")
+        payload: Dict[str, Any] = {"requests": requests}
+        if priority:
+            payload["priority"] = priority
+        return await self._request_async("POST", "/scrape/batch", user_id, idempotent=False, json=payload)
+    
+    def scrape_many(
+        self,
+        urls: Iterable[str],
+        selectors: Optional[Dict[str, Any]] = None,
+        actions: Optional[List[Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        concurrency: int = 10,
+        retries: int = 2,
+        priority: Optional[str] = "low",
+        session_profile: Optional[str] = None,
+        interval: float = 1.0,
+        timeout: float = 300.0,
+        max_interval: float = 10.0,
+        fields: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        複数のURLをスレッドプールで並行してスクレイピングし、完了した順に結果を返す
+        
+        scrape_many_async の同期版です。処理中のURLは concurrency 件までに制限され、
+        各スレッドはクライアントのコネクションプールを共有します（concurrency は pool_maxsize 以下を推奨）。
+        途中でイテレーションをやめた場合は、処理中のタスクをサーバー側でもキャンセルします。
+        
+        Args:
+            urls: スクレイピング対象のURL
+            selectors: 抽出するデータのセレクタマップ
+            actions: スクレイピング前に実行するアクション
+            options: スクレイピングオプション
+            concurrency: 同時に処理するURLの最大数（スレッド数）
+            retries: 失敗・タイムアウトしたURLを再投入する回数
+            priority: タスクの優先度（high, normal, low）
+            session_profile: ログイン状態を再利用するセッションプロファイル名
+            interval: 最初のステータス確認の間隔（秒）
+            timeout: 1回の試行のタイムアウト時間（秒）
+            max_interval: ステータス確認の間隔の上限（秒）
+            fields: 取得する結果の項目（例: ["data", "errors"]。除いたHTML・スクリーンショットは参照時に取得する）
+            
+        Yields:
+            URLごとの結果（url, task_id, status, attempts と、result または error）。
+            status は completed, failed, cancelled, timeout, error のいずれか
+        """
+        stop = threading.Event()
+        # 打ち切りにより完了を待たなかったタスク
+        abandoned: List[str] = []
+        abandoned_lock = threading.Lock()
+        
+        def wait(task_id: str) -> Optional[Dict[str, Any]]:
+            """タスクが終了するまでステータスを確認する（打ち切られた場合はNone）"""
+            deadline = time.monotonic() + timeout
+            intervals = poll_intervals(interval, max_interval)
+            while True:
+                status = self.get_task_status(task_id, fields)
+                if status["status"] in ("completed", "failed", "cancelled"):
+                    return status
+                if time.monotonic() > deadline:
+                    self.cancel_task(task_id)
+                    return {"status": "timeout", "error": f"{timeout}秒以内に完了しませんでした"}
+                if stop.wait(min(next(intervals), max(0.0, deadline - time.monotonic()))):
+                    return None
+        
+        def complete(url: str) -> Optional[Dict[str, Any]]:
+            """1件の完了を待ち、失敗した場合は再投入する"""
+            attempt = 1
+            while True:
+                item: Dict[str, Any] = {"url": url, "task_id": None, "attempts": attempt}
+                try:
+                    task_id = self.start_scraping(
+                        **self._scrape_payload(
+                            url, selectors, actions, options, session_profile=session_profile, priority=priority
+                        )
+                    )["task_id"]
+                    item["task_id"] = task_id
+                    status = wait(task_id)
+                    if status is None:
+                        with abandoned_lock:
+                            abandoned.append(task_id)
+                        return None
+                    item["status"] = status["status"]
+                    if status.get("result") is not None:
+                        item["result"] = status["result"]
+                    if status.get("error") is not None:
+                        item["error"] = status["error"]
+                except requests.RequestException as e:
+                    item["status"] = "error"
+                    item["error"] = str(e) or type(e).__name__
+                if item["status"] in ("completed", "cancelled") or attempt > retries or stop.is_set():
+                    return item
+                logger.warning(f"再投入します ({attempt}/{retries}): {url}: {item.get('error')}")
+                attempt += 1
+        
+        url_iter = iter(urls)
+        exhausted = False
+        pending: Set[Future] = set()
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape-many")
+        try:
+            while True:
+                # 処理中のURLが上限に達するまで投入する
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        url = next(url_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(complete, url))
+                if not pending:
+                    break
+                done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = future.result()
+                    if item is not None:
+                        yield item
+        finally:
+            stop.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if abandoned:
+                # 途中で打ち切られた場合は処理中のタスクをサーバー側でもキャンセルする
+                try:
+                    self.cancel_tasks(abandoned)
+                except Exception as e:
+                    logger.warning(f"処理中のタスクのキャンセルに失敗: {str(e)}")
+    
+    async def scrape_many_async(
+        self,
+        urls: Union[Iterable[str], AsyncIterable[str]],
+        selectors: Optional[Dict[str, Any]] = None,
+        actions: Optional[List[Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        concurrency: int = 10,
+        retries: int = 2,
+        batch_size: int = 0,
+        priority: Optional[str] = "low",
+        session_profile: Optional[str] = None,
+        interval: float = 1.0,
+        timeout: float = 300.0,
+        user_id: str = "default",
+        max_interval: float = 10.0,
+        fields: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        複数のURLを同時実行数を制限してスクレイピングし、完了した順に結果を返す
+        
+        urls はジェネレータなどで少しずつ渡すことができ、処理中のURLは concurrency 件までに制限されます。
+        結果の受け取りが遅れている間は新しいURLを投入しないため、大量のURLでもメモリ使用量は一定です。
+        
+        Args:
+            urls: スクレイピング対象のURL（同期・非同期のイテラブル）
+            selectors: 抽出するデータのセレクタマップ
+            actions: スクレイピング前に実行するアクション
+            options: スクレイピングオプション
+            concurrency: 同時に処理するURLの最大数
+            retries: 失敗・タイムアウトしたURLを再投入する回数
+            batch_size: 2以上の場合、この件数（concurrency まで）ずつ POST /scrape/batch でまとめて投入する
+            priority: タスクの優先度（high, normal, low）
+            session_profile: ログイン状態を再利用するセッションプロファイル名
+            interval: 最初のステータス確認の間隔（秒）
+            timeout: 1回の試行のタイムアウト時間（秒）
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            max_interval: ステータス確認の間隔の上限（秒）
+            fields: 取得する結果の項目（例: ["data", "errors"]。除いたHTML・スクリーンショットは参照時に取得する）
+            
+        Yields:
+            URLごとの結果（url, task_id, status, attempts と、result または error）。
+            status は completed, failed, cancelled, timeout, error のいずれか
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        waiters: Set[asyncio.Task] = set()
+        active: Set[str] = set()
+        chunk_size = min(batch_size, concurrency) if batch_size > 1 else 1
+        
+        def payload(url: str) -> Dict[str, Any]:
+            return self._scrape_payload(
+                url, selectors, actions, options, session_profile=session_profile, priority=priority
+            )
+        
+        async def wait(task_id: str) -> Dict[str, Any]:
+            """タスクが終了するまでステータスを確認する"""
+            deadline = time.monotonic() + timeout
+            intervals = poll_intervals(interval, max_interval)
+            while True:
+                status = await self.get_task_status_async(task_id, user_id, fields)
+                if status["status"] in ("completed", "failed", "cancelled"):
+                    return status
+                if time.monotonic() > deadline:
+                    await self.cancel_task_async(task_id, user_id)
+                    return {"status": "timeout", "error": f"{timeout}秒以内に完了しませんでした"}
+                await asyncio.sleep(min(next(intervals), max(0.0, deadline - time.monotonic())))
+        
+        async def complete(url: str, task_id: Optional[str]):
+            """1件の完了を待ち、失敗した場合は再投入して結果を渡す"""
+            try:
+                attempt = 1
+                while True:
+                    item: Dict[str, Any] = {"url": url, "task_id": task_id, "attempts": attempt}
+                    try:
+                        if task_id is None:
+                            task_id = (await self.start_scraping_async(**payload(url), user_id=user_id))["task_id"]
+                            item["task_id"] = task_id
+                        active.add(task_id)
+                        status = await wait(task_id)
+                        item["status"] = status["status"]
+                        if status.get("result") is not None:
+                            item["result"] = status["result"]
+                        if status.get("error") is not None:
+                            item["error"] = status["error"]
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        item["status"] = "error"
+                        item["error"] = str(e) or type(e).__name__
+                    finally:
+                        active.discard(task_id)
+                    if item["status"] in ("completed", "cancelled") or attempt > retries:
+                        break
+                    logger.warning(f"再投入します ({attempt}/{retries}): {url}: {item.get('error')}")
+                    attempt += 1
+                    task_id = None
+                await results.put(item)
+            finally:
+                semaphore.release()
+        
+        def spawn(url: str, task_id: Optional[str] = None):
+            waiter = asyncio.create_task(complete(url, task_id))
+            waiters.add(waiter)
+            waiter.add_done_callback(waiters.discard)
+        
+        async def fail(chunk: List[str], error: Exception):
+            """投入できなかったURLをエラーとして結果に渡す"""
+            for url in chunk:
+                try:
+                    await results.put({
+                        "url": url, "task_id": None, "attempts": 1,
+                        "status": "error", "error": str(error) or type(error).__name__
+                    })
+                finally:
+                    semaphore.release()
+        
+        async def submit(chunk: List[str]):
+            """
+            URLを投入する
+            
+            サーバーがバッチ投入に対応していない（404 / 405）場合だけ1件ずつ投入する。
+            タイムアウトや5xx、接続の切断ではサーバーがタスクを登録済みの可能性があり、
+            再投入すると重複するため、各URLをエラーとして返す
+            """
+            if len(chunk) > 1 and self._batch_supported is not False:
+                try:
+                    response = await self.start_batch_scraping_async(
+                        [payload(url) for url in chunk], priority=priority, user_id=user_id
+                    )
+                    self._batch_supported = True
+                    # 待機が始まる前に打ち切られてもキャンセルできるよう、投入した全てのタスクを記録する
+                    active.update(response["task_ids"])
+                    for url, task_id in zip(chunk, response["task_ids"]):
+                        spawn(url, task_id)
+                    return
+                except aiohttp.ClientResponseError as e:
+                    if e.status not in (404, 405):
+                        logger.warning(f"バッチ投入に失敗しました: {str(e)}")
+                        await fail(chunk, e)
+                        return
+                    logger.info("サーバーがバッチ投入に対応していないため1件ずつ投入します")
+                    self._batch_supported = False
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"バッチ投入に失敗しました: {str(e)}")
+                    await fail(chunk, e)
+                    return
+            for url in chunk:
+                spawn(url)
+        
+        async def produce():
+            try:
+                chunk: List[str] = []
+                async for url in _iterate(urls):
+                    # 処理中のURLが上限に達している間は待つ
+                    await semaphore.acquire()
+                    chunk.append(url)
+                    if len(chunk) >= chunk_size:
+                        await submit(chunk)
+                        chunk = []
+                if chunk:
+                    await submit(chunk)
+                while waiters:
+                    await asyncio.gather(*list(waiters))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await results.put(None)
+                raise
+            await results.put(None)
+        
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                yield item
+            # URLの読み込みで発生した例外を呼び出し元に伝える
+            await producer
+        finally:
+            unfinished = list(active)
+            producer.cancel()
+            for waiter in list(waiters):
+                waiter.cancel()
+            await asyncio.gather(producer, *list(waiters), return_exceptions=True)
+            if unfinished:
+                # 途中で打ち切られた場合は処理中のタスクをサーバー側でもキャンセルする
+                try:
+                    await self.cancel_tasks_async(unfinished, user_id=user_id)
+                except Exception as e:
+                    logger.warning(f"処理中のタスクのキャンセルに失敗: {str(e)}")
+    
+    def _request(
+        self,
+        method: str,
+        path: str,
+        idempotent: bool = True,
+        read: Optional[Callable[[requests.Response], Any]] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        同期APIでリクエストを送信し、JSONのレスポンスを返す
+        
+        一時的なエラーの場合、冪等な呼び出しは再試行の方針に従って待機してから再試行します。
+        
+        Args:
+            method: HTTPメソッド
+            path: APIのパス
+            idempotent: 繰り返しても結果が変わらない呼び出しか（Falseの場合は再試行しない）
+            read: レスポンスの本文を読み込む関数（Noneの場合はJSONとして読み込む）
+            **kwargs: requests に渡す引数
+            
+        Returns:
+            レスポンスのJSON（read を指定した場合はその戻り値）
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._sync_session().request(
+                    method, f"{self.base_url}{path}", timeout=self._request_timeout(), **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not self.retry_policy.should_retry(attempt, idempotent):
+                    raise
+                reason = str(e)
+                delay = self.retry_policy.delay(attempt)
+            else:
+                with response:
+                    if response.status_code < 400 or not self.retry_policy.should_retry(
+                        attempt, idempotent, response.status_code
+                    ):
+                        response.raise_for_status()
+                        return read(response) if read else response.json()
+                reason = f"HTTP {response.status_code}"
+                delay = self.retry_policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            self._count_retry()
+            logger.warning(f"{delay:.1f}秒後に再試行します ({attempt}/{self.retry_policy.max_attempts}): {method} {path}: {reason}")
+            time.sleep(delay)
+    
+    async def _request_async(
+        self,
+        method: str,
+        path: str,
+        user_id: str,
+        idempotent: bool = True,
+        read: Optional[Callable[[aiohttp.ClientResponse], Awaitable[Any]]] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        非同期APIでリクエストを送信し、JSONのレスポンスを返す
+        
+        一時的なエラーの場合、冪等な呼び出しは再試行の方針に従って待機してから再試行します。
+        
+        Args:
+            method: HTTPメソッド
+            path: APIのパス
+            user_id: ユーザーID（X-User-Id ヘッダとリクエスト数の集計に使う）
+            idempotent: 繰り返しても結果が変わらない呼び出しか（Falseの場合は再試行しない）
+            read: レスポンスの本文を読み込むコルーチン関数（Noneの場合はJSONとして読み込む）
+            **kwargs: aiohttp に渡す引数
+            
+        Returns:
+            レスポンスのJSON（read を指定した場合はその戻り値）
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            session = await self._get_async_session(user_id)
+            try:
+                async with session.request(
+                    method, f"{self.base_url}{path}", headers=self._user_headers(user_id), **kwargs
+                ) as response:
+                    if response.status < 400 or not self.retry_policy.should_retry(
+                        attempt, idempotent, response.status
+                    ):
+                        response.raise_for_status()
+                        return await (read(response) if read else response.json())
+                    reason = f"HTTP {response.status}"
+                    delay = self.retry_policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if not self.retry_policy.should_retry(attempt, idempotent):
+                    raise
+                reason = str(e) or type(e).__name__
+                delay = self.retry_policy.delay(attempt)
+            self._count_retry()
+            logger.warning(
+                f"{delay:.1f}秒後に再試行します ({attempt}/{self.retry_policy.max_attempts}): {method} {path}: {reason} (ユーザー: {user_id})"
+            )
+            await asyncio.sleep(delay)
     
     async def _get_async_session(self, user_id: str) -> aiohttp.ClientSession:
         """
-        ユーザーごとの非同期セッションを取得
+        共有の非同期セッションを取得
         
         Args:
-            user_id: ユーザーID
+            user_id: ユーザーID（リクエスト数の集計に使う）
             
         Returns:
-            aiohttp.ClientSession: ユーザー専用のセッション
+            aiohttp.ClientSession: 全てのユーザーで共有するセッション
         """
-        if user_id not in self._asyncio_sessions or self._asyncio_sessions[user_id].closed:
-            logger.debug(f"新しい非同期セッションを作成: ユーザー {user_id}")
-            self._asyncio_sessions[user_id] = aiohttp.ClientSession()
-        return self._asyncio_sessions[user_id]
+        self.requests_by_user[user_id] = self.requests_by_user.get(user_id, 0) + 1
+        loop = asyncio.get_running_loop()
+        if self._async_session is not None and not self._async_session.closed and self._async_session_loop is not loop:
+            # 別のイベントループで作成したセッションは使えないため作り直す
+            await self.close_async_sessions()
+        if self._async_session is None or self._async_session.closed:
+            logger.debug(f"共有の非同期セッションを作成 (同時接続数: {self.connection_limit}, ホストごと: {self.connection_limit_per_host})")
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout, sock_connect=self.connect_timeout)
+            )
+            self._async_session_loop = loop
+        return self._async_session
+    
+    @staticmethod
+    def _user_headers(user_id: str) -> Dict[str, str]:
+        """ユーザーIDを示すリクエストヘッダ"""
+        return {"X-User-Id": user_id}
     
     async def close_async_sessions(self):
         """
-        全ての非同期セッションを閉じる
+        共有の非同期セッションを閉じる
         """
-        for user_id, session in self._asyncio_sessions.items():
-            if not session.closed:
-                logger.debug(f"非同期セッションを閉じる: ユーザー {user_id}")
-                await session.close()
-        self._asyncio_sessions = {}
+        if self._async_session is not None and not self._async_session.closed:
+            logger.debug("共有の非同期セッションを閉じる")
+            try:
+                await self._async_session.close()
+            except RuntimeError:
+                # 作成したイベントループが既に終了している場合
+                pass
+        self._async_session = None
+        self._async_session_loop = None
@@ -11,8 +11,8 @@ from typing import Dict, Any, Optional, List
 
 from loguru import logger
 from .api import PlayScraperClient
-from .utils import load_json_file
-from .output import ResultHandler
+from .utils import load_json_file, iter_url_file, load_jsonl_url_keys, url_key
+from .output import ResultHandler, JsonlWriter, AsyncOutputSink
 
 
 async def async_main(args):
@@ -27,6 +27,7 @@ async def async_main(args):
     """
     # クライアントの初期化
     client = PlayScraperClient(args.api_url)
+    sink = _create_sink(args)
     
     try:
         # APIの状態確認
@@ -53,10 +54,12 @@ async def async_main(args):
                 logger.error(f"アクションファイルの読み込みに失敗: {e}")
                 return 1
         
-        # 出力ハンドラの初期化
+        # 出力ハンドラの初期化（ファイルへの書き込みは出力スレッドで行う）
         result_handler = ResultHandler(
             output_dir=args.html_dir,
-            result_file=args.output
+            result_file=args.output,
+            html_compression=args.html_compression,
+            sink=sink
         )
         
         # スクレイピングタスクの開始
@@ -71,15 +74,20 @@ async def async_main(args):
         task_id = task["task_id"]
         
         # タスクの完了を待機
-        result = await client.wait_for_completion_async(task_id, args.interval, args.timeout)
+        result = await client.wait_for_completion_async(
+            task_id, args.interval, args.timeout, cancel_on_timeout=args.cancel_on_timeout, fields=args.fields
+        )
         
         # 結果の処理
-        result_handler.process_result(result)
+        await result_handler.process_result_async(result)
         
         # HTMLとスクリーンショットの保存
         if args.save_output:
-            result_handler.save_html_content(result)
-            result_handler.save_screenshot(result)
+            await result_handler.save_html_content_async(result)
+            await result_handler.save_screenshot_async(result)
+        
+        # 書き込みの完了を待つ
+        await sink.close()
         
         # クライアントのセッションをクローズ
         await client.close_async_sessions()
@@ -93,6 +101,97 @@ async def async_main(args):
         return 1
 
 
+def _create_sink(args) -> AsyncOutputSink:
+    """コマンドライン引数のフラッシュ設定で出力先を作成する"""
+    return AsyncOutputSink(
+        flush_interval=args.flush_interval,
+        flush_every=args.flush_every,
+        fsync=args.fsync
+    )
+
+
+async def batch_main(args):
+    """
+    URLリストのファイルを一括でスクレイピングし、完了した順に JSON Lines で書き出す
+    
+    Args:
+        args: コマンドライン引数
+        
+    Returns:
+        終了コード（全てのURLが完了した場合は0）
+    """
+    try:
+        selectors = load_json_file(args.selectors) if args.selectors else None
+        actions = load_json_file(args.actions) if args.actions else None
+    except Exception as e:
+        logger.error(f"セレクタ・アクションファイルの読み込みに失敗: {e}")
+        return 1
+    
+    options = {}
+    if args.no_screenshot:
+        options["screenshot"] = False
+    if args.no_html:
+        options["html"] = False
+    
+    # 出力済みのURLを読み込み、再開時に読み飛ばす
+    done = set()
+    if args.resume:
+        if args.output == "-":
+            logger.error("--resume には --output でファイルを指定してください")
+            return 1
+        done = load_jsonl_url_keys(args.output)
+        logger.info(f"出力済みのURLを読み飛ばします: {len(done)}件")
+    
+    def pending_urls():
+        for url in iter_url_file(args.url_file):
+            if url_key(url) not in done:
+                yield url
+    
+    # 結果・HTML・スクリーンショットの書き込みは出力スレッドで行い、結果の受信を止めない
+    sink = _create_sink(args)
+    writer = JsonlWriter(args.output, append=args.resume, sink=sink)
+    result_handler = ResultHandler(
+        output_dir=args.html_dir, result_file=None, html_compression=args.html_compression, sink=sink
+    )
+    counts: Dict[str, int] = {}
+    failed = False
+    try:
+        async with PlayScraperClient(args.api_url) as client:
+            async for item in client.scrape_many_async(
+                pending_urls(),
+                selectors,
+                actions,
+                options or None,
+                concurrency=args.concurrency,
+                retries=args.retries,
+                batch_size=args.batch_size,
+                interval=args.interval,
+                timeout=args.timeout,
+                fields=args.fields
+            ):
+                if args.save_output and item["status"] == "completed":
+                    await result_handler.save_html_content_async(item)
+                    await result_handler.save_screenshot_async(item)
+                await writer.write_async(item)
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+    except Exception as e:
+        logger.error(f"エラー: {e}")
+        failed = True
+    finally:
+        # 中断した場合も書き込み済みの結果を残す
+        try:
+            await sink.close()
+        except Exception as e:
+            logger.error(f"結果の書き込みに失敗: {e}")
+            failed = True
+        writer.close()
+    
+    if failed:
+        return 1
+    logger.info(f"一括スクレイピング完了: {writer.count}件 {counts}")
+    return 0 if counts.get("completed", 0) == writer.count else 1
+
+
 def main():
     """
     メイン関数
@@ -101,27 +200,54 @@ def main():
         終了コード
     """
     parser = argparse.ArgumentParser(description="PlaywrightAPI クライアント")
-    parser.add_argument("url", help="スクレイピング対象のURL")
+    parser.add_argument("url", nargs="?", help="スクレイピング対象のURL")
+    parser.add_argument("--url-file", help="URLリストのファイル（1行に1つ、\"-\" で標準入力）。結果を JSON Lines で書き出す")
     parser.add_argument("--api-url", default="http://localhost:8001", help="PlaywrightAPI のURL")
     parser.add_argument("--selectors", help="セレクタのJSONファイルパス")
     parser.add_argument("--actions", help="アクションのJSONファイルパス")
     parser.add_argument("--timeout", type=float, default=60.0, help="タイムアウト時間（秒）")
     parser.add_argument("--interval", type=float, default=1.0, help="ステータス確認の間隔（秒）")
-    parser.add_argument("--output", default="output.json", help="結果を保存するJSONファイルパス")
+    parser.add_argument("--cancel-on-timeout", action="store_true", help="タイムアウト時にサーバー側のタスクをキャンセルする")
+    parser.add_argument(
+        "--output",
+        help="結果を保存するファイルパス（デフォルト: output.json。--url-file の場合は標準出力、\"-\" で標準出力）"
+    )
     parser.add_argument("--verbose", "-v", action="store_true", help="詳細なログを表示")
     parser.add_argument("--save-output", action="store_true", help="HTMLとスクリーンショットをファイルとして保存する")
     parser.add_argument("--html-dir", default="output/html", help="HTMLファイルとスクリーンショットを保存するディレクトリ")
+    parser.add_argument(
+        "--html-compression", choices=["gzip", "zstd"], help="保存するHTMLファイルを圧縮する（zstd には zstandard が必要）"
+    )
     parser.add_argument("--async-mode", action="store_true", help="非同期モードで実行")
+    parser.add_argument("--concurrency", type=int, default=10, help="--url-file で同時に処理するURLの数")
+    parser.add_argument("--batch-size", type=int, default=0, help="--url-file でまとめて投入するURLの数（0の場合は1件ずつ）")
+    parser.add_argument("--retries", type=int, default=2, help="--url-file で失敗したURLを再投入する回数")
+    parser.add_argument("--resume", action="store_true", help="--output に出力済みのURLを読み飛ばして追記する")
+    parser.add_argument("--no-screenshot", action="store_true", help="--url-file でスクリーンショットを取得しない")
+    parser.add_argument("--no-html", action="store_true", help="--url-file でHTMLを取得しない")
+    parser.add_argument(
+        "--fields",
+        type=lambda value: [name.strip() for name in value.split(",") if name.strip()],
+        help="取得する結果の項目（カンマ区切り。例: data,errors）。--save-output のHTML・スクリーンショットは別に取得する"
+    )
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="書き込んだ結果をフラッシュするまでの最大の時間（秒）")
+    parser.add_argument("--flush-every", type=int, default=100, help="この件数の結果を書き込むたびにフラッシュする")
+    parser.add_argument("--fsync", action="store_true", help="フラッシュ時に fsync してディスクへの書き込みを保証する")
     
     args = parser.parse_args()
+    if bool(args.url) == bool(args.url_file):
+        parser.error("URL か --url-file のどちらか一方を指定してください")
+    if args.output is None:
+        args.output = "-" if args.url_file else "output.json"
     
-    # 詳細ログの設定
-    if args.verbose:
-        logger.remove()
-        logger.add(sys.stdout, level="DEBUG")
-    else:
-        logger.remove()
-        logger.add(sys.stdout, level="INFO")
+    # 詳細ログの設定（結果を標準出力に書き出す場合、ログは標準エラー出力に出す）
+    log_sink = sys.stderr if args.output == "-" else sys.stdout
+    logger.remove()
+    logger.add(log_sink, level="DEBUG" if args.verbose else "INFO")
+    
+    # URLリストの一括スクレイピング
+    if args.url_file:
+        return asyncio.run(batch_main(args))
     
     # 非同期モードで実行
     if args.async_mode:
@@ -158,7 +284,8 @@ def main():
             # 出力ハンドラの初期化
             result_handler = ResultHandler(
                 output_dir=args.html_dir,
-                result_file=args.output
+                result_file=args.output,
+                html_compression=args.html_compression
             )
             
             # スクレイピングタスクの開始
@@ -173,7 +300,9 @@ def main():
             task_id = task["task_id"]
             
             # タスクの完了を待機
-            result = client.wait_for_completion(task_id, args.interval, args.timeout)
+            result = client.wait_for_completion(
+                task_id, args.interval, args.timeout, cancel_on_timeout=args.cancel_on_timeout, fields=args.fields
+            )
             
             # 結果の処理
             result_handler.process_result(result)
@@ -2,29 +2,268 @@
 PlaywrightAPI クライアント 出力処理モジュール
 
 スクレイピング結果の出力処理を行うユーティリティを提供します。
+
+AsyncOutputSink を使うと、ファイルへの書き込みを専用のスレッドで行い、
+イベントループ上の他の処理（ポーリングや結果の受信）がディスクI/Oで止まらないようにできます。
 """
 
 import os
+import sys
+import json
 import base64
-from typing import Dict, Any, Optional
+import asyncio
+import queue
+import threading
+import time
+from typing import Dict, Any, Callable, IO, Optional, Set
 
 from loguru import logger
+from .result import LazyResult
 from .utils import url_to_filename, save_html_to_file, save_screenshot_to_file, save_json_file
 
 
+class AsyncOutputSink:
+    """
+    ファイルへの書き込みを専用のスレッドで行う出力先
+    
+    書き込みはキューに積んですぐに戻り、スレッドが順番に実行します。
+    JSON Lines の行はバッファに溜め、flush_every 行ごとか最初の未フラッシュの行から
+    flush_interval 秒経過した時点でまとめてフラッシュ（fsync=True の場合は fsync も）します。
+    未処理の書き込みが max_pending 件に達すると、空きができるまで呼び出し側を待たせます。
+    
+    書き込み中のエラーは flush() / close() で送出します。同じイベントループからのみ使用できます。
+    """
+    
+    def __init__(
+        self,
+        max_pending: int = 256,
+        flush_interval: float = 1.0,
+        flush_every: int = 100,
+        fsync: bool = False
+    ):
+        """
+        初期化
+        
+        Args:
+            max_pending: キューに積める未処理の書き込みの数
+            flush_interval: 書き込んだ行をフラッシュするまでの最大の時間（秒）
+            flush_every: この行数を書き込むたびにフラッシュする
+            fsync: フラッシュ時に fsync してディスクへの書き込みを保証するかどうか
+        """
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.flush_every = max(1, flush_every)
+        self.fsync = fsync
+        self.written = 0
+        self.flushes = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._error: Optional[BaseException] = None
+        # 以下は書き込みスレッドのみが使用する
+        self._dirty: Set[IO] = set()
+        self._unflushed = 0
+    
+    def _start(self):
+        """初回の呼び出し時に書き込みスレッドを開始する"""
+        loop = asyncio.get_running_loop()
+        if self._thread is None:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+            self._thread.start()
+        elif loop is not self._loop:
+            raise RuntimeError("AsyncOutputSink は作成したイベントループ以外からは使用できません")
+    
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+    
+    async def _put(self, job: tuple):
+        self._start()
+        self._raise_error()
+        await self._slots.acquire()
+        self._queue.put(job)
+    
+    async def write_line(self, file: IO, item: Any):
+        """
+        ファイルに1行を書き込む
+        
+        Args:
+            file: 書き込み先（呼び出し側が開き、close() の後に閉じる）
+            item: 書き込む文字列。文字列以外はスレッドでJSONに変換する
+        """
+        await self._put(("line", file, item))
+    
+    async def call(self, func: Callable[..., Any], *args: Any):
+        """
+        関数を書き込みスレッドで実行する（完了は待たない）
+        
+        Args:
+            func: ファイルに書き込む関数
+            *args: 関数の引数
+        """
+        await self._put(("call", func, args))
+    
+    async def flush(self):
+        """キューに積んだ書き込みが終わるまで待ち、書き込んだ行をフラッシュする"""
+        if self._thread is None:
+            return
+        self._start()
+        done = self._loop.create_future()
+        self._queue.put(("flush", done))
+        await done
+        self._raise_error()
+    
+    async def close(self):
+        """残りの書き込みを終えてスレッドを停止する"""
+        if self._thread is None:
+            return
+        self._start()
+        done = self._loop.create_future()
+        self._queue.put(("stop", done))
+        await done
+        self._thread = None
+        self._raise_error()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self._queue.qsize(), "written": self.written, "flushes": self.flushes}
+    
+    def _run(self):
+        """書き込みスレッドの処理"""
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                job = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_files()
+                deadline = None
+                continue
+            
+            kind = job[0]
+            try:
+                if kind == "line":
+                    _, file, item = job
+                    if not isinstance(item, str):
+                        item = json.dumps(item, ensure_ascii=False)
+                    file.write(item + "\n")
+                    self.written += 1
+                    self._dirty.add(file)
+                    self._unflushed += 1
+                elif kind == "call":
+                    job[1](*job[2])
+                    self.written += 1
+            except Exception as e:
+                logger.error(f"出力の書き込みに失敗: {e}")
+                self._error = self._error or e
+            
+            if kind in ("line", "call"):
+                self._loop.call_soon_threadsafe(self._slots.release)
+                if self._unflushed >= self.flush_every:
+                    self._flush_files()
+                    deadline = None
+                elif self._unflushed and deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                continue
+            
+            # flush / stop
+            self._flush_files()
+            deadline = None
+            self._loop.call_soon_threadsafe(_resolve, job[1])
+            if kind == "stop":
+                return
+    
+    def _flush_files(self):
+        """書き込んだファイルをフラッシュする"""
+        for file in self._dirty:
+            try:
+                file.flush()
+                if self.fsync and file is not sys.stdout:
+                    os.fsync(file.fileno())
+            except Exception as e:
+                logger.error(f"出力のフラッシュに失敗: {e}")
+                self._error = self._error or e
+        if self._dirty:
+            self.flushes += 1
+        self._dirty.clear()
+        self._unflushed = 0
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
 class ResultHandler:
     """スクレイピング結果ハンドラクラス"""
     
-    def __init__(self, output_dir: str = "output/html", result_file: str = "output.json"):
+    def __init__(
+        self,
+        output_dir: str = "output/html",
+        result_file: str = "output.json",
+        html_compression: Optional[str] = None,
+        sink: Optional[AsyncOutputSink] = None
+    ):
         """
         初期化
         
         Args:
             output_dir: 出力ディレクトリ
             result_file: 結果JSONファイル
+            html_compression: HTMLファイルの圧縮方式（"gzip" または "zstd"）
+            sink: *_async メソッドの書き込みを行う出力先（Noneの場合は既定のスレッドプールで実行する）
         """
         self.output_dir = output_dir
         self.result_file = result_file
+        self.html_compression = html_compression
+        self.sink = sink
+    
+    async def _run_async(self, func: Callable[[Dict[str, Any]], Any], task_result: Dict[str, Any]) -> Any:
+        """ファイルへの書き込みをイベントループの外で実行する"""
+        if self.sink is not None:
+            await self.sink.call(func, task_result)
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, func, task_result)
+    
+    async def process_result_async(self, task_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        process_result の非同期版（sinkを指定した場合は保存の完了を待たない）
+        
+        Args:
+            task_result: タスク結果
+            
+        Returns:
+            処理結果の情報
+        """
+        await self._run_async(self.process_result, task_result)
+        return task_result
+    
+    async def save_html_content_async(self, task_result: Dict[str, Any]) -> Optional[str]:
+        """
+        save_html_content の非同期版
+        
+        Args:
+            task_result: タスク結果
+            
+        Returns:
+            保存されたHTMLファイルのパス（sinkを指定した場合は保存を待たずにNone）
+        """
+        return await self._run_async(self.save_html_content, task_result)
+    
+    async def save_screenshot_async(self, task_result: Dict[str, Any]) -> Optional[str]:
+        """
+        save_screenshot の非同期版
+        
+        Args:
+            task_result: タスク結果
+            
+        Returns:
+            保存されたスクリーンショットファイルのパス（sinkを指定した場合は保存を待たずにNone）
+        """
+        return await self._run_async(self.save_screenshot, task_result)
     
     def process_result(self, task_result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -57,13 +296,15 @@ class ResultHandler:
             logger.warning("抽出データなし（セレクタが指定されていないか、一致するデータがありません）")
         
         # エラー情報を表示
-        if "errors" in result:
+        if result.get("errors"):
             logger.warning("エラー情報:")
             for key, error in result["errors"].items():
                 logger.warning(f"  {key}: {error['message']} ({error['type']})")
         
         # 結果をJSONとして保存
-        if self.result_file:
+        if self.result_file == "-":
+            print(json.dumps(task_result, ensure_ascii=False, indent=2))
+        elif self.result_file:
             save_json_file(task_result, self.result_file)
             logger.success(f"結果を {self.result_file} に保存しました")
         
@@ -79,12 +320,15 @@ class ResultHandler:
         Returns:
             保存されたHTMLファイルのパス（保存しなかった場合はNone）
         """
-        if "result" not in task_result or "html" not in task_result["result"]:
+        result = task_result.get("result")
+        if isinstance(result, LazyResult) and result.is_lazy("html"):
+            # fields で除いていたHTMLをサーバーから取得する（結果には保持しない）
+            html_content = result.fetch("html")
+        elif result is None or "html" not in result:
             return None
-        
-        result = task_result["result"]
+        else:
+            html_content = result.get("html", "")
         url = result.get("url", "")
-        html_content = result.get("html", "")
         
         if not html_content:
             return None
@@ -93,7 +337,7 @@ class ResultHandler:
         filename = url_to_filename(url, ".html")
         
         # HTMLをファイルに保存
-        filepath = save_html_to_file(html_content, self.output_dir, filename)
+        filepath = save_html_to_file(html_content, self.output_dir, filename, self.html_compression)
         logger.success(f"HTMLをファイルに保存しました: {filepath}")
         
         return filepath
@@ -108,21 +352,74 @@ class ResultHandler:
         Returns:
             保存されたスクリーンショットファイルのパス（保存しなかった場合はNone）
         """
-        if "result" not in task_result or "screenshot" not in task_result["result"]:
+        result = task_result.get("result")
+        if result is None:
             return None
         
-        result = task_result["result"]
-        url = result.get("url", "")
-        screenshot_base64 = result.get("screenshot", "")
+        # URLからファイル名を生成
+        filename = url_to_filename(result.get("url", ""), ".png")
+        
+        if isinstance(result, LazyResult) and result.is_lazy("screenshot"):
+            # fields で除いていたスクリーンショットは、Base64を介さずにサーバーからファイルへ書き込む
+            filepath = result.save_screenshot(os.path.join(self.output_dir, filename))
+            if filepath:
+                logger.success(f"スクリーンショットを保存しました: {filepath}")
+            return filepath
         
+        screenshot_base64 = result.get("screenshot", "")
         if not screenshot_base64:
             return None
         
-        # URLからファイル名を生成
-        filename = url_to_filename(url, ".png")
-        
         # スクリーンショットをファイルに保存
         filepath = save_screenshot_to_file(screenshot_base64, self.output_dir, filename)
         logger.success(f"スクリーンショットを保存しました: {filepath}")
         
         return filepath
+
+
+class JsonlWriter:
+    """結果を1件ずつ JSON Lines 形式で書き出すクラス"""
+    
+    def __init__(self, filepath: str = "-", append: bool = False, sink: Optional[AsyncOutputSink] = None):
+        """
+        初期化
+        
+        Args:
+            filepath: 出力ファイルパス（"-" の場合は標準出力）
+            append: 既存のファイルに追記するかどうか
+            sink: write_async の書き込みを行う出力先
+        """
+        self.filepath = filepath
+        self.count = 0
+        self.sink = sink
+        if filepath == "-":
+            self._file = sys.stdout
+        else:
+            directory = os.path.dirname(filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(filepath, "a" if append else "w", encoding="utf-8")
+    
+    def write(self, item: Dict[str, Any]):
+        """1件の結果を書き出す（中断しても書き込み済みの行が残るよう行ごとにフラッシュする）"""
+        self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.count += 1
+    
+    async def write_async(self, item: Dict[str, Any]):
+        """
+        1件の結果を書き出す（sinkを指定した場合はスレッドで書き込み、フラッシュはsinkの設定に従う）
+        
+        Args:
+            item: 書き出す結果
+        """
+        if self.sink is None:
+            self.write(item)
+            return
+        await self.sink.write_line(self._file, item)
+        self.count += 1
+    
+    def close(self):
+        """ファイルを閉じる（sinkを使う場合は sink.close() の後に呼ぶ）"""
+        if self._file is not sys.stdout:
+            self._file.close()
@@ -0,0 +1,135 @@
+"""
+PlaywrightAPI クライアント タスク結果モジュール
+
+fields を指定して取得したタスク結果を表す LazyResult を提供します。
+
+HTMLやスクリーンショットは数MBになることがあるため、fields で除いて取得し、
+必要になったときだけサーバーから取得します。スクリーンショットはBase64を介さずに
+ファイルへ直接書き込むことができます。
+"""
+
+import base64
+import os
+from typing import Any, FrozenSet, Optional
+
+# fields で除いた場合に、参照したときにサーバーから取得する項目
+LAZY_FIELDS = frozenset({"html", "screenshot"})
+
+
+class LazyResult(dict):
+    """
+    fields を指定して取得したタスク結果
+
+    通常の辞書として使えます。fields で除いた html と screenshot は辞書には含まれないため、
+    fetch（同期）または load_async（非同期）で取得してください。result["html"] のように参照すると
+    イベントループを止めないよう通信は行わず、取得方法を示す KeyError を送出します。
+    """
+
+    def __init__(self, client: Any, task_id: str, result: dict, fields: FrozenSet[str]):
+        """
+        初期化
+
+        Args:
+            client: 取得に使う PlayScraperClient
+            task_id: タスクID
+            result: サーバーが返した結果
+            fields: 取得時に指定した項目
+        """
+        # サーバーは除いた項目を null で返すため、参照時に取得できるよう取り除いておく
+        super().__init__(
+            (key, value) for key, value in result.items()
+            if not (value is None and key in LAZY_FIELDS and key not in fields)
+        )
+        self.client = client
+        self.task_id = task_id
+        self.fields = fields
+
+    def is_lazy(self, key: str) -> bool:
+        """まだ取得していない、参照時に取得する項目かどうか"""
+        return key in LAZY_FIELDS and key not in self.fields and not dict.__contains__(self, key)
+
+    def __missing__(self, key: str) -> Any:
+        if self.is_lazy(key):
+            raise KeyError(
+                f"{key} は fields で除かれています。result.fetch({key!r}) または "
+                f"await result.load_async({key!r}) で取得してください"
+            )
+        raise KeyError(key)
+
+    @staticmethod
+    def _check_lazy_field(key: str):
+        if key not in LAZY_FIELDS:
+            raise KeyError(f"{key} は参照時に取得できる項目ではありません（{', '.join(sorted(LAZY_FIELDS))} のいずれか）")
+
+    def fetch(self, key: str) -> Any:
+        """
+        項目をサーバーから取得する（結果には保持しないため、JSONに書き出しても含まれない）
+
+        Args:
+            key: 項目名（html または screenshot）
+
+        Returns:
+            項目の値（サーバーに無い場合はNone）
+
+        Raises:
+            KeyError: html・screenshot 以外の項目を指定した場合
+        """
+        self._check_lazy_field(key)
+        if key == "html":
+            return self.client.get_task_html(self.task_id)
+        if key == "screenshot":
+            image = self.client.get_task_screenshot(self.task_id)
+            return base64.b64encode(image).decode("ascii") if image is not None else None
+
+    async def load_async(self, key: str) -> Any:
+        """
+        項目を非同期で取得する（取得済みの場合はその値を返す）
+
+        Args:
+            key: 項目名（html または screenshot）
+
+        Returns:
+            項目の値（サーバーに無い場合はNone）
+
+        Raises:
+            KeyError: html・screenshot 以外の項目を指定した場合
+        """
+        self._check_lazy_field(key)
+        if not self.is_lazy(key):
+            return self.get(key)
+        if key == "html":
+            value = await self.client.get_task_html_async(self.task_id)
+        elif key == "screenshot":
+            image = await self.client.get_task_screenshot_async(self.task_id)
+            value = base64.b64encode(image).decode("ascii") if image is not None else None
+        self[key] = value
+        return value
+
+    def save_screenshot(self, filepath: str) -> Optional[str]:
+        """
+        スクリーンショットをファイルに保存する（未取得の場合はサーバーからファイルへ直接書き込む）
+
+        Args:
+            filepath: 保存先のファイルパス
+
+        Returns:
+            保存したファイルのパス（スクリーンショットが無い場合はNone）
+        """
+        if self.is_lazy("screenshot"):
+            return self.client.download_screenshot(self.task_id, filepath)
+        return _write_base64(self.get("screenshot"), filepath)
+
+    async def save_screenshot_async(self, filepath: str) -> Optional[str]:
+        """save_screenshot の非同期版"""
+        if self.is_lazy("screenshot"):
+            return await self.client.download_screenshot_async(self.task_id, filepath)
+        return _write_base64(self.get("screenshot"), filepath)
+
+
+def _write_base64(data: Optional[str], filepath: str) -> Optional[str]:
+    if not data:
+        return None
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(base64.b64decode(data))
+    return filepath
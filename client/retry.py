@@ -0,0 +1,121 @@
+"""
+PlaywrightAPI クライアント 再試行モジュール
+
+一時的なエラー（5xx、429、接続エラー、タイムアウト）に対する再試行の方針と、
+タスクの経過時間に応じてステータス確認の間隔を広げるポーリング間隔を提供します。
+
+再試行の待ち時間は指数バックオフにジッタ（ランダムな揺らぎ）を加えたもので、
+多数のクライアントが同時に再試行してサーバーの過負荷を悪化させることを防ぎます。
+"""
+
+import email.utils
+import random
+import time
+from typing import FrozenSet, Iterator, Optional
+
+
+# 再試行するHTTPステータス
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After ヘッダを待ち時間（秒）に変換する
+
+    Args:
+        value: ヘッダの値（秒数またはHTTP日付）
+
+    Returns:
+        待ち時間（秒）。解釈できない場合はNone
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """再試行の方針"""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retry_statuses: FrozenSet[int] = RETRY_STATUSES
+    ):
+        """
+        初期化
+
+        Args:
+            max_attempts: 最初の試行を含む最大試行回数（1の場合は再試行しない）
+            base_delay: 1回目の再試行の最大待ち時間（秒）
+            max_delay: 待ち時間の上限（秒）
+            retry_statuses: 再試行するHTTPステータス
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+
+    def should_retry(self, attempt: int, idempotent: bool, status: Optional[int] = None) -> bool:
+        """
+        再試行するかどうかを判定する
+
+        Args:
+            attempt: 失敗した試行の回数（1から）
+            idempotent: 同じリクエストを繰り返しても結果が変わらない呼び出しか
+            status: HTTPステータス（接続エラー・タイムアウトの場合はNone）
+
+        Returns:
+            再試行する場合はTrue
+        """
+        if not idempotent or attempt >= self.max_attempts:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        再試行までの待ち時間を求める
+
+        指数バックオフの範囲から一様に選ぶ（フルジッタ）。
+        サーバーが Retry-After を返した場合はそれより短くしない
+
+        Args:
+            attempt: 失敗した試行の回数（1から）
+            retry_after: Retry-After ヘッダの待ち時間（秒）
+
+        Returns:
+            待ち時間（秒）
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+def poll_intervals(initial: float, maximum: float, factor: float = 1.5, jitter: float = 0.1) -> Iterator[float]:
+    """
+    ステータス確認の間隔を返すイテレータ
+
+    間隔は initial から始まり、確認のたびに factor 倍して maximum まで広げる。
+    多数のタスクの確認が同じ時刻に揃わないよう、±jitter の割合で揺らぎを加える
+
+    Args:
+        initial: 最初の間隔（秒）
+        maximum: 間隔の上限（秒）
+        factor: 確認ごとに間隔を広げる倍率
+        jitter: 間隔に加える揺らぎの割合
+    """
+    interval = initial
+    while True:
+        yield interval * random.uniform(1 - jitter, 1 + jitter)
+        interval = min(max(maximum, initial), interval * factor)
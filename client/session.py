@@ -2,33 +2,123 @@
 PlaywrightAPI クライアント セッション管理モジュール
 
 複数ユーザーのセッションを管理するためのモジュールです。
+
+セッションは最後にアクセスした順に保持するため、最も長く使われていないセッションの削除や
+期限切れのセッションの検出は先頭から取り出すだけで済みます。期限切れのセッションは
+バックグラウンドのスレッドが定期的に削除します。
+
+セッション情報は __slots__ を使った SessionRecord で保持し、大量のセッションでもメモリ使用量を抑えます。
 """
 
 import os
 import uuid
 import time
 import json
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
 from concurrent.futures import ThreadPoolExecutor
 
 from loguru import logger
 
 
+class SessionRecord:
+    """
+    セッション情報
+    
+    辞書と同じように session["tasks"] の形でも参照・更新できます。
+    決まった項目以外の値は extra に保持します。
+    """
+    
+    __slots__ = ("id", "user_identifier", "created_at", "last_accessed", "tasks", "extra")
+    
+    # 辞書の形で参照できる項目
+    FIELDS = frozenset({"id", "user_identifier", "created_at", "last_accessed", "tasks"})
+    
+    def __init__(self, session_id: str, user_identifier: Optional[str], created_at: float):
+        self.id = session_id
+        self.user_identifier = user_identifier
+        self.created_at = created_at
+        self.last_accessed = created_at
+        # タスクIDごとのタスク情報（追加した順）
+        self.tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.extra: Optional[Dict[str, Any]] = None
+    
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key: str, value: Any):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+            return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS or (self.extra is not None and key in self.extra)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
 class SessionManager:
     """セッション管理クラス"""
     
-    def __init__(self, max_sessions: int = 10, session_timeout: int = 3600):
+    def __init__(
+        self,
+        max_sessions: int = 10,
+        session_timeout: int = 3600,
+        max_tasks_per_session: int = 100,
+        sweep_interval: float = 60.0
+    ):
         """
         セッションマネージャの初期化
         
+        全てのメソッドは複数のスレッドから同時に呼び出せます。
+        
         Args:
             max_sessions: 最大セッション数
             session_timeout: セッションタイムアウト（秒）
+            max_tasks_per_session: セッションごとに保持するタスクの数（超えた分は古い順に削除する）
+            sweep_interval: 期限切れのセッションを削除する間隔（秒。0の場合はバックグラウンドで削除しない）
         """
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+        # 最後にアクセスした順（先頭が最も古い）
+        self.sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
         self.max_sessions = max_sessions
         self.session_timeout = session_timeout
+        self.max_tasks_per_session = max_tasks_per_session
+        self.sweep_interval = sweep_interval
         self.executor = ThreadPoolExecutor(max_workers=max_sessions)
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        if sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+            self._sweeper.start()
+    
+    def close(self):
+        """期限切れのセッションの削除を停止し、スレッドプールを終了する"""
+        self._closed.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        self.executor.shutdown(wait=False)
+    
+    def _sweep_loop(self):
+        """期限切れのセッションを定期的に削除する"""
+        while not self._closed.wait(self.sweep_interval):
+            try:
+                self._cleanup_expired_sessions()
+            except Exception as e:
+                logger.error(f"期限切れセッションの削除に失敗: {e}")
     
     def create_session(self, user_identifier: Optional[str] = None) -> str:
         """
@@ -40,31 +130,23 @@ class SessionManager:
         Returns:
             セッションID
         """
-        # 古いセッションをクリーンアップ
-        self._cleanup_expired_sessions()
-        
-        # セッション数が上限に達しているか確認
-        if len(self.sessions) >= self.max_sessions:
-            logger.warning(f"セッション数が上限（{self.max_sessions}）に達しています。最も古いセッションを削除します。")
-            oldest_session_id = min(self.sessions, key=lambda s: self.sessions[s]["created_at"])
-            self.delete_session(oldest_session_id)
-        
         # 新しいセッションIDを生成
         session_id = str(uuid.uuid4())
+        now = time.time()
         
-        # セッション情報を作成
-        self.sessions[session_id] = {
-            "id": session_id,
-            "user_identifier": user_identifier,
-            "created_at": time.time(),
-            "last_accessed": time.time(),
-            "tasks": {}
-        }
+        with self._lock:
+            # セッション数が上限に達しているか確認
+            if len(self.sessions) >= self.max_sessions:
+                logger.warning(f"セッション数が上限（{self.max_sessions}）に達しています。最も長く使われていないセッションを削除します。")
+                self.delete_session(next(iter(self.sessions)))
+            
+            # セッション情報を作成
+            self.sessions[session_id] = SessionRecord(session_id, user_identifier, now)
         
         logger.info(f"セッション作成: {session_id}" + (f" (ユーザー: {user_identifier})" if user_identifier else ""))
         return session_id
     
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def get_session(self, session_id: str) -> Optional[SessionRecord]:
         """
         セッションを取得
         
@@ -74,12 +156,19 @@ class SessionManager:
         Returns:
             セッション情報（存在しない場合はNone）
         """
-        session = self.sessions.get(session_id)
-        if session:
+        now = time.time()
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if not session:
+                return None
+            if now - session.last_accessed > self.session_timeout:
+                # バックグラウンドで削除される前の期限切れのセッション
+                self.delete_session(session_id)
+                return None
             # 最終アクセス時刻を更新
-            session["last_accessed"] = time.time()
+            session.last_accessed = now
+            self.sessions.move_to_end(session_id)
             return session
-        return None
     
     def update_session(self, session_id: str, data: Dict[str, Any]) -> bool:
         """
@@ -92,16 +181,17 @@ class SessionManager:
         Returns:
             更新成功かどうか
         """
-        session = self.get_session(session_id)
-        if not session:
-            return False
-        
-        # データをマージ
-        for key, value in data.items():
-            if key not in ["id", "created_at"]:
-                session[key] = value
-        
-        return True
+        with self._lock:
+            session = self.get_session(session_id)
+            if not session:
+                return False
+            
+            # データをマージ
+            for key, value in data.items():
+                if key not in ["id", "created_at"]:
+                    session[key] = value
+            
+            return True
     
     def delete_session(self, session_id: str) -> bool:
         """
@@ -113,9 +203,10 @@ class SessionManager:
         Returns:
             削除成功かどうか
         """
-        if session_id in self.sessions:
-            user_identifier = self.sessions[session_id].get("user_identifier")
-            del self.sessions[session_id]
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            user_identifier = session.user_identifier
             logger.info(f"セッション削除: {session_id}" + (f" (ユーザー: {user_identifier})" if user_identifier else ""))
             return True
         return False
@@ -132,11 +223,16 @@ class SessionManager:
         Returns:
             追加成功かどうか
         """
-        session = self.get_session(session_id)
-        if not session:
-            return False
-        
-        session["tasks"][task_id] = task_info
+        with self._lock:
+            session = self.get_session(session_id)
+            if not session:
+                return False
+            
+            tasks = session.tasks
+            tasks[task_id] = task_info
+            # 上限を超えたタスクは古い順に削除する
+            while len(tasks) > self.max_tasks_per_session:
+                del tasks[next(iter(tasks))]
         logger.info(f"タスク追加: {task_id} to セッション {session_id}")
         return True
     
@@ -151,11 +247,12 @@ class SessionManager:
         Returns:
             タスク情報（存在しない場合はNone）
         """
-        session = self.get_session(session_id)
-        if not session:
-            return None
-        
-        return session["tasks"].get(task_id)
+        with self._lock:
+            session = self.get_session(session_id)
+            if not session:
+                return None
+            
+            return session.tasks.get(task_id)
     
     def update_task(self, session_id: str, task_id: str, task_info: Dict[str, Any]) -> bool:
         """
@@ -169,15 +266,16 @@ class SessionManager:
         Returns:
             更新成功かどうか
         """
-        session = self.get_session(session_id)
-        if not session or task_id not in session["tasks"]:
-            return False
-        
-        # タスク情報をマージ
-        for key, value in task_info.items():
-            session["tasks"][task_id][key] = value
-        
-        return True
+        with self._lock:
+            session = self.get_session(session_id)
+            if not session or task_id not in session.tasks:
+                return False
+            
+            # タスク情報をマージ
+            for key, value in task_info.items():
+                session.tasks[task_id][key] = value
+            
+            return True
     
     def list_sessions(self) -> List[Dict[str, Any]]:
         """
@@ -186,13 +284,14 @@ class SessionManager:
         Returns:
             セッションリスト
         """
-        return [{
-            "id": session_id,
-            "user_identifier": session["user_identifier"],
-            "created_at": session["created_at"],
-            "last_accessed": session["last_accessed"],
-            "task_count": len(session["tasks"])
-        } for session_id, session in self.sessions.items()]
+        with self._lock:
+            return [{
+                "id": session_id,
+                "user_identifier": session.user_identifier,
+                "created_at": session.created_at,
+                "last_accessed": session.last_accessed,
+                "task_count": len(session.tasks)
+            } for session_id, session in self.sessions.items()]
     
     def _cleanup_expired_sessions(self) -> int:
         """
@@ -202,15 +301,17 @@ class SessionManager:
             削除されたセッション数
         """
         current_time = time.time()
-        expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if current_time - session["last_accessed"] > self.session_timeout
-        ]
-        
-        for session_id in expired_sessions:
-            self.delete_session(session_id)
+        expired = 0
+        with self._lock:
+            # 最後にアクセスした順に並んでいるため、期限内のセッションが現れたら以降は調べない
+            while self.sessions:
+                session = next(iter(self.sessions.values()))
+                if current_time - session.last_accessed <= self.session_timeout:
+                    break
+                self.sessions.popitem(last=False)
+                expired += 1
         
-        if expired_sessions:
-            logger.info(f"{len(expired_sessions)}個の期限切れセッションを削除しました")
+        if expired:
+            logger.info(f"{expired}個の期限切れセッションを削除しました")
         
-        return len(expired_sessions)
+        return expired
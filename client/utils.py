@@ -6,11 +6,21 @@ PlaywrightAPIクライアントで使用されるユーティリティ関数を
 
 import os
 import sys
+import gzip
+import hashlib
 import json
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Iterator, Optional, Set, Union
 from urllib.parse import urlparse
 from loguru import logger
 
+try:
+    import zstandard
+except ImportError:  # 任意の依存関係
+    zstandard = None
+
+# 圧縮方式ごとのファイル拡張子
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
 # ロガーのデフォルト設定をクリア
 logger.remove()
 
@@ -63,7 +73,8 @@ def url_to_filename(url: str, extension: str = ".html") -> str:
 def save_html_to_file(
     html_content: str, 
     output_dir: str, 
-    filename: str
+    filename: str,
+    compression: Optional[str] = None
 ) -> str:
     """
     HTMLコンテンツをファイルに保存する
@@ -72,15 +83,30 @@ def save_html_to_file(
         html_content: HTMLコンテンツ
         output_dir: 出力ディレクトリ
         filename: ファイル名
+        compression: 圧縮方式（"gzip" または "zstd"。Noneの場合は圧縮しない）
         
     Returns:
-        保存されたファイルのパス
+        保存されたファイルのパス（圧縮した場合は拡張子 .gz / .zst が付く）
     """
     os.makedirs(output_dir, exist_ok=True)
     filepath = os.path.join(output_dir, filename)
     
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    if not compression:
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        return filepath
+    
+    if compression == "zstd" and zstandard is None:
+        logger.warning("zstandard がインストールされていないため gzip で圧縮します")
+        compression = "gzip"
+    data = html_content.encode("utf-8")
+    if compression == "zstd":
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    else:
+        data = gzip.compress(data, compresslevel=6)
+    filepath += COMPRESSION_EXTENSIONS[compression]
+    with open(filepath, "wb") as f:
+        f.write(data)
     
     return filepath
 
@@ -142,3 +168,54 @@ def save_json_file(data: Dict[str, Any], filepath: str) -> None:
     """
     with open(filepath, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def url_key(url: str) -> bytes:
+    """URLを比較用の短いキーに変換する（大量のURLを少ないメモリで保持するため）"""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+
+
+def iter_url_file(filepath: str) -> Iterator[str]:
+    """
+    URLリストのファイルから1行ずつURLを読み込む（空行と # で始まる行は無視する）
+    
+    Args:
+        filepath: ファイルパス（"-" の場合は標準入力）
+        
+    Yields:
+        URL
+    """
+    f = sys.stdin if filepath == "-" else open(filepath, "r", encoding="utf-8")
+    try:
+        for line in f:
+            url = line.strip()
+            if url and not url.startswith("#"):
+                yield url
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def load_jsonl_url_keys(filepath: str) -> Set[bytes]:
+    """
+    JSON Lines の出力ファイルに含まれるURLのキーを読み込む
+    
+    Args:
+        filepath: ファイルパス
+        
+    Returns:
+        url_key で変換したキーの集合（ファイルが無い場合は空）
+    """
+    keys: Set[bytes] = set()
+    if not os.path.exists(filepath):
+        return keys
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                url = json.loads(line).get("url")
+            except ValueError:
+                # 中断時に書きかけだった行は無視する
+                continue
+            if url:
+                keys.add(url_key(url))
+    return keys
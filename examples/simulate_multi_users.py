@@ -19,7 +19,7 @@ from pathlib import Path
 from loguru import logger
 from client.api import PlayScraperClient
 from client.utils import load_json_file, setup_logger
-from client.output import ResultHandler
+from client.output import ResultHandler, AsyncOutputSink
 
 
 # テスト用URLリスト（サンプル）
@@ -39,6 +39,7 @@ DEFAULT_URLS = [
 async def simulate_user(
     user_id: str,
     client: PlayScraperClient,
+    handler: ResultHandler,
     urls: List[str],
     selectors_file: Optional[str],
     save_output: bool,
@@ -51,6 +52,7 @@ async def simulate_user(
     Args:
         user_id: ユーザーID
         client: APIクライアント
+        handler: 結果ハンドラ（全ユーザーで共有する）
         urls: アクセス対象のURLリスト
         selectors_file: セレクタファイルパス
         save_output: 出力を保存するかどうか
@@ -98,9 +100,8 @@ async def simulate_user(
             user_id=user_id
         )
         
-        # 結果処理
-        handler = ResultHandler(output_dir=output_dir)
-        handler.process_result(result)
+        # 結果処理（ファイルへの書き込みは出力スレッドで行い、他のユーザーの処理を止めない）
+        await handler.process_result_async(result)
         
         return {
             "user_id": user_id,
@@ -147,8 +148,12 @@ async def simulate_multiple_users(
     start_time = time.time()
     logger.info(f"複数ユーザーシミュレーション開始（ユーザー数: {num_users}, 同時実行数: {concurrency}）")
     
-    # クライアントの初期化
-    client = PlayScraperClient(api_url)
+    # クライアントの初期化（全ユーザーで1つのコネクションプールを共有する）
+    client = PlayScraperClient(api_url, connection_limit_per_host=concurrency)
+    
+    # 結果の書き込みを行う出力スレッド（全ユーザーで共有する）
+    sink = AsyncOutputSink()
+    handler = ResultHandler(output_dir=output_dir, sink=sink)
     
     # 並行実行制限（セマフォ）
     semaphore = asyncio.Semaphore(concurrency)
@@ -159,6 +164,7 @@ async def simulate_multiple_users(
             return await simulate_user(
                 user_id=user_id,
                 client=client,
+                handler=handler,
                 urls=urls,
                 selectors_file=selectors_file,
                 save_output=save_output,
@@ -171,11 +177,10 @@ async def simulate_multiple_users(
     # すべてのユーザーのタスクを作成
     tasks = [simulate_user_with_semaphore(user_id) for user_id in user_ids]
     
-    # すべてのタスクを実行
-    results = await asyncio.gather(*tasks)
-    
-    # セッションをクローズ
-    await client.close_async_sessions()
+    # すべてのタスクを実行（終了時にセッションをクローズ）
+    async with client:
+        results = await asyncio.gather(*tasks)
+    await sink.close()
     
     elapsed = time.time() - start_time
     logger.info(f"複数ユーザーシミュレーション完了（所要時間: {elapsed:.2f}秒）")
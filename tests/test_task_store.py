@@ -0,0 +1,98 @@
+import asyncio
+
+from app.task_store import SqliteTaskStore, TaskRecord
+
+
+def test_api_store_reads_worker_updates(tmp_path):
+    """分散モードでAPIプロセスのストアがワーカーの書き込んだ状態を返す"""
+
+    async def run():
+        path = str(tmp_path / "tasks.sqlite3")
+        api_store = SqliteTaskStore(path)
+        worker_store = SqliteTaskStore(path)
+        await api_store.start()
+        await worker_store.start()
+        try:
+            task_id = api_store.new_task_id()
+            await api_store.create(task_id, TaskRecord("pending", b'{"url": "https://example.com/"}'))
+            # submit_task と同じ順序でキューに渡す
+            api_store.release(task_id)
+            await api_store.flush()
+
+            await worker_store.update(task_id, status="running")
+            await worker_store.flush()
+            assert (await api_store.get(task_id)).status == "running"
+
+            await worker_store.update(task_id, status="completed", result={"url": "https://example.com/", "data": {}})
+            await worker_store.flush()
+
+            record = await api_store.get(task_id)
+            assert record.status == "completed"
+            assert record.result["url"] == "https://example.com/"
+            summaries = await api_store.summaries([task_id])
+            assert [summary["status"] for summary in summaries] == ["completed"]
+        finally:
+            await worker_store.close()
+            await api_store.close()
+
+    asyncio.run(run())
+
+
+
+def test_cancelled_task_is_not_overwritten(tmp_path):
+    """キャンセル済みのタスクは終了したジョブの結果で上書きされない"""
+
+    async def run():
+        store = SqliteTaskStore(str(tmp_path / "tasks.sqlite3"))
+        await store.start()
+        try:
+            task_id = store.new_task_id()
+            await store.create(task_id, TaskRecord("running", b"{}"))
+            await store.update(task_id, status="cancelled")
+            await store.update(task_id, status="completed", result={"url": "https://example.com/"})
+            assert (await store.get(task_id)).status == "cancelled"
+
+            await store.flush()
+            await store.update(task_id, status="failed", error="timeout")
+            assert (await store.get(task_id)).status == "cancelled"
+        finally:
+            await store.close()
+
+    asyncio.run(run())
+
+
+def test_tasks_of_crashed_process_are_claimed(tmp_path):
+    """停止した直後に再起動しても、停止したプロセスのタスクを後から引き取る"""
+
+    async def run():
+        path = str(tmp_path / "tasks.sqlite3")
+        crashed = SqliteTaskStore(path)
+        await crashed.start()
+        task_id = crashed.new_task_id()
+        await crashed.create(task_id, TaskRecord("running", b'{"url": "https://example.com/"}'))
+        await crashed.flush()
+        # close() を呼ばずに停止する（ハートビートの行は残る）
+        crashed._flusher.cancel()
+        crashed._conn.close()
+
+        store = SqliteTaskStore(path)
+        store.claim_interval = 0.1
+        store.stale_after = 0.5
+        await store.start()
+        try:
+            # 停止したプロセスのハートビートはまだ新しいため、起動時には引き取らない
+            assert await store.claim_unfinished() == []
+            resumed = asyncio.Queue()
+
+            async def on_claimed(claimed):
+                for item in claimed:
+                    resumed.put_nowait(item)
+
+            store.watch_unfinished(on_claimed)
+            claimed_id, record = await asyncio.wait_for(resumed.get(), timeout=5)
+            assert claimed_id == task_id
+            assert record.status == "pending"
+        finally:
+            await store.close()
+
+    asyncio.run(run())